@@ -0,0 +1,89 @@
+"""
+Benchmark: response cache hit rate and latency, per-process dict vs shared SQLite.
+
+Starts WORKERS processes, each an independent CacheMiddleware in front of a
+handler that takes HANDLER_MS (standing in for the database query), the way
+`uvicorn --workers 4` runs server.py. Every worker gets its own random share
+of the traffic over PATHS URLs with a skewed (Zipf-like) popularity, so with
+the per-process backend each worker has to miss on a URL before it can hit.
+
+Run from backend/:  python benchmarks/bench_cache.py [requests per worker]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+import statistics
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from middlewares.performance import CacheMiddleware  # noqa: E402
+from utils.response_cache import MemoryCacheBackend, SQLiteCacheBackend  # noqa: E402
+
+WORKERS = 4
+PATHS = 2000
+HANDLER_MS = 2.0
+BODY = b'{"items": [' + b', '.join([b'"' + b'x' * 40 + b'"'] * 50) + b']}'
+
+
+async def handler(scope, receive, send):
+    await asyncio.sleep(HANDLER_MS / 1000)
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': BODY})
+
+
+async def call(app, path: str):
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': [(b'host', b'test')]}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def run_worker(backend_name: str, cache_file: str, seed: int, requests: int):
+    backend = MemoryCacheBackend() if backend_name == 'memory' else SQLiteCacheBackend(cache_file)
+    cache = CacheMiddleware(handler, rules=[('/api/*', 300)], backend=backend)
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(PATHS)]
+    paths = [f"/api/items/{index}" for index in rng.choices(range(PATHS), weights, k=requests)]
+    latencies = []
+    for path in paths:
+        start = time.perf_counter()
+        await call(cache, path)
+        latencies.append(time.perf_counter() - start)
+    await backend.close()
+    return cache.stats['hits'], cache.stats['misses'], latencies
+
+
+def worker(args):
+    return asyncio.run(run_worker(*args))
+
+
+def report(name: str, results):
+    hits = sum(result[0] for result in results)
+    misses = sum(result[1] for result in results)
+    latencies = sorted(latency * 1000 for result in results for latency in result[2])
+    print(f"{name:24} hit rate {hits / (hits + misses):6.1%}  handler runs {misses:6}  "
+          f"mean {statistics.fmean(latencies):6.3f} ms  p50 {latencies[len(latencies) // 2]:6.3f} ms  "
+          f"p95 {latencies[int(len(latencies) * 0.95)]:6.3f} ms")
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    print(f"{WORKERS} workers x {requests} requests over {PATHS} URLs, handler {HANDLER_MS} ms")
+    with tempfile.TemporaryDirectory() as directory, Pool(WORKERS) as pool:
+        for name in ('memory', 'sqlite'):
+            cache_file = os.path.join(directory, f"{name}.db")
+            jobs = [(name, cache_file, seed, requests) for seed in range(WORKERS)]
+            report(f"{name} ({'per process' if name == 'memory' else 'shared'})", pool.map(worker, jobs))
+
+
+if __name__ == '__main__':
+    main()
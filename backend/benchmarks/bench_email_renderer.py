@@ -0,0 +1,80 @@
+"""
+Benchmark: client confirmation email rendering.
+
+Compares the previous approach (a bare jinja2.Template built from the file
+source, lookup tables rebuilt per call) with the shared, precompiled
+ClientEmailRenderer.
+
+Run from backend/:  python benchmarks/bench_email_renderer.py [iterations]
+"""
+import os
+import sys
+import time
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Template  # noqa: E402
+
+from utils.email_renderer import ClientEmailRenderer, TEMPLATES_DIR, CLIENT_CONFIRMATION_TEMPLATE  # noqa: E402
+
+CONSULTATION = {
+    'name': 'Jane Doe',
+    'email': 'jane@example.com',
+    'company': 'Acme Corp',
+    'phone': '+1 555 0100',
+    'brief_message': 'We need help scaling our platform.',
+    'client_type': 'product',
+    'priority': 7,
+    'details': json.dumps({'product_size': 'mid', 'team_size': '25', 'major_pain': 'Performance', 'nda_required': True}),
+}
+ROUTING = {'sla_hours': 12, 'assigned_to': ['CTO', 'Solution Architect']}
+
+
+def bench(label, func, iterations):
+    func()  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / iterations * 1e6:9.1f} us/op")
+    return elapsed
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    path = os.path.join(TEMPLATES_DIR, CLIENT_CONFIRMATION_TEMPLATE)
+
+    def legacy_cold():
+        # Old per-process cost: parse and compile the template source
+        with open(path, 'r', encoding='utf-8') as f:
+            Template(f.read())
+
+    renderer = ClientEmailRenderer()
+
+    def renderer_cold():
+        # New per-process cost: template loaded from the bytecode cache
+        ClientEmailRenderer(renderer.environment.overlay(cache_size=0))
+
+    with open(path, 'r', encoding='utf-8') as f:
+        legacy_template = Template(f.read())
+
+    def legacy_render():
+        details = json.loads(CONSULTATION['details'])
+        labels = {key: key.replace('_', ' ').title() for key in details}  # rebuilt per call, as before
+        legacy_template.render(name=CONSULTATION['name'], email=CONSULTATION['email'],
+                               form_type='expert_consultation', priority=7, sla_hours=12,
+                               consultation_details=[(labels[k], str(v)) for k, v in details.items()])
+
+    def renderer_render():
+        renderer.render_expert_consultation_email(CONSULTATION, ROUTING)
+
+    print(f"iterations={iterations}")
+    bench('legacy load (parse)', legacy_cold, max(iterations // 20, 10))
+    bench('renderer load (bytecode)', renderer_cold, max(iterations // 20, 10))
+    bench('legacy render', legacy_render, iterations)
+    bench('renderer render', renderer_render, iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: form insert throughput with and without group commit.
+
+Runs bursts of concurrent save_contact() calls against a temporary database,
+once with one transaction per insert and once through the write batcher.
+
+Run from backend/:  python benchmarks/bench_group_commit.py [inserts] [synchronous]
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+CONTACT = {
+    'name': 'Bench User', 'email': 'bench@example.com', 'company': 'Bench', 'role': 'CTO',
+    'service': 'Web', 'timeline': '1-3 months', 'budget': '10k', 'message': 'Benchmark message',
+    'gdprConsent': True,
+}
+OUTBOX = [{'to_address': 'admin@example.com', 'subject': 'New contact', 'content': 'Body'}]
+
+
+async def run(label: str, inserts: int, max_batch: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_DIR = Path(tmp)
+        database.DB_FILE = database.DB_DIR / 'contacts.db'
+        database.write_batcher = database.WriteBatcher(max_batch=max_batch)
+        await database.init_database()
+        start = time.perf_counter()
+        await asyncio.gather(*(database.save_contact(CONTACT, outbox=OUTBOX) for _ in range(inserts)))
+        elapsed = time.perf_counter() - start
+        batches = database.write_batcher.batches or inserts
+        await database.close_database()
+    print(f"{label:<16} {inserts / elapsed:9.0f} inserts/s  commits={batches}")
+
+
+async def main():
+    inserts = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    if len(sys.argv) > 2:
+        database.DB_SYNCHRONOUS = sys.argv[2].upper()
+    print(f"inserts={inserts} synchronous={database.DB_SYNCHRONOUS}")
+    await run('per-insert', inserts, max_batch=1)
+    await run('group commit', inserts, max_batch=database.DB_WRITE_BATCH_MAX)
+
+
+if __name__ == '__main__':
+    import logging
+    logging.disable(logging.INFO)
+    asyncio.run(main())
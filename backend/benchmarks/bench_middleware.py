@@ -0,0 +1,102 @@
+"""
+Benchmark: per-request overhead of the middleware stack.
+
+Calls a small JSON endpoint directly through ASGI (no server, no HTTP
+client) and reports the mean time per request for the bare app, for five
+no-op BaseHTTPMiddleware layers (the cost of the wrapper alone) and for
+the five middlewares in server.py's order.
+
+Run from backend/:  python benchmarks/bench_middleware.py [requests]
+"""
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RATE_LIMIT_REQUESTS_PER_MINUTE', str(10 ** 9))
+
+from fastapi import FastAPI  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from middlewares.security import SecurityHeadersMiddleware  # noqa: E402
+from middlewares.rate_limit import RateLimitMiddleware  # noqa: E402
+from middlewares.performance import PerformanceMiddleware, CompressionMiddleware, CacheMiddleware  # noqa: E402
+
+
+class NoopMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+def endpoint_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/contact")
+    async def submit():
+        return {"status": "success", "message": "Thank you for your message", "id": 42}
+
+    return app
+
+
+def with_middleware(*middleware):
+    """Build an app with middleware listed outermost first"""
+    app = endpoint_app()
+    for cls, kwargs in reversed(middleware):
+        app.add_middleware(cls, **kwargs)
+    return app
+
+
+STACKS = {
+    'bare app': lambda: with_middleware(),
+    '5 x no-op BaseHTTPMiddleware': lambda: with_middleware(*[(NoopMiddleware, {})] * 5),
+    'server.py stack': lambda: with_middleware(
+        (RateLimitMiddleware, {}), (SecurityHeadersMiddleware, {}), (CacheMiddleware, {'ttl': 300}),
+        (CompressionMiddleware, {}), (PerformanceMiddleware, {}),
+    ),
+}
+
+
+async def call(app, scope):
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    done = asyncio.Event()
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.body' and not message.get('more_body'):
+            done.set()
+
+    await app(scope, receive, send)
+
+
+async def measure(app, requests: int) -> float:
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+        'scheme': 'http', 'path': '/api/contact', 'raw_path': b'/api/contact', 'root_path': '',
+        'query_string': b'', 'headers': [(b'host', b'test'), (b'accept-encoding', b'gzip, br')],
+        'client': ('127.0.0.1', 50000), 'server': ('test', 80),
+    }
+    for _ in range(200):  # warm-up
+        await call(app, dict(scope))
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, dict(scope))
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    baseline = None
+    for name, build in STACKS.items():
+        micros = await measure(build(), requests)
+        baseline = micros if baseline is None else baseline
+        print(f"{name:32} {micros:8.1f} us/request  (+{micros - baseline:.1f} us over the bare app)")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+Benchmark: admin full-text search latency on a large table.
+
+Fills a temporary database with synthetic contacts and expert consultations
+(one transaction, triggers keep the FTS5 indexes in sync), then times
+ranked search_submissions() calls for common, rare and prefix queries.
+
+Run from backend/:  python benchmarks/bench_search.py [rows per table]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+WORDS = ('platform migration cloud mobile fintech healthcare analytics payments marketplace react python '
+         'kubernetes startup enterprise integration dashboard redesign audit security machine learning').split()
+COMPANIES = [f"{prefix}{suffix}" for prefix in ('Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Vandelay')
+             for suffix in ('', ' Labs', ' Systems', ' Group')]
+QUERIES = ['cloud', 'payments react', 'kube*', 'vandelay', 'zebra', 'audit security python']
+
+
+async def fill(rows: int):
+    rng = random.Random(42)
+    async with database._transaction() as connection:
+        for i in range(rows):
+            text = ' '.join(rng.choice(WORDS) for _ in range(40))
+            company = rng.choice(COMPANIES)
+            await connection.execute("""
+                INSERT INTO contacts (name, email, company, role, service, timeline, budget, message, gdpr_consent)
+                VALUES (?, ?, ?, 'CTO', 'Web', 'soon', '10k', ?, 1)
+            """, (f'User {i}', f'user{i}@example.com', company, text))
+            await connection.execute("""
+                INSERT INTO expert_consultations (client_type, name, email, company, brief_message, consent, details)
+                VALUES ('startup', ?, ?, ?, ?, 1, ?)
+            """, (f'User {i}', f'user{i}@example.com', company, text[:120],
+                  json.dumps({'tech_stack': rng.choice(WORDS), 'stage': 'seed'})))
+
+
+async def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_DIR = Path(tmp)
+        database.DB_FILE = database.DB_DIR / 'contacts.db'
+        await database.init_database()
+        start = time.perf_counter()
+        await fill(rows)
+        print(f"rows={rows} per table, filled in {time.perf_counter() - start:.1f}s")
+        for query in QUERIES:
+            match = database.fts_match_expression(query)
+            timings = []
+            for _ in range(20):
+                start = time.perf_counter()
+                await asyncio.gather(*(database.search_submissions(table, match, 21)
+                                       for table in ('contacts', 'expert_consultations')))
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            print(f"{query!r:<26} p50={timings[10]:7.1f}ms  p95={timings[18]:7.1f}ms")
+        await database.close_database()
+
+
+if __name__ == '__main__':
+    import logging
+    logging.disable(logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,289 @@
+"""
+Offline stand-ins for the email providers, for load and tail-latency testing.
+
+Two servers run in one process:
+
+- a fake HTTP API for Resend (POST /emails, POST /emails/batch) and SendGrid
+  (POST /v3/mail/send), plus GET /stats;
+- a fake SMTP sink that speaks enough SMTP for smtplib (EHLO, AUTH, MAIL,
+  RCPT, DATA, NOOP, RSET, QUIT) and discards the messages.
+
+Both inject latency (fixed, uniform or lognormal), server errors (5xx / 451),
+rate limiting (429 / 421) and timeouts (the request hangs) at configurable
+rates, from a seeded RNG so runs are reproducible.
+
+Run from backend/:
+
+    python benchmarks/fake_providers.py --latency lognormal:80:0.6 --error-rate 0.02 \\
+        --rate-limit-rate 0.01 --timeout-rate 0.001
+
+and point the app at it:
+
+    RESEND_API_KEY=re_fake RESEND_API_BASE=http://127.0.0.1:8025
+    SENDGRID_API_KEY=sg_fake SENDGRID_API_BASE=http://127.0.0.1:8025
+    SMTP_HOST=127.0.0.1 SMTP_PORT=2525 SMTP_TLS=false
+"""
+import os
+import sys
+import uuid
+import random
+import asyncio
+import argparse
+import logging
+from collections import Counter
+from typing import Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+logger = logging.getLogger(__name__)
+
+
+class FaultProfile:
+    """Latency distribution and fault rates shared by the fake servers"""
+
+    def __init__(self, latency: str = 'fixed:0', error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 timeout_rate: float = 0.0, timeout_seconds: float = 60.0, reject_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.reject_rate = reject_rate
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        kind, _, params = latency.partition(':')
+        self._latency_kind = kind
+        self._latency_params = [float(p) for p in params.split(':') if p]
+        if kind not in ('fixed', 'uniform', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {latency}")
+
+    def sample_latency(self) -> float:
+        """Latency in seconds for one request"""
+        params = self._latency_params
+        if self._latency_kind == 'fixed':
+            ms = params[0] if params else 0.0
+        elif self._latency_kind == 'uniform':
+            ms = self.random.uniform(params[0], params[1])
+        else:
+            # lognormal:<median ms>:<sigma>
+            ms = self.random.lognormvariate(0, params[1] if len(params) > 1 else 0.5) * params[0]
+        return ms / 1000
+
+    def outcome(self) -> str:
+        """Pick 'timeout', 'rate_limited', 'error' or 'ok' for one request"""
+        roll = self.random.random()
+        for name, rate in (('timeout', self.timeout_rate), ('rate_limited', self.rate_limit_rate), ('error', self.error_rate)):
+            if roll < rate:
+                return name
+            roll -= rate
+        return 'ok'
+
+    def rejects_message(self) -> bool:
+        return self.random.random() < self.reject_rate
+
+    async def apply(self) -> str:
+        """Sleep for the sampled latency (or the timeout) and return the outcome"""
+        outcome = self.outcome()
+        self.stats[outcome] += 1
+        await asyncio.sleep(self.timeout_seconds if outcome == 'timeout' else self.sample_latency())
+        return outcome
+
+
+# -- fake HTTP API (Resend / SendGrid) --
+
+def _http_failure(outcome: str) -> Optional[Response]:
+    if outcome == 'rate_limited':
+        return JSONResponse({'name': 'rate_limit_exceeded', 'message': 'Too many requests'}, status_code=429,
+                            headers={'Retry-After': '1'})
+    if outcome in ('error', 'timeout'):
+        return JSONResponse({'name': 'internal_server_error', 'message': 'Injected failure'}, status_code=503)
+    return None
+
+
+def create_http_app(profile: FaultProfile) -> Starlette:
+    """Starlette app mimicking the Resend and SendGrid send endpoints"""
+
+    async def resend_send(request: Request):
+        await request.body()
+        failure = _http_failure(await profile.apply())
+        if failure is not None:
+            return failure
+        if profile.rejects_message():
+            profile.stats['rejected'] += 1
+            return JSONResponse({'name': 'validation_error', 'message': 'Invalid `to` field'}, status_code=422)
+        profile.stats['messages'] += 1
+        return JSONResponse({'id': str(uuid.uuid4())})
+
+    async def resend_batch(request: Request):
+        messages = await request.json()
+        failure = _http_failure(await profile.apply())
+        if failure is not None:
+            return failure
+        data, errors = [], []
+        for index, _ in enumerate(messages):
+            if profile.rejects_message():
+                errors.append({'index': index, 'message': 'Invalid `to` field'})
+            else:
+                data.append({'id': str(uuid.uuid4())})
+        profile.stats['messages'] += len(data)
+        profile.stats['rejected'] += len(errors)
+        body = {'data': data}
+        if errors:
+            body['errors'] = errors
+        return JSONResponse(body)
+
+    async def sendgrid_send(request: Request):
+        await request.body()
+        failure = _http_failure(await profile.apply())
+        if failure is not None:
+            return failure
+        if profile.rejects_message():
+            profile.stats['rejected'] += 1
+            return JSONResponse({'errors': [{'message': 'Invalid email', 'field': 'personalizations.0.to'}]}, status_code=400)
+        profile.stats['messages'] += 1
+        return Response(status_code=202)
+
+    async def root(request: Request):
+        # Target of the HTTP client warm-up (HEAD /)
+        return Response(status_code=200)
+
+    async def stats(request: Request):
+        return JSONResponse(dict(profile.stats))
+
+    return Starlette(routes=[
+        Route('/', root, methods=['GET', 'HEAD']),
+        Route('/emails', resend_send, methods=['POST']),
+        Route('/emails/batch', resend_batch, methods=['POST']),
+        Route('/v3/mail/send', sendgrid_send, methods=['POST']),
+        Route('/stats', stats, methods=['GET']),
+    ])
+
+
+# -- fake SMTP sink --
+
+class FakeSMTPServer:
+    """Minimal asyncio SMTP sink with fault injection at end of DATA"""
+
+    def __init__(self, profile: FaultProfile, host: str = '127.0.0.1', port: int = 2525):
+        self.profile = profile
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        profile = self.profile
+        profile.stats['smtp_sessions'] += 1
+
+        async def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        try:
+            await reply('220 fake-smtp ESMTP ready')
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                command = raw.decode(errors='replace').strip()
+                verb = command.split(' ', 1)[0].upper()
+                if verb in ('EHLO', 'HELO'):
+                    await reply('250-fake-smtp\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME' if verb == 'EHLO' else '250 fake-smtp')
+                elif verb == 'AUTH':
+                    parts = command.split()
+                    if len(parts) == 2 and parts[1].upper() == 'LOGIN':
+                        await reply('334 VXNlcm5hbWU6')
+                        await reader.readline()
+                        await reply('334 UGFzc3dvcmQ6')
+                        await reader.readline()
+                    elif len(parts) == 2:
+                        await reply('334 ')
+                        await reader.readline()
+                    await reply('235 2.7.0 Authentication successful')
+                elif verb == 'MAIL':
+                    await reply('250 2.1.0 OK')
+                elif verb == 'RCPT':
+                    if profile.rejects_message():
+                        profile.stats['rejected'] += 1
+                        await reply('550 5.1.1 Mailbox unavailable')
+                    else:
+                        await reply('250 2.1.5 OK')
+                elif verb == 'DATA':
+                    await reply('354 End data with <CR><LF>.<CR><LF>')
+                    while (await reader.readline()) not in (b'.\r\n', b'.\n', b''):
+                        pass
+                    outcome = await profile.apply()
+                    if outcome == 'rate_limited':
+                        await reply('421 4.7.0 Too many messages, closing connection')
+                        break
+                    elif outcome in ('error', 'timeout'):
+                        await reply('451 4.3.0 Injected failure')
+                    else:
+                        profile.stats['messages'] += 1
+                        await reply('250 2.0.0 OK queued')
+                elif verb in ('NOOP', 'RSET'):
+                    await reply('250 2.0.0 OK')
+                elif verb == 'QUIT':
+                    await reply('221 2.0.0 Bye')
+                    break
+                else:
+                    await reply('502 5.5.2 Command not implemented')
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(args):
+    import uvicorn
+
+    profile = FaultProfile(args.latency, args.error_rate, args.rate_limit_rate, args.timeout_rate,
+                           args.timeout_seconds, args.reject_rate, args.seed)
+    smtp = FakeSMTPServer(profile, args.host, args.smtp_port)
+    await smtp.start()
+    config = uvicorn.Config(create_http_app(profile), host=args.host, port=args.http_port,
+                            log_level='warning', access_log=False)
+    logger.info(f"Fake providers: http://{args.host}:{args.http_port} smtp://{args.host}:{smtp.port} latency={args.latency}")
+    try:
+        await uvicorn.Server(config).serve()
+    finally:
+        await smtp.stop()
+        logger.info(f"Fake provider stats: {dict(profile.stats)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default=os.environ.get('FAKE_PROVIDER_HOST', '127.0.0.1'))
+    parser.add_argument('--http-port', type=int, default=int(os.environ.get('FAKE_PROVIDER_HTTP_PORT', '8025')))
+    parser.add_argument('--smtp-port', type=int, default=int(os.environ.get('FAKE_PROVIDER_SMTP_PORT', '2525')))
+    parser.add_argument('--latency', default='fixed:0',
+                        help="fixed:<ms> | uniform:<min ms>:<max ms> | lognormal:<median ms>:<sigma>")
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of 503 / SMTP 451 responses')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='share of 429 / SMTP 421 responses')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='share of requests that hang')
+    parser.add_argument('--timeout-seconds', type=float, default=60.0, help='how long a hanging request hangs')
+    parser.add_argument('--reject-rate', type=float, default=0.0, help='share of individual messages rejected')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,25 +1,25 @@
-async def unsubscribe_email(email: str):
-    """Mark email as unsubscribed in contacts table"""
-    try:
-        await database.connection.execute(
-            "UPDATE contacts SET status = 'unsubscribed' WHERE email = ?",
-            (email,)
-        )
-        await database.connection.commit()
-        logger.info(f"Email unsubscribed: {email}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to unsubscribe email {email}: {e}")
-        return False
 """
 SQLite database configuration and connection
+
+The database runs in WAL mode with one writer connection per process (all
+writes go through _transaction(), which takes the SQLite write lock up front
+with BEGIN IMMEDIATE) and a small pool of read-only connections, so admin
+reads never wait behind form writes. busy_timeout lets the uvicorn workers
+queue for the write lock instead of failing with "database is locked".
+Schema changes are ordered MIGRATIONS applied at startup and tracked in
+PRAGMA user_version.
 """
 import aiosqlite
+import asyncio
 import sqlite3
 import os
+import json
+import time
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
@@ -27,170 +27,685 @@ logger = logging.getLogger(__name__)
 DB_DIR = Path(os.environ.get('DB_DIR', '/var/www/softdab/backend/data'))
 DB_FILE = DB_DIR / 'contacts.db'
 
+# Outbox delivery states
+OUTBOX_PENDING = 'pending'
+OUTBOX_SENDING = 'sending'
+OUTBOX_SENT = 'sent'
+OUTBOX_DEAD = 'dead'
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))
+
+# Connection tuning
+DB_READ_POOL_SIZE = int(os.environ.get('DB_READ_POOL_SIZE', '4'))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', '5000'))
+DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', '16384'))
+DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL').upper()
+# Group commit: inserts arriving within the delay share one transaction (max 1 disables)
+DB_WRITE_BATCH_MAX = int(os.environ.get('DB_WRITE_BATCH_MAX', '64'))
+DB_WRITE_BATCH_DELAY_MS = float(os.environ.get('DB_WRITE_BATCH_DELAY_MS', '2'))
+# Search ranks only the newest matches, so common terms cost the same at any table size
+DB_SEARCH_RANK_WINDOW = int(os.environ.get('DB_SEARCH_RANK_WINDOW', '2000'))
+# Addresses bound per IN (...) list in GDPR lookups (well under SQLite's variable limit)
+GDPR_EMAIL_CHUNK = 500
+
+# Outgoing messages for a submission: a list of message dicts, or a callable
+# that receives the new row id and returns that list.
+OutboxMessages = Union[List[dict], Callable[[int], List[dict]], None]
+
 class Database:
-    connection: aiosqlite.Connection = None
+    """Connection manager: the writer connection plus a pool of readers"""
+    connection: aiosqlite.Connection = None  # single writer
+    # Serializes transactions on the writer so that a submission and its
+    # outbox rows are committed together.
+    write_lock: asyncio.Lock = None
+    readers: asyncio.Queue = None
+    reader_connections: List[aiosqlite.Connection] = []
 
 database = Database()
 
+async def _connect(read_only: bool = False) -> aiosqlite.Connection:
+    """Open a tuned connection; transactions are managed explicitly (autocommit mode)"""
+    connection = await aiosqlite.connect(str(DB_FILE), timeout=DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    await connection.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    if not read_only:
+        # Persistent for the database file; readers inherit it
+        await connection.execute("PRAGMA journal_mode = WAL")
+    await connection.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    await connection.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+    await connection.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    await connection.execute("PRAGMA temp_store = MEMORY")
+    await connection.execute("PRAGMA foreign_keys = ON")
+    if read_only:
+        await connection.execute("PRAGMA query_only = ON")
+    return connection
+
 async def init_database():
     """Initialize SQLite database and create tables"""
     try:
         # Create data directory if it doesn't exist
         DB_DIR.mkdir(parents=True, exist_ok=True)
         
-        # Connect to database
-        database.connection = await aiosqlite.connect(str(DB_FILE))
-        
-        # Enable foreign keys
-        await database.connection.execute("PRAGMA foreign_keys = ON")
-        
-        # Create contacts table
-        await database.connection.execute("""
-            CREATE TABLE IF NOT EXISTS contacts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                company TEXT NOT NULL,
-                role TEXT NOT NULL,
-                service TEXT NOT NULL,
-                timeline TEXT NOT NULL,
-                budget TEXT NOT NULL,
-                message TEXT NOT NULL,
-                gdpr_consent BOOLEAN NOT NULL,
-                marketing_consent BOOLEAN DEFAULT 0,
-                ip_address TEXT,
-                user_agent TEXT,
-                page TEXT,
-                referrer TEXT,
-                status TEXT DEFAULT 'new',
-                submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create staffing_requests table
-        await database.connection.execute("""
-            CREATE TABLE IF NOT EXISTS staffing_requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                company TEXT,
-                roles TEXT NOT NULL,
-                engagement TEXT NOT NULL,
-                seniority TEXT NOT NULL,
-                duration TEXT,
-                start_date TEXT,
-                rate TEXT,
-                message TEXT,
-                gdpr_consent BOOLEAN NOT NULL,
-                ip_address TEXT,
-                user_agent TEXT,
-                status TEXT DEFAULT 'new',
-                submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        # Connect the writer and bring the schema up to date
+        database.connection = await _connect()
+        database.write_lock = asyncio.Lock()
+        await _migrate()
         
-        # Create expert_consultations table for multi-step form
-        await database.connection.execute("""
-            CREATE TABLE IF NOT EXISTS expert_consultations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_type TEXT NOT NULL,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                company TEXT,
-                phone TEXT,
-                brief_message TEXT NOT NULL,
-                consent BOOLEAN NOT NULL,
-                details TEXT,
-                priority INTEGER DEFAULT 5,
-                status TEXT DEFAULT 'new',
-                ip_address TEXT,
-                user_agent TEXT,
-                page_url TEXT,
-                referrer TEXT,
-                utm_source TEXT,
-                utm_medium TEXT,
-                utm_campaign TEXT,
-                submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        # Read-only connections for get_* helpers
+        database.readers = asyncio.Queue()
+        database.reader_connections = []
+        for _ in range(max(DB_READ_POOL_SIZE, 1)):
+            reader = await _connect(read_only=True)
+            database.reader_connections.append(reader)
+            database.readers.put_nowait(reader)
         
-        await database.connection.commit()
-        logger.info(f"SQLite database initialized at {DB_FILE}")
+        logger.info(f"SQLite database initialized at {DB_FILE} (WAL, {len(database.reader_connections)} readers)")
         
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
 
+async def _create_schema():
+    """Migration 1: base tables (idempotent, for databases created before versioning)"""
+    # Create contacts table
+    await database.connection.execute("""
+        CREATE TABLE IF NOT EXISTS contacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            company TEXT NOT NULL,
+            role TEXT NOT NULL,
+            service TEXT NOT NULL,
+            timeline TEXT NOT NULL,
+            budget TEXT NOT NULL,
+            message TEXT NOT NULL,
+            gdpr_consent BOOLEAN NOT NULL,
+            marketing_consent BOOLEAN DEFAULT 0,
+            ip_address TEXT,
+            user_agent TEXT,
+            page TEXT,
+            referrer TEXT,
+            status TEXT DEFAULT 'new',
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Create staffing_requests table
+    await database.connection.execute("""
+        CREATE TABLE IF NOT EXISTS staffing_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            company TEXT,
+            roles TEXT NOT NULL,
+            engagement TEXT NOT NULL,
+            seniority TEXT NOT NULL,
+            duration TEXT,
+            start_date TEXT,
+            rate TEXT,
+            message TEXT,
+            gdpr_consent BOOLEAN NOT NULL,
+            ip_address TEXT,
+            user_agent TEXT,
+            status TEXT DEFAULT 'new',
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Create expert_consultations table for multi-step form
+    await database.connection.execute("""
+        CREATE TABLE IF NOT EXISTS expert_consultations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_type TEXT NOT NULL,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            company TEXT,
+            phone TEXT,
+            brief_message TEXT NOT NULL,
+            consent BOOLEAN NOT NULL,
+            details TEXT,
+            priority INTEGER DEFAULT 5,
+            status TEXT DEFAULT 'new',
+            ip_address TEXT,
+            user_agent TEXT,
+            page_url TEXT,
+            referrer TEXT,
+            utm_source TEXT,
+            utm_medium TEXT,
+            utm_campaign TEXT,
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Create email_outbox table: messages are written in the same
+    # transaction as the submission and delivered by utils.outbox workers
+    await database.connection.execute("""
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            submission_type TEXT NOT NULL,
+            submission_id INTEGER,
+            to_address TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            content TEXT NOT NULL,
+            from_address TEXT,
+            is_html BOOLEAN DEFAULT 0,
+            text_content TEXT,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            max_attempts INTEGER DEFAULT 8,
+            next_attempt_at REAL NOT NULL,
+            locked_until REAL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+    """)
+    await database.connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)"
+    )
+    # Outboxes created before plain-text alternatives were stored
+    async with database.connection.execute("PRAGMA table_info(email_outbox)") as cursor:
+        outbox_columns = {row[1] for row in await cursor.fetchall()}
+    if 'text_content' not in outbox_columns:
+        await database.connection.execute("ALTER TABLE email_outbox ADD COLUMN text_content TEXT")
+    
+    # Create admin_digest_items table: admin notifications held for the
+    # next summary email when digest mode is on (see utils.digest)
+    await database.connection.execute("""
+        CREATE TABLE IF NOT EXISTS admin_digest_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_address TEXT NOT NULL,
+            submission_type TEXT NOT NULL,
+            submission_id INTEGER,
+            subject TEXT NOT NULL,
+            content TEXT NOT NULL,
+            from_address TEXT,
+            created_at REAL NOT NULL
+        )
+    """)
+    await database.connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_admin_digest_items_to ON admin_digest_items (to_address, created_at)"
+    )
+
+async def _add_lookup_indexes():
+    """Migration 2: indexes for the admin lists, status filters and email lookups"""
+    # An index on submitted_at also orders by rowid, so it serves the
+    # (submitted_at, id) keyset pagination without a sort
+    for table, columns in (
+        ('contacts', ('submitted_at', 'email', 'status')),
+        ('staffing_requests', ('submitted_at', 'email', 'status')),
+        ('expert_consultations', ('submitted_at', 'email', 'status', 'client_type', 'priority')),
+    ):
+        for column in columns:
+            await database.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})"
+            )
+
+# Columns indexed for full-text search, per submission table
+SEARCH_COLUMNS = {
+    'contacts': ('name', 'email', 'company', 'message'),
+    'staffing_requests': ('name', 'email', 'company', 'roles', 'message'),
+    'expert_consultations': ('name', 'email', 'company', 'brief_message', 'details'),
+}
+
+async def _add_search_index():
+    """Migration 3: FTS5 indexes over the submission tables, kept in sync by triggers"""
+    for table, columns in SEARCH_COLUMNS.items():
+        fts = f"{table}_fts"
+        names = ', '.join(columns)
+        new_values = ', '.join(f"new.{c}" for c in columns)
+        old_values = ', '.join(f"old.{c}" for c in columns)
+        # External content table: the text lives only in the base table.
+        # prefix='2 3' keeps short prefix queries (acm*) off a full term scan.
+        await database.connection.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {names}, content='{table}', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        """)
+        await database.connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {names}) VALUES (new.id, {new_values});
+            END
+        """)
+        await database.connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});
+            END
+        """)
+        # Status changes do not touch the index
+        await database.connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts} (rowid, {names}) VALUES (new.id, {new_values});
+            END
+        """)
+        # Index rows written before the migration
+        await database.connection.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+# Daily submission counts, kept up to date by insert triggers so analytics
+# never scan the submission tables
+ROLLUP_DIMENSIONS = ('day', 'submission_type', 'client_type', 'priority_band', 'utm_source', 'utm_medium', 'utm_campaign')
+_ROLLUP_TYPES = {'contacts': 'contact', 'staffing_requests': 'staffing', 'expert_consultations': 'expert_consultation'}
+
+def _rollup_values(table: str, row: str = '') -> str:
+    """SQL expressions for ROLLUP_DIMENSIONS of a submission row (row='new.' inside triggers)"""
+    values = [f"date({row}submitted_at)", f"'{_ROLLUP_TYPES[table]}'"]
+    if table == 'expert_consultations':
+        # Bands match the digest bypass (>= 8) and the form's default priority (5)
+        values += [
+            f"coalesce({row}client_type, '')",
+            f"CASE WHEN {row}priority >= 8 THEN 'high' WHEN {row}priority >= 5 THEN 'medium' ELSE 'low' END",
+            f"coalesce({row}utm_source, '')", f"coalesce({row}utm_medium, '')", f"coalesce({row}utm_campaign, '')",
+        ]
+    else:
+        values += ["''"] * 5
+    return ', '.join(values)
+
+async def _recount_rollups() -> int:
+    """Replace submission_daily_rollups with counts of the rows still in the submission tables"""
+    dimensions = ', '.join(ROLLUP_DIMENSIONS)
+    positions = ', '.join(str(i) for i in range(1, len(ROLLUP_DIMENSIONS) + 1))
+    await database.connection.execute("DELETE FROM submission_daily_rollups")
+    for table in _ROLLUP_TYPES:
+        # Group by position: a name such as client_type would resolve to the
+        # raw column, splitting NULL and '' into two rows for the same key
+        await database.connection.execute(f"""
+            INSERT INTO submission_daily_rollups ({dimensions}, submissions)
+            SELECT {_rollup_values(table)}, COUNT(*) FROM {table} GROUP BY {positions}
+        """)
+    async with database.connection.execute("SELECT COUNT(*) FROM submission_daily_rollups") as cursor:
+        return (await cursor.fetchone())[0]
+
+async def rebuild_rollups() -> int:
+    """Recount the analytics rollups in one write transaction; returns the number of rollup rows"""
+    async with _transaction():
+        return await _recount_rollups()
+
+async def _add_rollups():
+    """Migration 4: daily rollup table, insert triggers and a backfill"""
+    dimensions = ', '.join(ROLLUP_DIMENSIONS)
+    # Empty strings rather than NULLs, so the primary key matches on upsert
+    await database.connection.execute(f"""
+        CREATE TABLE IF NOT EXISTS submission_daily_rollups (
+            day TEXT NOT NULL,
+            submission_type TEXT NOT NULL,
+            client_type TEXT NOT NULL DEFAULT '',
+            priority_band TEXT NOT NULL DEFAULT '',
+            utm_source TEXT NOT NULL DEFAULT '',
+            utm_medium TEXT NOT NULL DEFAULT '',
+            utm_campaign TEXT NOT NULL DEFAULT '',
+            submissions INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY ({dimensions})
+        ) WITHOUT ROWID
+    """)
+    for table in _ROLLUP_TYPES:
+        await database.connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_rollup_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO submission_daily_rollups ({dimensions}, submissions)
+                VALUES ({_rollup_values(table, 'new.')}, 1)
+                ON CONFLICT ({dimensions}) DO UPDATE SET submissions = submissions + 1;
+            END
+        """)
+    await _recount_rollups()
+
+async def _add_retention_indexes():
+    """Migration 5: partial indexes so retention batches skip rows already handled"""
+    # Anonymized rows stay older than the cutoff forever; leaving them out of
+    # the index keeps each batch a short range scan
+    for table in SUBMISSION_TABLES:
+        await database.connection.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_retention ON {table} (submitted_at) "
+            f"WHERE status IS NOT 'anonymized'"
+        )
+    await database.connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_email_outbox_retention ON email_outbox (created_at) "
+        "WHERE status IN ('sent', 'dead')"
+    )
+
+async def _add_gdpr_tables():
+    """Migration 6: case-insensitive email lookups and the GDPR request audit log"""
+    for table in SUBMISSION_TABLES:
+        await database.connection.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_email_lower ON {table} (lower(email))"
+        )
+    # Subjects are stored as a hash of the address list so that the audit log
+    # does not keep the addresses an erasure removed
+    await database.connection.execute("""
+        CREATE TABLE IF NOT EXISTS gdpr_audit_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            action TEXT NOT NULL,
+            reference TEXT,
+            subjects INTEGER NOT NULL,
+            subjects_sha256 TEXT NOT NULL,
+            rows TEXT,
+            completed_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+async def _add_email_suppressions():
+    """Migration 7: recipients that must not be emailed (unsubscribed or bounced)"""
+    await database.connection.execute("""
+        CREATE TABLE IF NOT EXISTS email_suppressions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL UNIQUE,
+            reason TEXT NOT NULL,
+            source TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Addresses unsubscribed before the list existed
+    await database.connection.execute("""
+        INSERT OR IGNORE INTO email_suppressions (email, reason, source)
+        SELECT DISTINCT lower(email), 'unsubscribed', 'contacts' FROM contacts WHERE status = 'unsubscribed'
+    """)
+
+async def _add_submission_versions():
+    """Migration 8: per-table change counters behind the admin list ETags"""
+    await database.connection.execute("""
+        CREATE TABLE IF NOT EXISTS submission_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            modified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    """)
+    for table in SUBMISSION_TABLES:
+        await database.connection.execute(
+            "INSERT OR IGNORE INTO submission_versions (name) VALUES (?)", (table,)
+        )
+        # Any write to the table moves its version, so an unchanged version
+        # means an unchanged list
+        for name, event in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE')):
+            await database.connection.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{name} AFTER {event} ON {table} BEGIN
+                    UPDATE submission_versions SET version = version + 1, modified_at = CURRENT_TIMESTAMP
+                    WHERE name = '{table}';
+                END
+            """)
+
+# Ordered schema migrations; PRAGMA user_version holds the last one applied.
+# Append new steps, never edit or reorder released ones.
+MIGRATIONS: List[Tuple[int, str, Callable[[], Awaitable[None]]]] = [
+    (1, 'base tables', _create_schema),
+    (2, 'lookup indexes', _add_lookup_indexes),
+    (3, 'full-text search', _add_search_index),
+    (4, 'analytics rollups', _add_rollups),
+    (5, 'retention indexes', _add_retention_indexes),
+    (6, 'gdpr requests', _add_gdpr_tables),
+    (7, 'email suppressions', _add_email_suppressions),
+    (8, 'submission versions', _add_submission_versions),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+async def _migrate():
+    """Apply pending migrations in one write transaction"""
+    # BEGIN IMMEDIATE is the cross-process lock: other workers starting at the
+    # same time wait here (busy_timeout) and then see the new user_version
+    async with _transaction() as connection:
+        async with connection.execute("PRAGMA user_version") as cursor:
+            current = (await cursor.fetchone())[0]
+        if current > SCHEMA_VERSION:
+            raise RuntimeError(f"Database schema version {current} is newer than this code ({SCHEMA_VERSION})")
+        for version, description, migration in MIGRATIONS:
+            if version > current:
+                await migration()
+                logger.info(f"Applied database migration {version}: {description}")
+        if current < SCHEMA_VERSION:
+            await connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
 async def close_database():
-    """Close database connection"""
+    """Flush pending writes, then close the reader and writer connections"""
+    await write_batcher.stop()
+    for reader in database.reader_connections:
+        await reader.close()
+    database.reader_connections = []
+    database.readers = None
     if database.connection:
         await database.connection.close()
+        database.connection = None
         logger.info("Closed database connection")
 
-async def save_contact(contact_data: dict):
-    """Save contact form submission to database"""
+@asynccontextmanager
+async def _transaction():
+    """Run statements on the shared connection as one committed transaction"""
+    async with database.write_lock:
+        # Take the SQLite write lock now rather than on the first write, so a
+        # busy database is waited for (busy_timeout) instead of failing mid-way
+        await database.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield database.connection
+            await database.connection.execute("COMMIT")
+        except BaseException:
+            await database.connection.execute("ROLLBACK")
+            raise
+
+WriteUnit = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+class WriteBatcher:
+    """Group commit for form inserts.
+
+    Write units arriving within DB_WRITE_BATCH_DELAY_MS of each other (up to
+    DB_WRITE_BATCH_MAX) run in one transaction, each under its own SAVEPOINT so
+    a failing unit is rolled back alone. Callers are resolved only after the
+    COMMIT, so an acknowledged submission is as durable as before; the batch
+    just shares one fsync.
+    """
+
+    def __init__(self, max_batch: int = DB_WRITE_BATCH_MAX, max_delay_ms: float = DB_WRITE_BATCH_DELAY_MS):
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.batches = 0
+        self.units = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def submit(self, unit: WriteUnit) -> Any:
+        """Run unit(connection) in the next group commit and return its result"""
+        if self.max_batch <= 1:
+            async with _transaction() as connection:
+                return await unit(connection)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((unit, future))
+        return await future
+
+    async def stop(self):
+        """Commit what is queued and stop the batching task"""
+        if self._task is not None and not self._task.done() and self._loop is asyncio.get_running_loop():
+            self._queue.put_nowait(None)
+            await self._task
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._commit(batch)
+
+    async def _commit(self, batch: list):
+        batch = [(unit, future) for unit, future in batch if not future.cancelled()]
+        if not batch:
+            return
+        outcomes = []
+        try:
+            async with _transaction() as connection:
+                for unit, _ in batch:
+                    await connection.execute("SAVEPOINT write_unit")
+                    try:
+                        outcomes.append((True, await unit(connection)))
+                        await connection.execute("RELEASE write_unit")
+                    except Exception as e:
+                        await connection.execute("ROLLBACK TO write_unit")
+                        await connection.execute("RELEASE write_unit")
+                        outcomes.append((False, e))
+        except Exception as e:
+            logger.error(f"Group commit of {len(batch)} writes failed: {e}")
+            outcomes = [(False, e)] * len(batch)
+        self.batches += 1
+        self.units += len(batch)
+        for (_, future), (ok, value) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+write_batcher = WriteBatcher()
+
+@asynccontextmanager
+async def _read():
+    """Borrow a read-only connection from the pool"""
+    reader = await database.readers.get()
     try:
+        yield reader
+    finally:
+        database.readers.put_nowait(reader)
+
+async def _enqueue_outbox(submission_type: str, submission_id: int, messages: OutboxMessages):
+    """Insert outgoing messages into email_outbox (caller commits).
+
+    Messages flagged with 'digest' go to admin_digest_items instead and are
+    sent later as part of a summary email.
+    """
+    if callable(messages):
+        messages = messages(submission_id)
+    now = time.time()
+    for message in messages or []:
+        if message.get('digest'):
+            await database.connection.execute("""
+                INSERT INTO admin_digest_items (
+                    to_address, submission_type, submission_id, subject, content, from_address, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (
+                message['to_address'],
+                submission_type,
+                submission_id,
+                message['subject'],
+                message['content'],
+                message.get('from_address'),
+                now
+            ))
+            continue
         await database.connection.execute("""
-            INSERT INTO contacts (
-                name, email, company, role, service, timeline, budget, message,
-                gdpr_consent, marketing_consent, ip_address, user_agent, page, referrer
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO email_outbox (
+                submission_type, submission_id, to_address, subject, content,
+                from_address, is_html, text_content, max_attempts, next_attempt_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
-            contact_data.get('name'),
-            contact_data.get('email'),
-            contact_data.get('company'),
-            contact_data.get('role'),
-            contact_data.get('service'),
-            contact_data.get('timeline'),
-            contact_data.get('budget'),
-            contact_data.get('message'),
-            contact_data.get('gdprConsent'),
-            contact_data.get('marketingConsent', False),
-            contact_data.get('ip_address'),
-            contact_data.get('user_agent'),
-            contact_data.get('page'),
-            contact_data.get('referrer')
+            submission_type,
+            submission_id,
+            message['to_address'],
+            message['subject'],
+            message['content'],
+            message.get('from_address'),
+            message.get('is_html', False),
+            message.get('text_content'),
+            message.get('max_attempts', OUTBOX_MAX_ATTEMPTS),
+            now
         ))
+
+async def save_contact(contact_data: dict, outbox: OutboxMessages = None):
+    """Save contact form submission (and its outgoing emails); returns the new row id or False"""
+    try:
+        async def insert(connection):
+            cursor = await connection.execute("""
+                INSERT INTO contacts (
+                    name, email, company, role, service, timeline, budget, message,
+                    gdpr_consent, marketing_consent, ip_address, user_agent, page, referrer
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                contact_data.get('name'),
+                contact_data.get('email'),
+                contact_data.get('company'),
+                contact_data.get('role'),
+                contact_data.get('service'),
+                contact_data.get('timeline'),
+                contact_data.get('budget'),
+                contact_data.get('message'),
+                contact_data.get('gdprConsent'),
+                contact_data.get('marketingConsent', False),
+                contact_data.get('ip_address'),
+                contact_data.get('user_agent'),
+                contact_data.get('page'),
+                contact_data.get('referrer')
+            ))
+            contact_id = cursor.lastrowid
+            await _enqueue_outbox('contact', contact_id, outbox)
+            return contact_id
+        
+        # Committed together with other submissions arriving at the same time
+        contact_id = await write_batcher.submit(insert)
         
-        await database.connection.commit()
         logger.info(f"Contact form saved: {contact_data.get('email')}")
-        return True
+        return contact_id
         
     except Exception as e:
         logger.error(f"Failed to save contact: {e}")
         return False
 
-async def save_staffing_request(data: dict):
-    """Save staffing request to database"""
+async def save_staffing_request(data: dict, outbox: OutboxMessages = None):
+    """Save staffing request (and its outgoing emails); returns the new row id or False"""
     try:
         # roles stored as comma-separated for simplicity
         roles_value = ", ".join(data.get('roles') or [])
-        await database.connection.execute(
-            """
-            INSERT INTO staffing_requests (
-                name, email, company, roles, engagement, seniority, duration,
-                start_date, rate, message, gdpr_consent, ip_address, user_agent
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                data.get('name'),
-                data.get('email'),
-                data.get('company') or "",
-                roles_value,
-                data.get('engagement'),
-                data.get('seniority'),
-                data.get('duration') or "",
-                data.get('startDate') or "",
-                data.get('rate') or "",
-                data.get('message') or "",
-                data.get('gdprConsent'),
-                data.get('ip_address'),
-                data.get('user_agent'),
+        async def insert(connection):
+            cursor = await connection.execute(
+                """
+                INSERT INTO staffing_requests (
+                    name, email, company, roles, engagement, seniority, duration,
+                    start_date, rate, message, gdpr_consent, ip_address, user_agent
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    data.get('name'),
+                    data.get('email'),
+                    data.get('company') or "",
+                    roles_value,
+                    data.get('engagement'),
+                    data.get('seniority'),
+                    data.get('duration') or "",
+                    data.get('startDate') or "",
+                    data.get('rate') or "",
+                    data.get('message') or "",
+                    data.get('gdprConsent'),
+                    data.get('ip_address'),
+                    data.get('user_agent'),
+                )
             )
-        )
-        await database.connection.commit()
+            request_id = cursor.lastrowid
+            await _enqueue_outbox('staffing', request_id, outbox)
+            return request_id
+        
+        # Committed together with other submissions arriving at the same time
+        request_id = await write_batcher.submit(insert)
         logger.info(f"Staffing request saved: {data.get('email')}")
-        return True
+        return request_id
     except Exception as e:
         logger.error(f"Failed to save staffing request: {e}")
         return False
@@ -198,7 +713,7 @@ async def save_staffing_request(data: dict):
 async def get_all_contacts():
     """Get all contact form submissions"""
     try:
-        async with database.connection.execute(
+        async with _read() as reader, reader.execute(
             "SELECT * FROM contacts ORDER BY submitted_at DESC"
         ) as cursor:
             rows = await cursor.fetchall()
@@ -208,37 +723,41 @@ async def get_all_contacts():
         logger.error(f"Failed to fetch contacts: {e}")
         return []
 
-async def save_expert_consultation(consultation_data: dict):
-    """Save expert consultation form submission to database"""
+async def save_expert_consultation(consultation_data: dict, outbox: OutboxMessages = None):
+    """Save expert consultation form submission (and its outgoing emails) to database"""
     try:
-        await database.connection.execute("""
-            INSERT INTO expert_consultations (
-                client_type, name, email, company, phone, brief_message, consent,
-                details, priority, ip_address, user_agent, page_url, referrer,
-                utm_source, utm_medium, utm_campaign
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            consultation_data.get('client_type'),
-            consultation_data.get('name'),
-            consultation_data.get('email'),
-            consultation_data.get('company'),
-            consultation_data.get('phone'),
-            consultation_data.get('brief_message'),
-            consultation_data.get('consent'),
-            consultation_data.get('details'),
-            consultation_data.get('priority', 5),
-            consultation_data.get('ip_address'),
-            consultation_data.get('user_agent'),
-            consultation_data.get('page_url'),
-            consultation_data.get('referrer'),
-            consultation_data.get('utm_source'),
-            consultation_data.get('utm_medium'),
-            consultation_data.get('utm_campaign')
-        ))
+        async def insert(connection):
+            cursor = await connection.execute("""
+                INSERT INTO expert_consultations (
+                    client_type, name, email, company, phone, brief_message, consent,
+                    details, priority, ip_address, user_agent, page_url, referrer,
+                    utm_source, utm_medium, utm_campaign
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                consultation_data.get('client_type'),
+                consultation_data.get('name'),
+                consultation_data.get('email'),
+                consultation_data.get('company'),
+                consultation_data.get('phone'),
+                consultation_data.get('brief_message'),
+                consultation_data.get('consent'),
+                consultation_data.get('details'),
+                consultation_data.get('priority', 5),
+                consultation_data.get('ip_address'),
+                consultation_data.get('user_agent'),
+                consultation_data.get('page_url'),
+                consultation_data.get('referrer'),
+                consultation_data.get('utm_source'),
+                consultation_data.get('utm_medium'),
+                consultation_data.get('utm_campaign')
+            ))
+            consultation_id = cursor.lastrowid
+            await _enqueue_outbox('expert_consultation', consultation_id, outbox)
+            return consultation_id
+        
+        # Committed together with other submissions arriving at the same time
+        consultation_id = await write_batcher.submit(insert)
         
-        await database.connection.commit()
-        cursor = await database.connection.execute("SELECT last_insert_rowid()")
-        consultation_id = (await cursor.fetchone())[0]
         logger.info(f"Expert consultation saved: {consultation_data.get('email')} (ID: {consultation_id})")
         return consultation_id
         
@@ -249,7 +768,7 @@ async def save_expert_consultation(consultation_data: dict):
 async def get_all_expert_consultations():
     """Get all expert consultation submissions"""
     try:
-        async with database.connection.execute(
+        async with _read() as reader, reader.execute(
             "SELECT * FROM expert_consultations ORDER BY submitted_at DESC"
         ) as cursor:
             rows = await cursor.fetchall()
@@ -262,7 +781,7 @@ async def get_all_expert_consultations():
 async def get_expert_consultation_by_id(consultation_id: int):
     """Get expert consultation by ID"""
     try:
-        async with database.connection.execute(
+        async with _read() as reader, reader.execute(
             "SELECT * FROM expert_consultations WHERE id = ?", (consultation_id,)
         ) as cursor:
             row = await cursor.fetchone()
@@ -274,24 +793,405 @@ async def get_expert_consultation_by_id(consultation_id: int):
         logger.error(f"Failed to fetch expert consultation {consultation_id}: {e}")
         return None
 
+SUBMISSION_TABLES = ('contacts', 'staffing_requests', 'expert_consultations')
+
+def _submissions_page_query(table: str, columns: Optional[List[str]], limit: int,
+                            after: Optional[Tuple[str, int]] = None,
+                            truncate: Optional[Dict[str, int]] = None,
+                            since: Optional[str] = None, until: Optional[str] = None) -> Tuple[str, list]:
+    """SQL and parameters for get_submissions_page()"""
+    if table not in SUBMISSION_TABLES:
+        raise ValueError(f"Unknown submission table: {table}")
+    # Column names come from the routes' allow-lists, values are always bound
+    select, params = [], []
+    for column in dict.fromkeys(['id', 'submitted_at', *columns]) if columns is not None else ['*']:
+        if truncate and column in truncate:
+            select.append(f"CASE WHEN length({column}) > ? THEN substr({column}, 1, ?) || '...' "
+                          f"ELSE {column} END AS {column}")
+            params += [truncate[column], truncate[column]]
+        else:
+            select.append(column)
+    conditions = []
+    if after:
+        conditions.append("(submitted_at, id) < (?, ?)")
+        params += list(after)
+    if since:
+        conditions.append("submitted_at >= ?")
+        params.append(since)
+    if until:
+        conditions.append("submitted_at < ?")
+        params.append(until)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    params.append(limit)
+    return f"SELECT {', '.join(select)} FROM {table} {where} ORDER BY submitted_at DESC, id DESC LIMIT ?", params
+
+async def get_submissions_page(table: str, columns: Optional[List[str]], limit: int,
+                               after: Optional[Tuple[str, int]] = None,
+                               truncate: Optional[Dict[str, int]] = None,
+                               since: Optional[str] = None, until: Optional[str] = None) -> List[dict]:
+    """Newest-first page of submissions after the (submitted_at, id) key; columns=None selects all; raises on errors"""
+    sql, params = _submissions_page_query(table, columns, limit, after, truncate, since, until)
+    async with _read() as reader, reader.execute(sql, params) as cursor:
+        rows = await cursor.fetchall()
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+async def get_submission_columns(table: str) -> List[str]:
+    """Column names of a submission table, in table order"""
+    if table not in SUBMISSION_TABLES:
+        raise ValueError(f"Unknown submission table: {table}")
+    async with _read() as reader, reader.execute(f"PRAGMA table_info({table})") as cursor:
+        return [row[1] for row in await cursor.fetchall()]
+
+async def get_submission(table: str, submission_id: int) -> Optional[dict]:
+    """Get one submission by ID; raises on errors"""
+    if table not in SUBMISSION_TABLES:
+        raise ValueError(f"Unknown submission table: {table}")
+    async with _read() as reader, reader.execute(
+        f"SELECT * FROM {table} WHERE id = ?", (submission_id,)
+    ) as cursor:
+        row = await cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([description[0] for description in cursor.description], row))
+
+async def get_submission_version(table: str) -> Tuple[int, Optional[str]]:
+    """Change counter and UTC time of the last write to a submission table; raises on errors"""
+    if table not in SUBMISSION_TABLES:
+        raise ValueError(f"Unknown submission table: {table}")
+    async with _read() as reader, reader.execute(
+        "SELECT version, modified_at FROM submission_versions WHERE name = ?", (table,)
+    ) as cursor:
+        row = await cursor.fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+# Markers around matched terms in search snippets (replaced after escaping)
+SNIPPET_MATCH_START = '\x02'
+SNIPPET_MATCH_END = '\x03'
+
+def fts_match_expression(text: str) -> Optional[str]:
+    """Turn a search box string into an FTS5 query: every word must match, a trailing * makes it a prefix"""
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*')
+        word = word.replace('"', '').strip('*')
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return ' '.join(terms) or None
+
+async def search_submissions(table: str, match: str, limit: int, offset: int = 0) -> List[dict]:
+    """Best-ranked (bm25) of the newest DB_SEARCH_RANK_WINDOW matches, with a snippet; raises on errors"""
+    if table not in SEARCH_COLUMNS:
+        raise ValueError(f"Unknown submission table: {table}")
+    fts = f"{table}_fts"
+    # bm25 has to score every candidate; walking the doclist newest-first to
+    # find the window's lowest rowid is cheap, scoring 100k matches is not
+    async with _read() as reader, reader.execute(f"""
+        SELECT t.id, t.name, t.email, t.company, t.status, t.submitted_at,
+               snippet({fts}, -1, ?, ?, '…', 12) AS snippet, {fts}.rank AS rank
+        FROM {fts} JOIN {table} t ON t.id = {fts}.rowid
+        WHERE {fts} MATCH ? AND {fts}.rowid >= coalesce((
+            SELECT rowid FROM {fts} WHERE {fts} MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?
+        ), 0)
+        ORDER BY {fts}.rank
+        LIMIT ? OFFSET ?
+    """, (SNIPPET_MATCH_START, SNIPPET_MATCH_END, match, match, DB_SEARCH_RANK_WINDOW - 1,
+          limit, offset)) as cursor:
+        rows = await cursor.fetchall()
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+def _expire_rows_query(table: str, timestamp_column: str, condition: str,
+                       anonymize: Optional[Dict[str, Any]]) -> Tuple[str, list]:
+    """SQL and leading parameters for expire_rows_batch() (cutoff and limit are appended)"""
+    select = (f"SELECT id FROM {table} WHERE {timestamp_column} < ? AND {condition} "
+              f"ORDER BY {timestamp_column} LIMIT ?")
+    if anonymize is None:
+        return f"DELETE FROM {table} WHERE id IN ({select})", []
+    assignments = ', '.join(f"{column} = ?" for column in anonymize)
+    return (f"UPDATE {table} SET {assignments}, status = 'anonymized' WHERE id IN ({select})",
+            list(anonymize.values()))
+
+async def expire_rows_batch(table: str, timestamp_column: str, cutoff: str, batch_size: int,
+                            condition: str = "1", anonymize: Optional[Dict[str, Any]] = None) -> int:
+    """Delete, or anonymize with the given column values, the oldest rows before cutoff; returns rows changed
+
+    One short write transaction per call; table, columns and condition are trusted.
+    """
+    sql, params = _expire_rows_query(table, timestamp_column, condition, anonymize)
+    async with _transaction() as connection:
+        cursor = await connection.execute(sql, [*params, cutoff, batch_size])
+        return cursor.rowcount
+
+async def anonymize_submission(table: str, submission_id: int, values: Dict[str, Any]) -> bool:
+    """Overwrite one submission's personal data; returns False when the row does not exist"""
+    if table not in SUBMISSION_TABLES:
+        raise ValueError(f"Unknown submission table: {table}")
+    assignments = ', '.join(f"{column} = ?" for column in values)
+    async with _transaction() as connection:
+        cursor = await connection.execute(
+            f"UPDATE {table} SET {assignments}, status = 'anonymized' WHERE id = ?",
+            [*values.values(), submission_id]
+        )
+        return cursor.rowcount > 0
+
+def _email_chunks(emails: List[str]):
+    """Split lowercased addresses into chunks that fit one IN (...) list"""
+    for start in range(0, len(emails), GDPR_EMAIL_CHUNK):
+        chunk = emails[start:start + GDPR_EMAIL_CHUNK]
+        yield chunk, ', '.join('?' * len(chunk))
+
+async def get_submissions_by_email(table: str, emails: List[str]) -> List[dict]:
+    """Every submission whose email is in the (lowercased) list; raises on errors"""
+    if table not in SUBMISSION_TABLES:
+        raise ValueError(f"Unknown submission table: {table}")
+    rows = []
+    async with _read() as reader:
+        for chunk, placeholders in _email_chunks(emails):
+            async with reader.execute(
+                f"SELECT * FROM {table} WHERE lower(email) IN ({placeholders}) ORDER BY id", chunk
+            ) as cursor:
+                names = [description[0] for description in cursor.description]
+                rows += [dict(zip(names, row)) for row in await cursor.fetchall()]
+    return rows
+
+async def erase_submissions_by_email(emails: List[str], values: Dict[str, Dict[str, Any]],
+                                     reference: Optional[str], subjects_sha256: str) -> Tuple[int, Dict[str, int]]:
+    """Anonymize every submission from the (lowercased) addresses and drop the emails about them
+
+    Outbox emails to the addresses go, and so do the admin notifications and
+    digest items for their submissions, which quote the submission. One
+    transaction covers all tables and the audit record; returns (audit id,
+    rows changed per table).
+    """
+    changed = {table: 0 for table in values}
+    changed['email_outbox'] = 0
+    changed['admin_digest_items'] = 0
+    async with _transaction() as connection:
+        for chunk, placeholders in _email_chunks(emails):
+            for table, fields in values.items():
+                # Before the update below replaces the address these match on
+                submissions = f"SELECT id FROM {table} WHERE lower(email) IN ({placeholders})"
+                for copies in ('email_outbox', 'admin_digest_items'):
+                    cursor = await connection.execute(
+                        f"DELETE FROM {copies} WHERE submission_type = ? AND submission_id IN ({submissions})",
+                        [_ROLLUP_TYPES[table], *chunk]
+                    )
+                    changed[copies] += cursor.rowcount
+                assignments = ', '.join(f"{column} = ?" for column in fields)
+                cursor = await connection.execute(
+                    f"UPDATE {table} SET {assignments}, status = 'anonymized' WHERE lower(email) IN ({placeholders})",
+                    [*fields.values(), *chunk]
+                )
+                changed[table] += cursor.rowcount
+            cursor = await connection.execute(
+                f"DELETE FROM email_outbox WHERE lower(to_address) IN ({placeholders})", chunk
+            )
+            changed['email_outbox'] += cursor.rowcount
+        cursor = await connection.execute("""
+            INSERT INTO gdpr_audit_log (action, reference, subjects, subjects_sha256, rows, completed_at)
+            VALUES ('erase', ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (reference, len(emails), subjects_sha256, json.dumps(changed)))
+        return cursor.lastrowid, changed
+
+async def start_gdpr_audit(action: str, reference: Optional[str], subjects: int, subjects_sha256: str) -> int:
+    """Record a GDPR request before it runs; returns the audit id"""
+    async with _transaction() as connection:
+        cursor = await connection.execute(
+            "INSERT INTO gdpr_audit_log (action, reference, subjects, subjects_sha256) VALUES (?, ?, ?, ?)",
+            (action, reference, subjects, subjects_sha256)
+        )
+        return cursor.lastrowid
+
+async def complete_gdpr_audit(audit_id: int, rows: Dict[str, int]):
+    async with _transaction() as connection:
+        await connection.execute(
+            "UPDATE gdpr_audit_log SET rows = ?, completed_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (json.dumps(rows), audit_id)
+        )
+
+async def get_gdpr_audit_log(limit: int) -> List[dict]:
+    """Latest GDPR requests first; raises on errors"""
+    async with _read() as reader, reader.execute(
+        "SELECT * FROM gdpr_audit_log ORDER BY id DESC LIMIT ?", (limit,)
+    ) as cursor:
+        names = [description[0] for description in cursor.description]
+        return [{**dict(zip(names, row)), 'rows': json.loads(row[names.index('rows')] or 'null')}
+                for row in await cursor.fetchall()]
+
+async def suppress_emails(emails: List[str], reason: str, source: Optional[str] = None) -> int:
+    """Add lowercased addresses to the suppression list; returns how many were new"""
+    async with _transaction() as connection:
+        cursor = await connection.executemany(
+            "INSERT OR IGNORE INTO email_suppressions (email, reason, source) VALUES (?, ?, ?)",
+            [(email, reason, source) for email in emails]
+        )
+        return cursor.rowcount
+
+async def unsubscribe_email(email: str):
+    """Suppress an address and mark its contact submissions as unsubscribed"""
+    try:
+        async with _transaction() as connection:
+            await connection.execute(
+                "INSERT OR IGNORE INTO email_suppressions (email, reason, source) VALUES (?, 'unsubscribed', 'link')",
+                (email.strip().lower(),)
+            )
+            await connection.execute(
+                "UPDATE contacts SET status = 'unsubscribed' WHERE lower(email) = ?",
+                (email.strip().lower(),)
+            )
+        logger.info(f"Email unsubscribed: {email}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to unsubscribe email {email}: {e}")
+        return False
+
+async def get_suppressed_emails(after_id: int = 0) -> Tuple[List[str], int]:
+    """Suppressed addresses added after after_id, and the last id seen; raises on errors"""
+    async with _read() as reader, reader.execute(
+        "SELECT id, email FROM email_suppressions WHERE id > ? ORDER BY id", (after_id,)
+    ) as cursor:
+        rows = await cursor.fetchall()
+    return [row[1] for row in rows], (rows[-1][0] if rows else after_id)
+
+async def optimize_database():
+    """Refresh query planner statistics after large deletes (cheap when nothing changed)"""
+    async with _transaction() as connection:
+        await connection.execute("PRAGMA optimize")
+
 async def update_expert_consultation_status(consultation_id: int, status: str):
     """Update expert consultation status"""
     try:
-        await database.connection.execute(
-            "UPDATE expert_consultations SET status = ? WHERE id = ?", 
-            (status, consultation_id)
-        )
-        await database.connection.commit()
+        async with _transaction():
+            await database.connection.execute(
+                "UPDATE expert_consultations SET status = ? WHERE id = ?", 
+                (status, consultation_id)
+            )
         logger.info(f"Expert consultation {consultation_id} status updated to {status}")
         return True
     except Exception as e:
         logger.error(f"Failed to update expert consultation status: {e}")
         return False
 
+async def claim_outbox_messages(limit: int = 1, lease_seconds: float = 120,
+                                submission_type: Optional[str] = None,
+                                submission_id: Optional[int] = None) -> List[dict]:
+    """Atomically claim due outbox messages for delivery.
+
+    Pending messages whose next_attempt_at has passed are claimed, as well as
+    messages left in 'sending' by a worker whose lease expired (crash/restart).
+    The attempt counter is bumped at claim time so a message that keeps
+    killing its worker is still dead-lettered eventually. Pass submission_type
+    and submission_id to claim only the messages of one submission.
+    """
+    now = time.time()
+    submission_filter = ""
+    params = [OUTBOX_SENDING, now + lease_seconds, OUTBOX_PENDING, now, OUTBOX_SENDING, now]
+    if submission_type is not None:
+        submission_filter = "AND submission_type = ? AND submission_id = ?"
+        params += [submission_type, submission_id]
+    params.append(limit)
+    async with _transaction():
+        async with database.connection.execute(f"""
+            UPDATE email_outbox
+            SET status = ?, locked_until = ?, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE ((status = ? AND next_attempt_at <= ?)
+                   OR (status = ? AND locked_until <= ?))
+                  {submission_filter}
+                ORDER BY next_attempt_at, id
+                LIMIT ?
+            )
+            RETURNING *
+        """, params) as cursor:
+            rows = await cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in rows]
+
+async def mark_outbox_sent(message_id: int):
+    """Mark an outbox message as delivered"""
+    async with _transaction():
+        await database.connection.execute(
+            "UPDATE email_outbox SET status = ?, locked_until = NULL, last_error = NULL, sent_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (OUTBOX_SENT, message_id)
+        )
+
+async def mark_outbox_failed(message_id: int, error: str, retry_at: Optional[float]):
+    """Reschedule a failed outbox message, or dead-letter it when retry_at is None"""
+    async with _transaction():
+        if retry_at is None:
+            await database.connection.execute(
+                "UPDATE email_outbox SET status = ?, locked_until = NULL, last_error = ? WHERE id = ?",
+                (OUTBOX_DEAD, error, message_id)
+            )
+        else:
+            await database.connection.execute(
+                "UPDATE email_outbox SET status = ?, locked_until = NULL, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                (OUTBOX_PENDING, error, retry_at, message_id)
+            )
+
+async def get_outbox_stats() -> dict:
+    """Count outbox messages by delivery status"""
+    try:
+        async with _read() as reader, reader.execute(
+            "SELECT status, COUNT(*) FROM email_outbox GROUP BY status"
+        ) as cursor:
+            return {status: count for status, count in await cursor.fetchall()}
+    except Exception as e:
+        logger.error(f"Failed to fetch outbox stats: {e}")
+        return {}
+
+async def get_rollup_counts(group_by: List[str], since: str, until: str,
+                            filters: Optional[Dict[str, str]] = None) -> List[dict]:
+    """Sum daily rollups between two days (inclusive) grouped by the given dimensions; raises on errors"""
+    unknown = [d for d in [*group_by, *(filters or {})] if d not in ROLLUP_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown rollup dimensions: {unknown}")
+    conditions, params = ["day BETWEEN ? AND ?"], [since, until]
+    for dimension, value in (filters or {}).items():
+        conditions.append(f"{dimension} = ?")
+        params.append(value)
+    select = ', '.join([*group_by, 'SUM(submissions) AS submissions'])
+    group = f"GROUP BY {', '.join(group_by)} ORDER BY {', '.join(group_by)}" if group_by else ""
+    async with _read() as reader, reader.execute(
+        f"SELECT {select} FROM submission_daily_rollups WHERE {' AND '.join(conditions)} {group}", params
+    ) as cursor:
+        rows = await cursor.fetchall()
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in rows if row[-1] is not None]
+
+async def get_due_digest_recipients(window_seconds: float, max_items: int) -> List[str]:
+    """Admin addresses whose oldest digest item is older than the window or that reached max_items"""
+    async with _read() as reader, reader.execute("""
+        SELECT to_address FROM admin_digest_items
+        GROUP BY to_address
+        HAVING COUNT(*) >= ? OR MIN(created_at) <= ?
+    """, (max_items, time.time() - window_seconds)) as cursor:
+        return [row[0] for row in await cursor.fetchall()]
+
+async def flush_admin_digest(to_address: str, build_message: Callable[[str, List[dict]], dict]) -> int:
+    """Replace an admin's pending digest items with one outbox message; returns the number of items.
+
+    Items are removed and the summary is queued in the same transaction, so a
+    digest is neither lost nor sent twice when several workers flush at once.
+    """
+    async with _transaction():
+        async with database.connection.execute("""
+            DELETE FROM admin_digest_items WHERE to_address = ?
+            RETURNING id, submission_type, submission_id, subject, content, from_address, created_at
+        """, (to_address,)) as cursor:
+            rows = await cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+        items = sorted((dict(zip(columns, row)) for row in rows), key=lambda item: item['id'])
+        if items:
+            await _enqueue_outbox('digest', None, [build_message(to_address, items)])
+    return len(items)
+
 def get_database():
     """Get database instance"""
     return database.connection
 
 def get_db_connection():
     """Get synchronous database connection for admin endpoints"""
-    return sqlite3.connect(str(DB_FILE))
+    return sqlite3.connect(str(DB_FILE), timeout=DB_BUSY_TIMEOUT_MS / 1000)
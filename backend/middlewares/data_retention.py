@@ -1,63 +1,200 @@
 """
 Политики хранения данных и GDPR compliance
+
+RetentionScheduler периодически удаляет (или анонимизирует) заявки старше
+срока хранения и отправленные письма из email_outbox. Работа идет пачками по
+RETENTION_BATCH_SIZE строк, каждая пачка — отдельная короткая транзакция, а
+между пачками планировщик отдает управление event loop, поэтому запись форм
+не ждет долгой блокировки.
 """
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Any, AsyncIterator, Dict, List, Optional
+
 from fastapi import HTTPException
 
+from database import (
+    SUBMISSION_TABLES, OUTBOX_SENT, OUTBOX_DEAD, GDPR_EMAIL_CHUNK, expire_rows_batch, anonymize_submission,
+    optimize_database, get_submissions_by_email, erase_submissions_by_email, start_gdpr_audit, complete_gdpr_audit
+)
+
+logger = logging.getLogger(__name__)
+
+# Включается явно: удалённые заявки не восстановить
+RETENTION_ENABLED = os.environ.get('RETENTION_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+# delete — удалить строку; anonymize — оставить строку для статистики без персональных данных
+RETENTION_ACTION = os.environ.get('RETENTION_ACTION', 'anonymize').lower()
+RETENTION_SUBMISSION_DAYS = int(os.environ.get('RETENTION_SUBMISSION_DAYS', '365'))
+RETENTION_OUTBOX_DAYS = int(os.environ.get('RETENTION_OUTBOX_DAYS', '30'))
+RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', '500'))
+RETENTION_BATCH_PAUSE_MS = float(os.environ.get('RETENTION_BATCH_PAUSE_MS', '50'))
+RETENTION_INTERVAL_SECONDS = float(os.environ.get('RETENTION_INTERVAL_SECONDS', '3600'))
+
+# Значения, которыми заменяются персональные данные (NOT NULL колонки получают заглушку)
+ANONYMIZED_FIELDS: Dict[str, Dict[str, Any]] = {
+    'contacts': {
+        'name': 'Anonymous User', 'email': 'anonymized@example.com', 'company': 'anonymized',
+        'message': 'anonymized', 'ip_address': '0.0.0.0', 'user_agent': None, 'page': None, 'referrer': None,
+    },
+    'staffing_requests': {
+        'name': 'Anonymous User', 'email': 'anonymized@example.com', 'company': None,
+        'message': None, 'ip_address': '0.0.0.0', 'user_agent': None,
+    },
+    'expert_consultations': {
+        'name': 'Anonymous User', 'email': 'anonymized@example.com', 'company': None, 'phone': None,
+        'brief_message': 'anonymized', 'details': None, 'ip_address': '0.0.0.0', 'user_agent': None,
+        'page_url': None, 'referrer': None,
+    },
+}
+
+# Строки, которые обрабатывает очередной проход (уже анонимизированные пропускаются)
+PENDING_SUBMISSIONS = "status IS NOT 'anonymized'"
+FINISHED_OUTBOX = f"status IN ('{OUTBOX_SENT}', '{OUTBOX_DEAD}')"
+
+
+def _cutoff(days: int, now: Optional[datetime] = None) -> str:
+    """Граница срока хранения в формате CURRENT_TIMESTAMP (UTC)"""
+    return ((now or datetime.utcnow()) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
 
 class DataRetentionPolicy:
     """Политика хранения данных"""
-    RETENTION_PERIODS = {
-        'contacts': timedelta(days=365),  # 1 год для контактных данных
-        'logs': timedelta(days=30),       # 30 дней для логов
-        'analytics': timedelta(days=90),  # 90 дней для аналитики
-    }
-
-    def __init__(self, db: AsyncIOMotorDatabase):
-        self.db = db
-
-    async def cleanup_expired_data(self):
-        """Удаление устаревших данных"""
-        for collection, retention in self.RETENTION_PERIODS.items():
-            expiry_date = datetime.utcnow() - retention
-            await self.db[collection].delete_many({
-                'timestamp': {'$lt': expiry_date}
-            })
-
-    async def anonymize_data(self, collection: str, document_id: str):
+
+    def __init__(self, submission_days: int = RETENTION_SUBMISSION_DAYS, outbox_days: int = RETENTION_OUTBOX_DAYS,
+                 action: str = RETENTION_ACTION):
+        if action not in ('delete', 'anonymize'):
+            raise ValueError(f"Unknown retention action: {action}")
+        self.submission_days = submission_days
+        self.outbox_days = outbox_days
+        self.action = action
+
+    def rules(self, now: Optional[datetime] = None):
+        """(таблица, колонка времени, граница, условие, замена полей или None для удаления)"""
+        for table in SUBMISSION_TABLES:
+            anonymize = ANONYMIZED_FIELDS[table] if self.action == 'anonymize' else None
+            yield table, 'submitted_at', _cutoff(self.submission_days, now), PENDING_SUBMISSIONS, anonymize
+        yield 'email_outbox', 'created_at', _cutoff(self.outbox_days, now), FINISHED_OUTBOX, None
+
+    async def cleanup_expired_data(self, batch_size: int = RETENTION_BATCH_SIZE,
+                                   pause: float = RETENTION_BATCH_PAUSE_MS / 1000,
+                                   progress=None) -> Dict[str, int]:
+        """Удаление устаревших данных пачками; возвращает число обработанных строк по таблицам"""
+        processed = {}
+        for table, column, cutoff, condition, anonymize in self.rules():
+            processed[table] = 0
+            while True:
+                changed = await expire_rows_batch(table, column, cutoff, batch_size, condition, anonymize)
+                processed[table] += changed
+                if progress is not None:
+                    progress(table, processed[table])
+                if changed < batch_size:
+                    break
+                # Отдаем event loop и очередь записи формам между пачками
+                await asyncio.sleep(pause)
+        return processed
+
+    async def anonymize_data(self, table: str, row_id: int):
         """Анонимизация данных по запросу"""
-        doc = await self.db[collection].find_one({'_id': document_id})
-        if not doc:
+        if table not in ANONYMIZED_FIELDS or not await anonymize_submission(table, row_id, ANONYMIZED_FIELDS[table]):
             raise HTTPException(status_code=404, detail="Document not found")
 
-        anonymized = self._anonymize_fields(doc)
-        await self.db[collection].update_one(
-            {'_id': document_id},
-            {'$set': anonymized}
-        )
 
-    def _anonymize_fields(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Анонимизация полей с персональными данными"""
-        sensitive_fields = {
-            'email': 'anonymized@example.com',
-            'name': 'Anonymous User',
-            'phone': 'XXX-XXX-XXXX',
-            'address': 'anonymized',
-            'ip_address': '0.0.0.0'
-        }
+class RetentionScheduler:
+    """Фоновая задача, применяющая политику хранения по расписанию"""
+
+    def __init__(self, policy: Optional[DataRetentionPolicy] = None,
+                 interval: float = RETENTION_INTERVAL_SECONDS, batch_size: int = RETENTION_BATCH_SIZE,
+                 pause: float = RETENTION_BATCH_PAUSE_MS / 1000):
+        self.policy = policy or DataRetentionPolicy()
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.running = False
+        self.progress: Dict[str, int] = {}
+        self.runs = 0
+        self.errors = 0
+        self.last_run: Optional[dict] = None
+        self.total_processed: Dict[str, int] = {}
+
+    def start(self):
+        if RETENTION_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Retention scheduler started: action={self.policy.action} "
+                        f"submissions={self.policy.submission_days}d outbox={self.policy.outbox_days}d "
+                        f"batch={self.batch_size} interval={int(self.interval)}s")
 
-        anonymized = data.copy()
-        for field, value in data.items():
-            if field in sensitive_fields:
-                anonymized[field] = sensitive_fields[field]
-        return anonymized
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Retention run error: {e}")
+            await asyncio.sleep(self.interval)
+
+    def _report(self, table: str, processed: int):
+        self.progress[table] = processed
+        logger.debug(f"retention table={table} processed={processed}")
+
+    async def run_once(self) -> Dict[str, int]:
+        """Один проход политики; возвращает число обработанных строк по таблицам"""
+        async with self._lock:
+            self.running, self.progress = True, {}
+            started = time.time()
+            try:
+                processed = await self.policy.cleanup_expired_data(self.batch_size, self.pause, self._report)
+                if any(processed.values()):
+                    await optimize_database()
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.running = False
+            self.runs += 1
+            for table, count in processed.items():
+                self.total_processed[table] = self.total_processed.get(table, 0) + count
+            self.last_run = {
+                'started_at': datetime.utcfromtimestamp(started).strftime('%Y-%m-%d %H:%M:%S'),
+                'duration_ms': round((time.time() - started) * 1000, 1),
+                'processed': processed,
+            }
+            logger.info(f"retention action={self.policy.action} processed={processed} "
+                        f"duration_ms={self.last_run['duration_ms']}")
+            return processed
+
+    def snapshot(self) -> dict:
+        """Метрики для админки"""
+        return {
+            'enabled': RETENTION_ENABLED,
+            'action': self.policy.action,
+            'submission_days': self.policy.submission_days,
+            'outbox_days': self.policy.outbox_days,
+            'running': self.running,
+            'progress': dict(self.progress),
+            'runs': self.runs,
+            'errors': self.errors,
+            'last_run': self.last_run,
+            'total_processed': dict(self.total_processed),
+        }
 
 
 class GDPRCompliance:
     """GDPR compliance утилиты"""
-    
+
     @staticmethod
     def validate_consent(data: Dict[str, Any]) -> bool:
         """Проверка наличия согласия на обработку данных"""
@@ -85,11 +222,41 @@ class GDPRCompliance:
         return export_data
 
     @staticmethod
-    def log_data_access(db: AsyncIOMotorDatabase, user_id: str, action: str):
-        """Логирование доступа к данным"""
-        log = {
-            'user_id': user_id,
-            'action': action,
-            'timestamp': datetime.utcnow()
-        }
-        return db.access_logs.insert_one(log)
\ No newline at end of file
+    def normalize_subjects(emails: List[str]) -> List[str]:
+        """Адреса запроса: нижний регистр, без повторов, по порядку"""
+        return sorted({email.strip().lower() for email in emails if email and email.strip()})
+
+    @staticmethod
+    def subjects_sha256(emails: List[str]) -> str:
+        """Хеш списка адресов для журнала аудита (сами адреса не сохраняются)"""
+        return hashlib.sha256('\n'.join(emails).encode()).hexdigest()
+
+    @staticmethod
+    async def export_subjects(emails: List[str], reference: Optional[str] = None) -> AsyncIterator[bytes]:
+        """NDJSON со всеми заявками адресов по всем таблицам; последняя строка — запись аудита"""
+        audit_id = await start_gdpr_audit('export', reference, len(emails), GDPRCompliance.subjects_sha256(emails))
+        rows = {table: 0 for table in SUBMISSION_TABLES}
+        for start in range(0, len(emails), GDPR_EMAIL_CHUNK):
+            chunk = emails[start:start + GDPR_EMAIL_CHUNK]
+            for table in SUBMISSION_TABLES:
+                found = await get_submissions_by_email(table, chunk)
+                rows[table] += len(found)
+                if found:
+                    yield ''.join(json.dumps({'table': table, **row}, ensure_ascii=False) + '\n'
+                                  for row in found).encode()
+        await complete_gdpr_audit(audit_id, rows)
+        yield (json.dumps({'audit': {'id': audit_id, 'action': 'export', 'subjects': len(emails), 'rows': rows}})
+               + '\n').encode()
+
+    @staticmethod
+    async def erase_subjects(emails: List[str], reference: Optional[str] = None) -> Dict[str, Any]:
+        """Анонимизация всех заявок адресов в одной транзакции вместе с записью аудита"""
+        audit_id, rows = await erase_submissions_by_email(
+            emails, ANONYMIZED_FIELDS, reference, GDPRCompliance.subjects_sha256(emails)
+        )
+        logger.info(f"gdpr_erase audit_id={audit_id} subjects={len(emails)} rows={rows}")
+        return {'id': audit_id, 'action': 'erase', 'subjects': len(emails), 'rows': rows}
+
+
+# Global instance
+retention = RetentionScheduler()
@@ -1,126 +1,457 @@
 """
 Performance optimization middleware for FastAPI
+
+Pure ASGI middlewares: they wrap `send` and edit the raw header list of the
+http.response.start message, without BaseHTTPMiddleware's per-request task
+group and body stream.
 """
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+import os
 import time
-import gzip
-from typing import Dict, Any
-import json
+import zlib
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.conditional import NOT_MODIFIED_HEADERS, http_date, is_not_modified, parse_http_date, strong_etag
+from utils.response_cache import CACHE_BACKEND, CACHE_MAX_BYTES, create_cache_backend, entry_size
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+# Bodies smaller than this are sent as they are
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+# Bodies or stream chunks at least this large are compressed in a worker thread
+COMPRESSION_THREAD_MIN_SIZE = int(os.environ.get('COMPRESSION_THREAD_MIN_SIZE', str(256 * 1024)))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+COMPRESSION_ZSTD_LEVEL = int(os.environ.get('COMPRESSION_ZSTD_LEVEL', '3'))
+# Response cache: opted-in GET routes as "path[=ttl_seconds],prefix/*[=ttl_seconds]"
+CACHE_RULES = os.environ.get('CACHE_RULES', '/')
+CACHE_MAX_ENTRY_BYTES = int(os.environ.get('CACHE_MAX_ENTRY_BYTES', str(1024 * 1024)))
+CACHE_SWEEP_SECONDS = float(os.environ.get('CACHE_SWEEP_SECONDS', '60'))
+COMPRESSIBLE_TYPES = frozenset((
+    b'application/json', b'application/x-ndjson', b'application/javascript', b'application/xml',
+    b'image/svg+xml',
+))
+
+Headers = List[Tuple[bytes, bytes]]
+
+logger = logging.getLogger(__name__)
+
+
+def get_header(headers, name: bytes) -> Optional[bytes]:
+    """First value of a header from a raw ASGI header list (name in lower case)"""
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
 
-class PerformanceMiddleware(BaseHTTPMiddleware):
+
+class PerformanceMiddleware:
     """Add performance timing headers"""
-    
-    async def dispatch(self, request, call_next):
-        start_time = time.time()
-        
-        response = await call_next(request)
-        
-        process_time = time.time() - start_time
-        response.headers["X-Process-Time"] = str(round(process_time * 1000, 2))  # milliseconds
-        response.headers["X-Response-Time"] = str(round(process_time, 6))  # seconds
-        
-        return response
-
-class CompressionMiddleware(BaseHTTPMiddleware):
-    """Handle gzip compression for API responses"""
-    
-    def __init__(self, app, minimum_size: int = 1024):
-        super().__init__(app)
-        self.minimum_size = minimum_size
-    
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-        
-        # Check if client accepts gzip
-        accept_encoding = request.headers.get("accept-encoding", "")
-        if "gzip" not in accept_encoding.lower():
-            return response
-            
-        # Only compress if response is large enough
-        if hasattr(response, 'body') and len(response.body) < self.minimum_size:
-            return response
-            
-        # Don't compress if already compressed
-        if response.headers.get("content-encoding"):
-            return response
-            
-        # Compress JSON responses  
-        content_type = response.headers.get("content-type", "")
-        if "application/json" in content_type:
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start_time = time.perf_counter()
+
+        async def send_with_timing(message: Message):
+            if message['type'] == 'http.response.start':
+                process_time = time.perf_counter() - start_time
+                message['headers'] = [
+                    *message.get('headers', ()),
+                    (b'x-process-time', str(round(process_time * 1000, 2)).encode()),  # milliseconds
+                    (b'x-response-time', str(round(process_time, 6)).encode()),  # seconds
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
+
+
+def _parse_accept_encoding(value: bytes) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}; unparsable q-values count as 0"""
+    accepted = {}
+    for part in value.decode('latin-1').lower().split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
             try:
-                if hasattr(response, 'body'):
-                    compressed_body = gzip.compress(response.body)
-                    response.headers["content-encoding"] = "gzip"
-                    response.headers["content-length"] = str(len(compressed_body))
-                    response.body = compressed_body
-            except Exception:
-                pass  # If compression fails, return uncompressed
-                
-        return response
-
-class CacheMiddleware(BaseHTTPMiddleware):
-    """Simple in-memory cache for API responses"""
-    
-    def __init__(self, app, ttl: int = 300):  # 5 minutes default
-        super().__init__(app)
-        self.cache: Dict[str, Dict[str, Any]] = {}
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+@lru_cache(maxsize=256)
+def negotiate_encoding(value: bytes) -> Optional[str]:
+    """Best available coding for an Accept-Encoding header (server preference breaks ties), or None"""
+    accepted = _parse_accept_encoding(value)
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for coding in ENCODER_PREFERENCE:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush so each streamed chunk reaches the client as it is produced
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b'') -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b'') -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b'') -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+# Server preference; br and zstd only when their optional packages are installed
+ENCODERS = {'br': _BrotliEncoder, 'zstd': _ZstdEncoder, 'gzip': _GzipEncoder}
+ENCODER_PREFERENCE = tuple(coding for coding, available in (
+    ('br', brotli is not None), ('zstd', zstandard is not None), ('gzip', True),
+) if available)
+
+
+def _is_compressible(content_type: bytes) -> bool:
+    media_type = content_type.split(b';', 1)[0].strip().lower()
+    return media_type.startswith(b'text/') or media_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """Negotiated br/zstd/gzip compression of text responses, streamed bodies included"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 thread_min_size: int = COMPRESSION_THREAD_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_min_size = thread_min_size
+
+    async def _run(self, function, data: bytes) -> bytes:
+        """Compress small inputs inline, large ones in a worker thread (zlib and friends release the GIL)"""
+        if len(data) >= self.thread_min_size:
+            return await asyncio.to_thread(function, data)
+        return function(data)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate_encoding(get_header(scope['headers'], b'accept-encoding') or b'')
+        held: Optional[Message] = None
+        encoder = None
+
+        async def send_compressed(message: Message):
+            nonlocal held, encoder
+            if message['type'] == 'http.response.start':
+                headers = message.get('headers', ())
+                if (not _is_compressible(get_header(headers, b'content-type') or b'')
+                        or get_header(headers, b'content-encoding') is not None):
+                    await send(message)
+                    return
+                # Caches must keep one copy per encoding, compressed or not
+                message['headers'] = [*headers, (b'vary', b'Accept-Encoding')]
+                if coding is None or message['status'] in (204, 206, 304):
+                    await send(message)
+                    return
+                held = message
+                return
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+            if held is not None:
+                start, held = held, None
+                body, more_body = message.get('body', b''), message.get('more_body', False)
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = ENCODERS[coding]()
+                # The encoded bytes are not the ones a strong ETag vouched for
+                start['headers'] = [
+                    (k, b'W/' + v if k.lower() == b'etag' and v.startswith(b'"') else v)
+                    for k, v in start['headers'] if k.lower() != b'content-length'
+                ]
+                start['headers'].append((b'content-encoding', coding.encode()))
+                if not more_body:
+                    body = await self._run(encoder.finish, body)
+                    start['headers'].append((b'content-length', str(len(body)).encode()))
+                    encoder = None
+                await send(start)
+                if encoder is not None:
+                    body = await self._run(encoder.compress, body)
+                await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+                return
+            if encoder is not None:
+                body, more_body = message.get('body', b''), message.get('more_body', False)
+                body = await self._run(encoder.compress if more_body else encoder.finish, body)
+                if not more_body:
+                    encoder = None
+                await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+
+def parse_cache_rules(value: str, default_ttl: float) -> List[Tuple[str, float]]:
+    """CACHE_RULES as [(pattern, ttl)]: "path[=ttl],prefix/*[=ttl]", exact paths or `*` prefixes"""
+    rules = []
+    for item in value.split(','):
+        pattern, _, ttl = item.strip().partition('=')
+        if pattern:
+            rules.append((pattern, float(ttl) if ttl else default_ttl))
+    return rules
+
+
+# Request headers the cache key accounts for; responses that Vary on others are not stored
+CACHE_KEY_VARY = frozenset((b'accept-encoding', b'origin'))
+
+
+def _varies_within(headers: Headers, allowed: frozenset) -> bool:
+    """Whether every header named in the response's Vary (all of its fields) is in `allowed`"""
+    for key, value in headers:
+        if key.lower() == b'vary':
+            for name in value.lower().split(b','):
+                name = name.strip()
+                if name and name not in allowed:
+                    return False
+    return True
+
+
+class CacheMiddleware:
+    """Response cache for opted-in GET routes.
+
+    Only paths matching a rule are cached, each with its own TTL. Entries live
+    in a pluggable backend (utils.response_cache): a per-process LRU, or a
+    SQLite file shared by all workers on the host. A background sweep drops
+    expired ones. Concurrent misses for one key are collapsed so the handler
+    runs once and the others are served its result. Cached responses carry
+    an ETag (hash of the stored body) and Last-Modified, and conditional
+    requests that still match are answered with 304.
+    """
+
+    def __init__(self, app: ASGIApp, ttl: int = 300,  # 5 minutes default
+                 rules: Optional[List[Tuple[str, float]]] = None, max_bytes: int = CACHE_MAX_BYTES,
+                 max_entry_bytes: int = CACHE_MAX_ENTRY_BYTES, sweep_interval: float = CACHE_SWEEP_SECONDS,
+                 backend=None):
+        self.app = app
+        self.backend = backend if backend is not None else create_cache_backend(CACHE_BACKEND, max_bytes)
         self.ttl = ttl
-    
-    def _get_cache_key(self, request) -> str:
-        """Generate cache key from request"""
-        return f"{request.method}:{request.url.path}:{request.url.query}"
-    
-    def _is_cacheable(self, request, response) -> bool:
-        """Check if request/response should be cached"""
-        # Only cache GET requests
-        if request.method != "GET":
-            return False
-            
-        # Only cache successful responses
-        if response.status_code != 200:
-            return False
-            
-        # Don't cache admin routes
-        if "/admin/" in request.url.path:
-            return False
-            
-        return True
-    
-    async def dispatch(self, request, call_next):
-        cache_key = self._get_cache_key(request)
-        current_time = time.time()
-        
-        # Check cache first
-        if cache_key in self.cache:
-            cached_entry = self.cache[cache_key]
-            if current_time - cached_entry["timestamp"] < self.ttl:
-                response = Response(
-                    content=cached_entry["content"],
-                    status_code=cached_entry["status_code"],
-                    headers=cached_entry["headers"]
-                )
-                response.headers["X-Cache"] = "HIT"
-                return response
-            else:
-                # Remove expired entry
-                del self.cache[cache_key]
-        
-        # Get fresh response
-        response = await call_next(request)
-        
-        # Cache if appropriate
-        if self._is_cacheable(request, response):
+        self.rules = rules if rules is not None else parse_cache_rules(CACHE_RULES, ttl)
+        self.max_entry_bytes = max_entry_bytes
+        self.sweep_interval = sweep_interval
+        self.stats = {'hits': 0, 'misses': 0, 'collapsed': 0}
+        self._inflight: Dict[str, asyncio.Event] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def _get_cache_key(self, scope: Scope) -> str:
+        """Generate cache key from request (one entry per negotiated content encoding and Origin)"""
+        coding = negotiate_encoding(get_header(scope['headers'], b'accept-encoding') or b'') or 'identity'
+        # CORS runs inside the cache: the stored Access-Control-Allow-Origin belongs to this origin
+        origin = (get_header(scope['headers'], b'origin') or b'').decode('latin-1')
+        return f"{scope['method']}:{scope['path']}:{scope['query_string'].decode('latin-1')}:{coding}:{origin}"
+
+    def _ttl_for(self, scope: Scope) -> Optional[float]:
+        """TTL of the first rule matching a cacheable request, or None"""
+        # Only GET requests without credentials; a hit must never skip authentication
+        if scope['method'] != 'GET' or get_header(scope['headers'], b'authorization') is not None:
+            return None
+        path = scope['path']
+        for pattern, ttl in self.rules:
+            if path == pattern or (pattern.endswith('*') and path.startswith(pattern[:-1])):
+                return ttl
+        return None
+
+    async def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.backend.get(key, time.time())
+        except Exception as e:
+            # A broken cache degrades to a miss, never to a failed request
+            logger.warning(f"Response cache read failed: {e}")
+            return None
+
+    async def _store(self, key: str, entry: Dict[str, Any]):
+        if entry_size(key, entry) > self.max_entry_bytes:
+            return
+        try:
+            await self.backend.set(key, entry)
+        except Exception as e:
+            logger.warning(f"Response cache write failed: {e}")
+
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """Drop expired entries; returns how many"""
+        return await self.backend.sweep(time.time() if now is None else now)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
             try:
-                if hasattr(response, 'body'):
-                    self.cache[cache_key] = {
-                        "content": response.body,
-                        "status_code": response.status_code,
-                        "headers": dict(response.headers),
-                        "timestamp": current_time
-                    }
-                    response.headers["X-Cache"] = "MISS"
-            except Exception:
-                pass  # If caching fails, continue without caching
-        
-        return response
+                await self.sweep()
+            except Exception as e:
+                logger.warning(f"Response cache sweep failed: {e}")
+
+    @staticmethod
+    def _not_modified(scope: Scope, headers: Headers) -> bool:
+        last_modified = parse_http_date((get_header(headers, b'last-modified') or b'').decode('latin-1'))
+        etag = get_header(headers, b'etag')
+        if_none_match = get_header(scope['headers'], b'if-none-match')
+        if_modified_since = get_header(scope['headers'], b'if-modified-since')
+        return is_not_modified(
+            if_none_match.decode('latin-1') if if_none_match is not None else None,
+            if_modified_since.decode('latin-1') if if_modified_since is not None else None,
+            etag.decode('latin-1') if etag is not None else None, last_modified,
+        )
+
+    @staticmethod
+    async def _send_not_modified(headers: Headers, x_cache: bytes, send: Send):
+        await send({
+            'type': 'http.response.start',
+            'status': 304,
+            'headers': [*((k, v) for k, v in headers if k.lower() in NOT_MODIFIED_HEADERS), (b'x-cache', x_cache)],
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def _send_cached(self, entry: Dict[str, Any], scope: Scope, send: Send):
+        if self._not_modified(scope, entry['headers']):
+            await self._send_not_modified(entry['headers'], b'HIT', send)
+            return
+        await send({
+            'type': 'http.response.start',
+            'status': entry['status_code'],
+            'headers': [*entry['headers'], (b'x-cache', b'HIT')],
+        })
+        await send({'type': 'http.response.body', 'body': entry['content']})
+
+    async def _lifespan(self, scope: Scope, receive: Receive, send: Send):
+        """Run the sweep while the application is up"""
+        async def receive_lifespan() -> Message:
+            message = await receive()
+            if message['type'] == 'lifespan.startup' and self._sweeper is None:
+                self._sweeper = asyncio.create_task(self._sweep_loop())
+            elif message['type'] == 'lifespan.shutdown':
+                if self._sweeper is not None:
+                    self._sweeper.cancel()
+                    await asyncio.gather(self._sweeper, return_exceptions=True)
+                    self._sweeper = None
+                await self.backend.close()
+            return message
+
+        await self.app(scope, receive_lifespan, send)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(scope, receive, send)
+            return
+        ttl = self._ttl_for(scope) if scope['type'] == 'http' else None
+        if ttl is None:
+            await self.app(scope, receive, send)
+            return
+        cache_key = self._get_cache_key(scope)
+
+        # Check cache first; while another request is producing this key, wait for it
+        entry = await self._lookup(cache_key)
+        if entry is None and cache_key in self._inflight:
+            self.stats['collapsed'] += 1
+            await self._inflight[cache_key].wait()
+            entry = await self._lookup(cache_key)
+        if entry is not None:
+            self.stats['hits'] += 1
+            await self._send_cached(entry, scope, send)
+            return
+
+        self.stats['misses'] += 1
+        if cache_key in self._inflight:
+            # The leader's response was not cacheable; run the handler as usual
+            await self.app(scope, receive, send)
+            return
+        done = self._inflight[cache_key] = asyncio.Event()
+        try:
+            await self._fill(cache_key, ttl, scope, receive, send)
+        finally:
+            del self._inflight[cache_key]
+            done.set()
+
+    async def _fill(self, cache_key: str, ttl: float, scope: Scope, receive: Receive, send: Send):
+        """Run the handler and store its response if it is cacheable"""
+        held: Optional[Message] = None
+
+        async def send_caching(message: Message):
+            nonlocal held
+            if message['type'] == 'http.response.start':
+                headers: Headers = list(message.get('headers', ()))
+                cache_control = (get_header(headers, b'cache-control') or b'').lower()
+                # Only cache successful responses meant for everyone
+                if (message['status'] == 200 and get_header(headers, b'set-cookie') is None
+                        and b'no-store' not in cache_control and b'private' not in cache_control
+                        and _varies_within(headers, CACHE_KEY_VARY)):
+                    # Held until the body is known: the ETag is its hash
+                    held = message
+                    return
+                await send(message)
+            elif held is not None:
+                start, held = held, None
+                body = message.get('body', b'')
+                if message.get('more_body'):
+                    # Whole bodies only; a streamed response is not cached
+                    await send({**start, 'headers': [*start.get('headers', ()), (b'x-cache', b'MISS')]})
+                    await send(message)
+                    return
+                now = time.time()
+                headers = list(start.get('headers', ()))
+                if get_header(headers, b'etag') is None:
+                    headers.append((b'etag', strong_etag(body).encode()))
+                if get_header(headers, b'last-modified') is None:
+                    headers.append((b'last-modified', http_date(now).encode()))
+                if self._not_modified(scope, headers):
+                    await self._send_not_modified(headers, b'MISS', send)
+                else:
+                    await send({**start, 'headers': [*headers, (b'x-cache', b'MISS')]})
+                    await send(message)
+                await self._store(cache_key, {'status_code': 200, 'headers': headers, 'content': body,
+                                              'timestamp': now, 'expires': now + ttl})
+            else:
+                await send(message)
+
+        await self.app(scope, receive, send_caching)
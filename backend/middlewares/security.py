@@ -4,36 +4,46 @@ def sanitize_input(data):
 """
 Security headers middleware
 """
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-        self.csp_policy = {
-            'default-src': "'self'",
-            'script-src': "'self' 'unsafe-inline' 'unsafe-eval'",
-            'style-src': "'self' 'unsafe-inline'",
-            'img-src': "'self' data: https:",
-            'font-src': "'self' data:",
-            'connect-src': "'self'"
-        }
+CSP_POLICY = {
+    'default-src': "'self'",
+    'script-src': "'self' 'unsafe-inline' 'unsafe-eval'",
+    'style-src': "'self' 'unsafe-inline'",
+    'img-src': "'self' data: https:",
+    'font-src': "'self' data:",
+    'connect-src': "'self'"
+}
 
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-        
-        if not isinstance(response, Response):
-            return response
-            
-        # CSP настройки
+
+class SecurityHeadersMiddleware:
+    def __init__(self, app: ASGIApp, csp_policy: dict = CSP_POLICY):
+        self.app = app
+        self.csp_policy = dict(csp_policy)
+        # Заголовки собираются один раз, а не на каждый ответ
         csp_header = '; '.join([f"{key} {value}" for key, value in self.csp_policy.items()])
-        response.headers['Content-Security-Policy'] = csp_header
-        
-        # Другие заголовки безопасности
-        response.headers['X-Frame-Options'] = 'DENY'
-        response.headers['X-Content-Type-Options'] = 'nosniff'
-        response.headers['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        response.headers['X-XSS-Protection'] = '1; mode=block'
-        response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
-        
-        return response
\ No newline at end of file
+        self.headers = (
+            (b'content-security-policy', csp_header.encode()),
+            (b'x-frame-options', b'DENY'),
+            (b'x-content-type-options', b'nosniff'),
+            (b'referrer-policy', b'strict-origin-when-cross-origin'),
+            (b'x-xss-protection', b'1; mode=block'),
+            (b'strict-transport-security', b'max-age=31536000; includeSubDomains'),
+        )
+        self._names = frozenset(name for name, _ in self.headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message):
+            if message['type'] == 'http.response.start':
+                # Наши значения заменяют заголовки, выставленные приложением
+                message['headers'] = [
+                    *((k, v) for k, v in message.get('headers', ()) if k.lower() not in self._names),
+                    *self.headers,
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
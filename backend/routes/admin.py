@@ -0,0 +1,307 @@
+"""
+Admin API: search across submissions, streaming exports, lead analytics,
+retention status, GDPR subject requests and the email suppression list.
+
+Every endpoint requires "Authorization: Bearer <ADMIN_API_TOKEN>"; with no
+token configured the admin API is disabled.
+"""
+import io
+import os
+import csv
+import json
+import zlib
+import html
+import asyncio
+import hmac
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from database import (
+    search_submissions, fts_match_expression, SNIPPET_MATCH_START, SNIPPET_MATCH_END,
+    get_submissions_page, get_submission_columns, get_rollup_counts, ROLLUP_DIMENSIONS, get_gdpr_audit_log
+)
+from middlewares.data_retention import retention, GDPRCompliance
+from utils.suppression import suppression
+from utils.timezone import to_local_time_str
+
+logger = logging.getLogger(__name__)
+
+ADMIN_API_TOKEN = os.environ.get('ADMIN_API_TOKEN', '')
+SEARCH_MAX_LIMIT = 100
+SEARCH_MAX_OFFSET = 1000
+# Rows read per query while streaming an export; memory use is bounded by this
+EXPORT_PAGE_SIZE = int(os.environ.get('EXPORT_PAGE_SIZE', '500'))
+ANALYTICS_DEFAULT_DAYS = 30
+ANALYTICS_MAX_DAYS = 731
+GDPR_MAX_SUBJECTS = 10000
+SUPPRESSION_REASONS = ('unsubscribed', 'bounced', 'complained')
+
+# Submission type (as used by the outbox and digest) -> table
+SUBMISSION_TYPES = {
+    'contact': 'contacts',
+    'staffing': 'staffing_requests',
+    'expert_consultation': 'expert_consultations',
+}
+
+
+def require_admin(request: Request):
+    """Reject requests without the admin bearer token"""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.encode(), ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Unauthorized", headers={'WWW-Authenticate': 'Bearer'})
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+def _snippet_html(snippet: Optional[str]) -> str:
+    """Escape submitted text, then turn the match markers into <mark> tags"""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(SNIPPET_MATCH_START, '<mark>').replace(SNIPPET_MATCH_END, '</mark>')
+
+
+@router.get("/search")
+async def search(q: str = Query(..., min_length=1, max_length=200), type: Optional[str] = None,
+                 limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+                 offset: int = Query(0, ge=0, le=SEARCH_MAX_OFFSET)):
+    """Full-text search over submissions, best matches first; `word*` matches a prefix"""
+    if type is not None and type not in SUBMISSION_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown type: {type}")
+    match = fts_match_expression(q)
+    if match is None:
+        return {"results": [], "next_offset": None}
+    types = [type] if type else list(SUBMISSION_TYPES)
+
+    try:
+        # Each table returns its best offset + limit rows; the merged ranking
+        # is then cut to the requested page
+        pages = await asyncio.gather(*(
+            search_submissions(SUBMISSION_TYPES[t], match, offset + limit + 1) for t in types
+        ))
+    except Exception as e:
+        logger.error(f"Search failed for {q!r}: {e}")
+        raise HTTPException(status_code=500, detail="Search failed")
+
+    ranked = sorted(
+        ({**row, 'type': t} for t, rows in zip(types, pages) for row in rows),
+        key=lambda row: row['rank']
+    )
+    page = ranked[offset:offset + limit]
+    results = [{
+        "type": row['type'],
+        "id": row['id'],
+        "name": row['name'],
+        "email": row['email'],
+        "company": row['company'],
+        "status": row['status'] or "new",
+        "date": to_local_time_str(row['submitted_at']),
+        "snippet": _snippet_html(row['snippet']),
+        "score": round(-row['rank'], 3),
+    } for row in page]
+    has_more = len(ranked) > offset + limit and offset + limit <= SEARCH_MAX_OFFSET
+    return {"results": results, "next_offset": offset + limit if has_more else None}
+
+
+def _utc_bound(value: Optional[str], name: str) -> Optional[str]:
+    """Parse an ISO date/datetime query parameter into SQLite's UTC timestamp format"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected an ISO 8601 date")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+async def _export_pages(table: str, since: Optional[str], until: Optional[str]) -> AsyncIterator[List[dict]]:
+    """Walk a table newest first, one keyset page at a time (the reader is released between pages)"""
+    after = None
+    while True:
+        rows = await get_submissions_page(table, None, EXPORT_PAGE_SIZE, after, since=since, until=until)
+        if rows:
+            yield rows
+        if len(rows) < EXPORT_PAGE_SIZE:
+            return
+        after = (rows[-1]['submitted_at'], rows[-1]['id'])
+
+
+async def _csv_chunks(table: str, since: Optional[str], until: Optional[str]) -> AsyncIterator[bytes]:
+    columns = await get_submission_columns(table)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for rows in _export_pages(table, since, until):
+        writer.writerows([row.get(column) for column in columns] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def _ndjson_chunks(table: str, since: Optional[str], until: Optional[str]) -> AsyncIterator[bytes]:
+    async for rows in _export_pages(table, since, until):
+        yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode()
+
+
+async def _gzipped(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def _logged(chunks: AsyncIterator[bytes], table: str) -> AsyncIterator[bytes]:
+    """Log export failures; once streaming has started the status code can no longer change"""
+    exported = 0
+    try:
+        async for chunk in chunks:
+            exported += len(chunk)
+            yield chunk
+        logger.info(f"Exported {table}: {exported} bytes")
+    except Exception as e:
+        logger.error(f"Export of {table} failed after {exported} bytes: {e}")
+        raise
+
+
+@router.get("/export/{submission_type}")
+async def export_submissions(submission_type: str, format: str = Query('csv', pattern='^(csv|ndjson)$'),
+                             date_from: Optional[str] = Query(None, alias='from'),
+                             date_to: Optional[str] = Query(None, alias='to'),
+                             gzip: bool = False):
+    """Stream every submission of a type as CSV or NDJSON, newest first; `from` inclusive, `to` exclusive (UTC)"""
+    table = SUBMISSION_TYPES.get(submission_type)
+    if table is None:
+        raise HTTPException(status_code=404, detail=f"Unknown submission type: {submission_type}")
+    since, until = _utc_bound(date_from, 'from'), _utc_bound(date_to, 'to')
+
+    chunks = _csv_chunks(table, since, until) if format == 'csv' else _ndjson_chunks(table, since, until)
+    media_type = 'text/csv; charset=utf-8' if format == 'csv' else 'application/x-ndjson'
+    filename = f"{table}-{datetime.now(timezone.utc):%Y%m%d}.{format}"
+    if gzip:
+        # Served as a .gz file rather than Content-Encoding, so it is saved compressed
+        chunks, media_type, filename = _gzipped(chunks), 'application/gzip', filename + '.gz'
+    return StreamingResponse(
+        _logged(chunks, table), media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"', 'Cache-Control': 'no-store'}
+    )
+
+
+def _day(value: Optional[str], name: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected YYYY-MM-DD")
+
+
+@router.get("/analytics")
+async def analytics(group_by: str = 'day,submission_type',
+                    date_from: Optional[str] = Query(None, alias='from'),
+                    date_to: Optional[str] = Query(None, alias='to'),
+                    submission_type: Optional[str] = None, client_type: Optional[str] = None,
+                    priority_band: Optional[str] = None, utm_source: Optional[str] = None,
+                    utm_medium: Optional[str] = None, utm_campaign: Optional[str] = None):
+    """Submission counts from the daily rollups (UTC days, both ends inclusive; last 30 days by default)"""
+    dimensions = list(dict.fromkeys(d.strip() for d in group_by.split(',') if d.strip()))
+    unknown = [d for d in dimensions if d not in ROLLUP_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by: {', '.join(unknown)}")
+    until = _day(date_to, 'to') or datetime.now(timezone.utc).replace(tzinfo=None)
+    since = _day(date_from, 'from') or until - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if since > until or (until - since).days >= ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must be 1 to {ANALYTICS_MAX_DAYS} days")
+    filters = {name: value for name, value in (
+        ('submission_type', submission_type), ('client_type', client_type), ('priority_band', priority_band),
+        ('utm_source', utm_source), ('utm_medium', utm_medium), ('utm_campaign', utm_campaign),
+    ) if value is not None}
+
+    try:
+        rows = await get_rollup_counts(dimensions, f"{since:%Y-%m-%d}", f"{until:%Y-%m-%d}", filters)
+    except Exception as e:
+        logger.error(f"Analytics query failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load analytics")
+    return {
+        "from": f"{since:%Y-%m-%d}",
+        "to": f"{until:%Y-%m-%d}",
+        "group_by": dimensions,
+        "total": sum(row['submissions'] for row in rows),
+        "rows": rows,
+    }
+
+
+@router.get("/retention")
+async def retention_status():
+    """Data retention settings, progress of the current run and totals since startup"""
+    return retention.snapshot()
+
+
+class GDPRSubjectRequest(BaseModel):
+    emails: List[str] = Field(..., min_length=1, max_length=GDPR_MAX_SUBJECTS)
+    reference: Optional[str] = Field(None, max_length=200, description="Ticket or request ID for the audit log")
+
+
+def _subjects(body: GDPRSubjectRequest) -> List[str]:
+    emails = GDPRCompliance.normalize_subjects(body.emails)
+    if not emails:
+        raise HTTPException(status_code=400, detail="No email addresses given")
+    return emails
+
+
+@router.post("/gdpr/export")
+async def gdpr_export(body: GDPRSubjectRequest):
+    """Stream every submission from the given addresses as NDJSON, ending with the audit record"""
+    emails = _subjects(body)
+    return StreamingResponse(
+        _logged(GDPRCompliance.export_subjects(emails, body.reference), 'gdpr export'),
+        media_type='application/x-ndjson', headers={'Cache-Control': 'no-store'}
+    )
+
+
+@router.post("/gdpr/erase")
+async def gdpr_erase(body: GDPRSubjectRequest):
+    """Anonymize every submission from the given addresses in one transaction"""
+    emails = _subjects(body)
+    try:
+        return await GDPRCompliance.erase_subjects(emails, body.reference)
+    except Exception as e:
+        logger.error(f"GDPR erasure of {len(emails)} subjects failed: {e}")
+        raise HTTPException(status_code=500, detail="Erasure failed")
+
+
+@router.get("/gdpr/audit")
+async def gdpr_audit(limit: int = Query(50, ge=1, le=500)):
+    """Latest GDPR export and erasure requests"""
+    try:
+        return await get_gdpr_audit_log(limit)
+    except Exception as e:
+        logger.error(f"Failed to load GDPR audit log: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load audit log")
+
+
+class SuppressionRequest(BaseModel):
+    emails: List[str] = Field(..., min_length=1, max_length=GDPR_MAX_SUBJECTS)
+    reason: str = Field('bounced', pattern=f"^({'|'.join(SUPPRESSION_REASONS)})$")
+
+
+@router.post("/suppressions")
+async def add_suppressions(body: SuppressionRequest):
+    """Stop emailing addresses, e.g. hard bounces reported by a provider"""
+    try:
+        added = await suppression.add(body.emails, body.reason, 'admin')
+    except Exception as e:
+        logger.error(f"Failed to suppress {len(body.emails)} addresses: {e}")
+        raise HTTPException(status_code=500, detail="Failed to update suppression list")
+    return {"added": added, "suppressed": len(suppression)}
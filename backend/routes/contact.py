@@ -1,14 +1,18 @@
-"""Simple contact form endpoint: validates input, saves to DB, and sends emails via SMTP only."""
-from fastapi import APIRouter, HTTPException, Request
+"""Simple contact form endpoint: validates input, saves to DB and queues emails in the outbox."""
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from models.contact import ContactForm
-from database import save_contact, get_db_connection
+from database import save_contact, get_submissions_page, get_submission
 from datetime import datetime
+from typing import Optional
 import logging
-import sqlite3
 import os
-from utils.emailer import send_email
+from utils.outbox import outbox
+from utils.digest import use_digest
+from utils.notifications import DELIVERY_SENT
 from utils.timezone import to_local_time_str
 from utils.email_renderer import email_renderer
+from utils.conditional import submission_list_validators
+from utils.pagination import ADMIN_PAGE_DEFAULT_LIMIT, ADMIN_PAGE_MAX_LIMIT, decode_cursor, parse_fields, paginate
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -17,6 +21,15 @@ FROM_EMAIL = os.environ.get('FROM_EMAIL', 'noreply@softdab.tech')
 FROM_NAME = os.environ.get('FROM_NAME', 'SoftDAB')
 ADMIN_EMAILS = [e.strip() for e in os.environ.get('CONTACT_NOTIFICATION_EMAILS', 'info@softdab.tech').split(',') if e.strip()]
 
+# Admin list: output field -> column, and what is returned without ?fields=
+CONTACT_LIST_FIELDS = {
+    'id': 'id', 'name': 'name', 'email': 'email', 'company': 'company', 'role': 'role',
+    'service': 'service', 'timeline': 'timeline', 'budget': 'budget', 'message': 'message',
+    'date': 'submitted_at', 'status': 'status',
+}
+CONTACT_LIST_DEFAULT_FIELDS = ['id', 'name', 'email', 'company', 'message', 'date', 'status']
+LIST_MESSAGE_PREVIEW_CHARS = 100
+
 @router.post("")
 async def handle_contact(form_data: ContactForm, request: Request):
     """Handle contact form submission"""
@@ -30,18 +43,9 @@ async def handle_contact(form_data: ContactForm, request: Request):
     if not form_data.gdprConsent:
         raise HTTPException(status_code=400, detail="GDPR consent is required")
     
-    # Save to SQLite database
     contact_data = form_data.dict()
     contact_data['ip_address'] = request.client.host
     contact_data['user_agent'] = request.headers.get('user-agent')
-    
-    saved = await save_contact(contact_data)
-    if saved:
-        logger.info(f"Contact form saved to database: {form_data.email}")
-    else:
-        logger.warning(f"Failed to save contact form to database: {form_data.email}")
-        # Continue even if DB save fails
-    
 
     # Prepare email content
     form_copy = f"""Contact Form Submission
@@ -60,21 +64,17 @@ User Agent: {request.headers.get('user-agent', 'N/A')}
 Timestamp: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}
 """
 
-    # Send emails
-    email_sent_count = 0
-    # Send to admins
-    for admin in ADMIN_EMAILS:
-        try:
-            sent = await send_email(
-                to_address=admin,
-                subject=f'Contact Form: {form_data.name} ({form_data.company})',
-                content=form_copy,
-                from_address=f"{FROM_NAME} <{FROM_EMAIL}>"
-            )
-            if sent:
-                email_sent_count += 1
-        except Exception as email_error:
-            logger.error(f"Failed to send to admin {admin}: {email_error}")
+    # Notifications to admins
+    emails = [
+        {
+            'to_address': admin,
+            'subject': f'Contact Form: {form_data.name} ({form_data.company})',
+            'content': form_copy,
+            'from_address': f"{FROM_NAME} <{FROM_EMAIL}>",
+            'digest': use_digest()
+        }
+        for admin in ADMIN_EMAILS
+    ]
     # Confirmation to user - HTML email
     try:
         # Prepare contact data for email template
@@ -90,31 +90,41 @@ Timestamp: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}
             'submitted_at': datetime.utcnow()
         }
         
-        # Render HTML email
+        # Render HTML email with its plain-text alternative
         html_content = email_renderer.render_contact_form_email(email_contact_data)
-        
-        confirm = await send_email(
-            to_address=form_data.email,
-            subject="Thank you for reaching out — SoftDAB",
-            content=html_content,
-            from_address=f"{FROM_NAME} <{FROM_EMAIL}>",
-            is_html=True
-        )
-        if confirm:
-            email_sent_count += 1
+        emails.append({
+            'to_address': form_data.email,
+            'subject': "Thank you for reaching out — SoftDAB",
+            'content': html_content,
+            'text_content': email_renderer.render_contact_form_text(email_contact_data),
+            'from_address': f"{FROM_NAME} <{FROM_EMAIL}>",
+            'is_html': True
+        })
     except Exception as email_error:
-        logger.error(f"Failed to send confirmation to user: {email_error}")
+        logger.error(f"Failed to prepare confirmation to user: {email_error}")
+    
+    # Save to SQLite database together with the outgoing emails
+    contact_id = await save_contact(contact_data, outbox=emails)
+    results = []
+    if contact_id:
+        logger.info(f"Contact form saved to database: {form_data.email}")
+        # Send this submission's emails concurrently (bounded wait); anything
+        # not delivered in time is retried by the outbox workers
+        results = await outbox.deliver_submission('contact', contact_id)
+    else:
+        logger.warning(f"Failed to save contact form to database: {form_data.email}")
     
     # HubSpot integration removed (previously would send contact_data asynchronously)
     
     # Return appropriate response
-    if saved:
-        if email_sent_count >= 2:
+    if contact_id:
+        delayed = [r for r in results if r['status'] != DELIVERY_SENT]
+        if not delayed:
             return {
                 "status": "success",
                 "message": "Your message has been received successfully. We'll get back to you soon!"
             }
-        elif email_sent_count > 0:
+        elif len(delayed) < len(results):
             return {
                 "status": "success",
                 "message": "Your message has been received. Some email notifications may be delayed."
@@ -129,68 +139,50 @@ Timestamp: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}
 
 
 @router.get("")
-async def get_contacts():
-    """Get all contact form submissions"""
+async def get_contacts(request: Request, response: Response,
+                       limit: int = Query(ADMIN_PAGE_DEFAULT_LIMIT, ge=1, le=ADMIN_PAGE_MAX_LIMIT),
+                       cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Get contact form submissions, newest first (next page in the X-Next-Cursor header)"""
+    after = decode_cursor(cursor)
+    selected = parse_fields(fields, CONTACT_LIST_FIELDS, CONTACT_LIST_DEFAULT_FIELDS)
+    # Unchanged since the client's copy: 304 without querying the rows
+    not_modified = await submission_list_validators(request, response, 'contacts')
+    if not_modified is not None:
+        return not_modified
     try:
-        conn = get_db_connection()
-        conn.row_factory = sqlite3.Row  # Enable dict-like access
-        cursor = conn.cursor()
-        
-        # Get all contacts ordered by date descending
-        cursor.execute("""
-            SELECT id, name, email, company, message, submitted_at, status 
-            FROM contacts 
-            ORDER BY submitted_at DESC
-        """)
-        
-        contacts = []
-        rows = cursor.fetchall()
-        logger.info(f"Found {len(rows)} contacts in database")
-        
-        for row in rows:
-            msg = row[4] or ""
-            contacts.append({
-                "id": row[0],
-                "name": row[1],
-                "email": row[2],
-                "company": row[3],
-                "message": (msg[:100] + "...") if len(msg) > 100 else msg,  # Truncate long messages
-                "date": to_local_time_str(row[5]),
-                "status": row[6] or "new"
-            })
-        
-        conn.close()
-        logger.info(f"Returning {len(contacts)} contacts")
-        return contacts
-        
+        rows = await get_submissions_page(
+            'contacts', [CONTACT_LIST_FIELDS[f] for f in selected], limit + 1, after,
+            truncate={'message': LIST_MESSAGE_PREVIEW_CHARS}
+        )
     except Exception as e:
         logger.error(f"Error fetching contacts: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch contacts: {str(e)}")
 
+    contacts = []
+    for row in paginate(request, response, rows, limit):
+        contact = {field: row[CONTACT_LIST_FIELDS[field]] for field in selected}
+        if 'date' in contact:
+            contact['date'] = to_local_time_str(contact['date'])
+        if 'status' in contact:
+            contact['status'] = contact['status'] or "new"
+        contacts.append(contact)
+    return contacts
+
 
 @router.get("/{contact_id}")
 async def get_contact_detail(contact_id: int):
     """Get full contact details by ID for admin modal"""
     try:
-        conn = get_db_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM contacts WHERE id = ?", (contact_id,))
-        row = cursor.fetchone()
-        columns = [description[0] for description in cursor.description]
-        conn.close()
-        if not row:
-            raise HTTPException(status_code=404, detail="Contact not found")
-        data = dict(zip(columns, row))
-        # Convert timestamp to local timezone string
-        if data.get('submitted_at'):
-            data['submitted_at'] = to_local_time_str(data['submitted_at'])
-        return data
-    except HTTPException:
-        raise
+        data = await get_submission('contacts', contact_id)
     except Exception as e:
         logger.error(f"Error fetching contact {contact_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch contact: {str(e)}")
+    if not data:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    # Convert timestamp to local timezone string
+    if data.get('submitted_at'):
+        data['submitted_at'] = to_local_time_str(data['submitted_at'])
+    return data
 
 
 
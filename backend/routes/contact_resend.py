@@ -1,5 +1,6 @@
 """
 Contact form routes with SQLite integration and Resend email API
+(emails are queued in the outbox and delivered in the background)
 """
 from fastapi import APIRouter, HTTPException, Request
 from models.contact import ContactForm
@@ -7,55 +8,20 @@ from database import save_contact
 from datetime import datetime
 import os
 import logging
-import httpx
+from utils.outbox import outbox
+from utils.digest import use_digest
+from utils.notifications import DELIVERY_SENT
+from routes.contact import get_contacts, get_contact_detail
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Resend Configuration
-RESEND_API_KEY = os.environ.get('RESEND_API_KEY')
-RESEND_API_URL = 'https://api.resend.com/emails'
 FROM_EMAIL = os.environ.get('FROM_EMAIL', 'info@softdab.tech')
 FROM_NAME = os.environ.get('FROM_NAME', 'SoftDAB')
 
-async def send_email_via_resend(to_email: str, subject: str, content: str):
-    """Send email via Resend API"""
-    if not RESEND_API_KEY:
-        logger.warning("⚠️ Resend API key not configured")
-        return False
-    
-    headers = {
-        'Authorization': f'Bearer {RESEND_API_KEY}',
-        'Content-Type': 'application/json'
-    }
-    
-    payload = {
-        "from": f"{FROM_NAME} <{FROM_EMAIL}>",
-        "to": [to_email],
-        "subject": subject,
-        "text": content
-    }
-    
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                RESEND_API_URL,
-                headers=headers,
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"✅ Email sent successfully to {to_email} via Resend (ID: {result.get('id')})")
-                return True
-            else:
-                error_text = response.text
-                logger.error(f"❌ Resend API error: {response.status_code} - {error_text}")
-                return False
-                
-    except Exception as e:
-        logger.error(f"❌ Failed to send email via Resend: {e}")
-        return False
+# Admin list (cursor pages, ETag / 304) and detail are shared with routes.contact
+router.add_api_route("", get_contacts, methods=["GET"])
+router.add_api_route("/{contact_id}", get_contact_detail, methods=["GET"])
 
 @router.post("")
 async def handle_contact(form_data: ContactForm, request: Request):
@@ -70,17 +36,10 @@ async def handle_contact(form_data: ContactForm, request: Request):
     if not form_data.gdprConsent:
         raise HTTPException(status_code=400, detail="GDPR consent is required")
     
-    # Save to SQLite database
     contact_data = form_data.dict()
     contact_data['ip_address'] = request.client.host
     contact_data['user_agent'] = request.headers.get('user-agent')
     
-    saved = await save_contact(contact_data)
-    if saved:
-        logger.info(f"💾 Contact form saved to database: {form_data.email}")
-    else:
-        logger.warning(f"⚠️ Failed to save contact form to database: {form_data.email}")
-    
     # Prepare notification email for info@softdab.tech
     notification_content = f"""New Contact Form Submission
 
@@ -143,39 +102,49 @@ The SoftDAB Team
 📧 info@softdab.tech
 """
 
-    # Send emails
-    email_sent_count = 0
-    
-    # 1. Send notification to info@softdab.tech
-    if await send_email_via_resend(
-        to_email='info@softdab.tech',
-        subject=f'🔔 New Contact Form: {form_data.name} from {form_data.company}',
-        content=notification_content
-    ):
-        email_sent_count += 1
+    emails = [
+        # 1. Notification to info@softdab.tech
+        {
+            'to_address': 'info@softdab.tech',
+            'subject': f'🔔 New Contact Form: {form_data.name} from {form_data.company}',
+            'content': notification_content,
+            'from_address': f"{FROM_NAME} <{FROM_EMAIL}>",
+            'digest': use_digest()
+        },
+        # 2. Confirmation to client
+        {
+            'to_address': form_data.email,
+            'subject': 'Thank you for contacting SoftDAB!',
+            'content': client_content,
+            'from_address': f"{FROM_NAME} <{FROM_EMAIL}>"
+        },
+    ]
     
-    # 2. Send confirmation to client
-    if await send_email_via_resend(
-        to_email=form_data.email,
-        subject='Thank you for contacting SoftDAB!',
-        content=client_content
-    ):
-        email_sent_count += 1
+    # Save to SQLite database together with the outgoing emails
+    contact_id = await save_contact(contact_data, outbox=emails)
+    results = []
+    if contact_id:
+        logger.info(f"💾 Contact form saved to database: {form_data.email}")
+        # Send this submission's emails concurrently (bounded wait); anything
+        # not delivered in time is retried by the outbox workers
+        results = await outbox.deliver_submission('contact', contact_id)
+    else:
+        logger.warning(f"⚠️ Failed to save contact form to database: {form_data.email}")
     
     # Return appropriate response
-    if saved:
-        if email_sent_count == 2:
+    if contact_id:
+        delayed = [r for r in results if r['status'] != DELIVERY_SENT]
+        if not delayed:
             return {
                 "status": "success",
                 "message": "Your message has been received successfully. We'll get back to you soon!"
             }
-        elif email_sent_count > 0:
+        elif len(delayed) < len(results):
             return {
                 "status": "success",
                 "message": "Your message has been received. Some email notifications may be delayed."
             }
         else:
-            logger.warning(f"⚠️ No emails sent for {form_data.email}")
             return {
                 "status": "success",
                 "message": "Your message has been saved. We'll contact you shortly."
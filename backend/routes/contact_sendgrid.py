@@ -7,14 +7,14 @@ from database import save_contact
 from datetime import datetime
 import os
 import logging
-import httpx
+from utils.http_clients import http_clients
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # SendGrid Configuration
 SENDGRID_API_KEY = os.environ.get('SENDGRID_API_KEY')
-SENDGRID_API_URL = 'https://api.sendgrid.com/v3/mail/send'
+SENDGRID_API_PATH = '/v3/mail/send'  # relative to the pooled SendGrid client base URL
 FROM_EMAIL = os.environ.get('FROM_EMAIL', 'info@softdab.tech')
 FROM_NAME = os.environ.get('FROM_NAME', 'SoftDAB')
 
@@ -45,20 +45,21 @@ async def send_email_via_sendgrid(to_email: str, subject: str, content: str):
     }
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                SENDGRID_API_URL,
-                headers=headers,
-                json=payload
-            )
+        client = http_clients.get('sendgrid')
+        response = await client.post(
+            SENDGRID_API_PATH,
+            headers=headers,
+            json=payload,
+            timeout=30.0
+        )
+        
+        if response.status_code == 202:
+            logger.info(f"✅ Email sent successfully to {to_email} via SendGrid")
+            return True
+        else:
+            logger.error(f"❌ SendGrid API error: {response.status_code} - {response.text}")
+            return False
             
-            if response.status_code == 202:
-                logger.info(f"✅ Email sent successfully to {to_email} via SendGrid")
-                return True
-            else:
-                logger.error(f"❌ SendGrid API error: {response.status_code} - {response.text}")
-                return False
-                
     except Exception as e:
         logger.error(f"❌ Failed to send email via SendGrid: {e}")
         return False
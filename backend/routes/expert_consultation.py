@@ -5,13 +5,18 @@ import json
 import logging
 import os
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field, EmailStr
 from typing import Optional, Dict, Any
-from database import save_expert_consultation, get_db_connection
+from database import save_expert_consultation, get_submissions_page, get_submission
 from utils.emailer import send_email
+from utils.outbox import outbox
+from utils.digest import use_digest
+from utils.notifications import DELIVERY_SENT
 from utils.timezone import to_local_time_str
 from utils.email_renderer import email_renderer
+from utils.conditional import submission_list_validators
+from utils.pagination import ADMIN_PAGE_DEFAULT_LIMIT, ADMIN_PAGE_MAX_LIMIT, decode_cursor, parse_fields, paginate
 
 def get_client_ip(request: Request) -> str:
     """Get client IP from request"""
@@ -27,6 +32,15 @@ FROM_EMAIL = os.getenv("FROM_EMAIL", "info@softdab.tech")
 # Allow multiple recipients via env (comma-separated); default to existing address if unset
 EXPERT_NOTIFY_EMAILS = [e.strip() for e in os.getenv("EXPERT_NOTIFICATION_EMAILS", "bombela@softdab.tech").split(',') if e.strip()]
 
+# Admin list: output field -> column, and what is returned without ?fields=
+CONSULTATION_LIST_FIELDS = {
+    'id': 'id', 'name': 'name', 'email': 'email', 'company': 'company', 'phone': 'phone',
+    'client_type': 'client_type', 'priority': 'priority', 'brief_message': 'brief_message',
+    'date': 'submitted_at', 'status': 'status',
+}
+CONSULTATION_LIST_DEFAULT_FIELDS = ['id', 'name', 'email', 'company', 'client_type', 'priority', 'date', 'status']
+LIST_MESSAGE_PREVIEW_CHARS = 100
+
 # Pydantic models for validation
 class StartupDetails(BaseModel):
     stage: Optional[str] = None
@@ -169,37 +183,36 @@ def get_routing_info(client_type: str, priority: int) -> Dict[str, Any]:
     
     return config
 
-async def send_expert_consultation_notification(consultation_data: dict, routing_info: dict, consultation_id: int):
-    """Send email notification about new expert consultation"""
-    try:
-        # Format details for email
-        details = json.loads(consultation_data.get('details', '{}')) if consultation_data.get('details') else {}
-        details_text = ""
-        
-        if details:
-            details_text = "\n\n=== ADDITIONAL DETAILS ===\n"
-            for key, value in details.items():
-                if value:
-                    formatted_key = key.replace('_', ' ').title()
-                    details_text += f"{formatted_key}: {value}\n"
-        
-        # UTM tracking info
-        utm_info = ""
-        if consultation_data.get('utm_source') or consultation_data.get('utm_medium'):
-            utm_info = f"\n\n=== TRACKING INFO ===\n"
-            if consultation_data.get('utm_source'):
-                utm_info += f"UTM Source: {consultation_data['utm_source']}\n"
-            if consultation_data.get('utm_medium'):
-                utm_info += f"UTM Medium: {consultation_data['utm_medium']}\n"
-            if consultation_data.get('utm_campaign'):
-                utm_info += f"UTM Campaign: {consultation_data['utm_campaign']}\n"
-            if consultation_data.get('referrer'):
-                utm_info += f"Referrer: {consultation_data['referrer']}\n"
-        
-        # Email content
-        subject = f"[EXPERT CONSULTATION] {consultation_data['client_type'].upper()} — {consultation_data.get('company', consultation_data['name'])} — Priority {consultation_data['priority']}/10"
-        
-        email_body = f"""
+def build_expert_consultation_notification(consultation_data: dict, routing_info: dict, consultation_id: int) -> dict:
+    """Build the admin email notification about new expert consultation"""
+    # Format details for email
+    details = json.loads(consultation_data.get('details', '{}')) if consultation_data.get('details') else {}
+    details_text = ""
+    
+    if details:
+        details_text = "\n\n=== ADDITIONAL DETAILS ===\n"
+        for key, value in details.items():
+            if value:
+                formatted_key = key.replace('_', ' ').title()
+                details_text += f"{formatted_key}: {value}\n"
+    
+    # UTM tracking info
+    utm_info = ""
+    if consultation_data.get('utm_source') or consultation_data.get('utm_medium'):
+        utm_info = f"\n\n=== TRACKING INFO ===\n"
+        if consultation_data.get('utm_source'):
+            utm_info += f"UTM Source: {consultation_data['utm_source']}\n"
+        if consultation_data.get('utm_medium'):
+            utm_info += f"UTM Medium: {consultation_data['utm_medium']}\n"
+        if consultation_data.get('utm_campaign'):
+            utm_info += f"UTM Campaign: {consultation_data['utm_campaign']}\n"
+        if consultation_data.get('referrer'):
+            utm_info += f"Referrer: {consultation_data['referrer']}\n"
+    
+    # Email content
+    subject = f"[EXPERT CONSULTATION] {consultation_data['client_type'].upper()} — {consultation_data.get('company', consultation_data['name'])} — Priority {consultation_data['priority']}/10"
+    
+    email_body = f"""
 NEW EXPERT CONSULTATION REQUEST
 
 === BASIC INFO ===
@@ -225,20 +238,14 @@ User Agent: {consultation_data.get('user_agent', 'Unknown')}
 Page URL: {consultation_data.get('page_url', 'Unknown')}
 Submitted: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
-        sent = await send_email(
-            to_address="info@softdab.tech",
-            subject=subject,
-            content=email_body,
-            from_address="noreply@softdab.tech"
-        )
-        if sent:
-            logger.info(f"Expert consultation copy sent to info@softdab.tech")
-            return True
-        logger.error(f"Expert consultation copy NOT sent to info@softdab.tech")
-        return False
-    except Exception as e:
-        logger.error(f"Error sending confirmation email: {e}")
-        return False
+    return {
+        'to_address': "info@softdab.tech",
+        'subject': subject,
+        'content': email_body,
+        'from_address': "noreply@softdab.tech",
+        # High-priority requests (>= 8) bypass the admin digest
+        'digest': use_digest(consultation_data['priority'])
+    }
 
 @router.post("")
 async def submit_expert_consultation(
@@ -293,25 +300,11 @@ async def submit_expert_consultation(
             "utm_campaign": request.utm_campaign
         }
         
-        # Save to database
-        consultation_id = await save_expert_consultation(consultation_data)
-        
-        # Send email notifications
-        email_sent_count = 0
-        
-        # Email to admin (info@softdab.tech)
-        try:
-            await send_expert_consultation_notification(consultation_data, routing_info, consultation_id)
-            email_sent_count += 1
-        except Exception as e:
-            logger.error(f"Failed to send admin notification for consultation {consultation_id}: {e}")
-        
         # Email to client - HTML email using template
+        test_email = os.environ.get('EXPERT_TEST_EMAIL', None)
+        client_to_address = test_email if test_email else consultation_data['email']
+        client_message = None
         try:
-            test_email = os.environ.get('EXPERT_TEST_EMAIL', None)
-            client_to_address = test_email if test_email else consultation_data['email']
-            client_subject = "Thank you for your expert consultation request — SoftDAB"
-            
             # Prepare consultation data for email template
             email_consultation_data = {
                 'name': consultation_data['name'],
@@ -321,27 +314,37 @@ async def submit_expert_consultation(
                 'brief_message': consultation_data['brief_message'],
                 'client_type': consultation_data['client_type'],
                 'priority': consultation_data['priority'],
-                'details': consultation_data.get('details'),
+                'details': details,  # already parsed, no json round-trip
                 'submitted_at': datetime.now()
             }
             
-            # Render HTML email
+            # Render HTML email with its plain-text alternative
             client_html = email_renderer.render_expert_consultation_email(email_consultation_data, routing_info)
-            
-            sent_client = await send_email(
-                to_address=client_to_address,
-                subject=client_subject,
-                content=client_html,
-                from_address="noreply@softdab.tech",
-                is_html=True
-            )
-            if sent_client:
-                logger.info(f"Expert consultation confirmation sent to client {client_to_address}")
-                email_sent_count += 1
-            else:
-                logger.warning(f"Expert consultation confirmation NOT sent to client {client_to_address}")
+            client_message = {
+                'to_address': client_to_address,
+                'subject': "Thank you for your expert consultation request — SoftDAB",
+                'content': client_html,
+                'text_content': email_renderer.render_expert_consultation_text(email_consultation_data, routing_info),
+                'from_address': "noreply@softdab.tech",
+                'is_html': True
+            }
         except Exception as e:
-            logger.error(f"Failed to send expert consultation confirmation to client: {e}")
+            logger.error(f"Failed to prepare expert consultation confirmation to client: {e}")
+        
+        def build_emails(consultation_id: int):
+            # Email to admin (info@softdab.tech) references the new row id
+            emails = [build_expert_consultation_notification(consultation_data, routing_info, consultation_id)]
+            if client_message:
+                emails.append(client_message)
+            return emails
+        
+        # Save to database; the emails are queued in the same transaction,
+        # sent concurrently and retried in the background (utils.outbox)
+        consultation_id = await save_expert_consultation(consultation_data, outbox=build_emails)
+        results = await outbox.deliver_submission('expert_consultation', consultation_id)
+        for result in results:
+            if result['status'] != DELIVERY_SENT:
+                logger.warning(f"Expert consultation email to {result['to_address']} delayed ({result['status']}): {result['error']}")
         
         # HubSpot integration removed (previously send_to_hubspot_consultation call)
         
@@ -392,70 +395,54 @@ Submitted: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 
 @router.get("")
-async def get_expert_consultations():
-    """Get all expert consultation submissions for admin panel"""
+async def get_expert_consultations(request: Request, response: Response,
+                                   limit: int = Query(ADMIN_PAGE_DEFAULT_LIMIT, ge=1, le=ADMIN_PAGE_MAX_LIMIT),
+                                   cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Get expert consultation submissions for admin panel, newest first (next page in X-Next-Cursor)"""
+    after = decode_cursor(cursor)
+    selected = parse_fields(fields, CONSULTATION_LIST_FIELDS, CONSULTATION_LIST_DEFAULT_FIELDS)
+    # Unchanged since the client's copy: 304 without querying the rows
+    not_modified = await submission_list_validators(request, response, 'expert_consultations')
+    if not_modified is not None:
+        return not_modified
     try:
-        conn = get_db_connection()
-        conn.row_factory = __import__('sqlite3').Row
-        cursor = conn.cursor()
-        
-        # Get all consultations ordered by date descending
-        cursor.execute("""
-            SELECT id, name, email, company, client_type, priority, submitted_at, status 
-            FROM expert_consultations 
-            ORDER BY submitted_at DESC
-        """)
-        
-        consultations = []
-        rows = cursor.fetchall()
-        logger.info(f"Found {len(rows)} expert consultations in database")
-        
-        for row in rows:
-            consultations.append({
-                "id": row[0],
-                "name": row[1],
-                "email": row[2],
-                "company": row[3],
-                "client_type": row[4] or "unknown",
-                "priority": row[5] or "normal",
-                "date": to_local_time_str(row[6]),
-                "status": row[7] or "new"
-            })
-        
-        conn.close()
-        logger.info(f"Returning {len(consultations)} expert consultations")
-        return consultations
-        
+        rows = await get_submissions_page(
+            'expert_consultations', [CONSULTATION_LIST_FIELDS[f] for f in selected], limit + 1, after,
+            truncate={'brief_message': LIST_MESSAGE_PREVIEW_CHARS}
+        )
     except Exception as e:
         logger.error(f"Error fetching expert consultations: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch consultations: {str(e)}")
 
+    defaults = {'client_type': "unknown", 'priority': "normal", 'status': "new"}
+    consultations = []
+    for row in paginate(request, response, rows, limit):
+        consultation = {field: row[CONSULTATION_LIST_FIELDS[field]] for field in selected}
+        for field, default in defaults.items():
+            if field in consultation:
+                consultation[field] = consultation[field] or default
+        if 'date' in consultation:
+            consultation['date'] = to_local_time_str(consultation['date'])
+        consultations.append(consultation)
+    return consultations
+
 
 @router.get("/{consultation_id}")
 async def get_expert_consultation_detail(consultation_id: int):
     """Get full expert consultation details by ID for admin modal"""
     try:
-        conn = get_db_connection()
-        conn.row_factory = __import__('sqlite3').Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM expert_consultations WHERE id = ?", (consultation_id,))
-        row = cursor.fetchone()
-        columns = [description[0] for description in cursor.description]
-        conn.close()
-        if not row:
-            raise HTTPException(status_code=404, detail="Consultation not found")
-        data = dict(zip(columns, row))
-        # Parse details blob to dict if present
-        try:
-            if data.get('details'):
-                data['details'] = json.loads(data['details'])
-        except Exception:
-            pass
-        if data.get('submitted_at'):
-            data['submitted_at'] = to_local_time_str(data['submitted_at'])
-        return data
-    except HTTPException:
-        raise
+        data = await get_submission('expert_consultations', consultation_id)
     except Exception as e:
         logger.error(f"Error fetching expert consultation {consultation_id}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch consultation detail")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to fetch consultation detail")
+    if not data:
+        raise HTTPException(status_code=404, detail="Consultation not found")
+    # Parse details blob to dict if present
+    try:
+        if data.get('details'):
+            data['details'] = json.loads(data['details'])
+    except Exception:
+        pass
+    if data.get('submitted_at'):
+        data['submitted_at'] = to_local_time_str(data['submitted_at'])
+    return data
\ No newline at end of file
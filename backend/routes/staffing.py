@@ -4,7 +4,9 @@ from database import save_staffing_request
 from datetime import datetime
 import logging
 import os
-from utils.emailer import send_email
+from utils.outbox import outbox
+from utils.digest import use_digest
+from utils.notifications import DELIVERY_SENT
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -28,10 +30,6 @@ async def create_staffing_request(form: StaffingRequest, request: Request):
     data['ip_address'] = request.client.host
     data['user_agent'] = request.headers.get('user-agent')
 
-    saved = await save_staffing_request(data)
-    if not saved:
-        logger.warning(f"Failed to save staffing request to DB: {form.email}")
-
     # Build admin notification email
     roles_str = ", ".join(form.roles)
     notification = f"""New Staffing Request\n\n"""
@@ -42,39 +40,40 @@ async def create_staffing_request(form: StaffingRequest, request: Request):
     notification += f"IP: {request.client.host}\nUA: {request.headers.get('user-agent', 'N/A')}\n"
     notification += f"Timestamp: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}\n"
 
-    sent_count = 0
-    for admin in ADMIN_EMAILS:
-        try:
-            ok = await send_email(
-                to_address=admin,
-                subject=f"Staffing Request: {form.name} ({form.company or 'N/A'})",
-                content=notification,
-                from_address=f"{FROM_NAME} <{FROM_EMAIL}>"
-            )
-            if ok:
-                sent_count += 1
-        except Exception as e:
-            logger.error(f"Failed to notify admin {admin}: {e}")
+    emails = [
+        {
+            'to_address': admin,
+            'subject': f"Staffing Request: {form.name} ({form.company or 'N/A'})",
+            'content': notification,
+            'from_address': f"{FROM_NAME} <{FROM_EMAIL}>",
+            'digest': use_digest()
+        }
+        for admin in ADMIN_EMAILS
+    ]
 
     # Confirmation to user
-    try:
-        confirm_text = f"""Dear {form.name},\n\nThank you for your staffing request!\nOur team will contact you within 24 hours.\n\nBest regards,\nSoftDAB Team\nhttps://softdab.tech\n"""
-        ok = await send_email(
-            to_address=form.email,
-            subject="We received your staffing request — SoftDAB",
-            content=confirm_text,
-            from_address=f"{FROM_NAME} <{FROM_EMAIL}>"
-        )
-        if ok:
-            sent_count += 1
-    except Exception as e:
-        logger.error(f"Failed to send staffing confirmation to user: {e}")
+    confirm_text = f"""Dear {form.name},\n\nThank you for your staffing request!\nOur team will contact you within 24 hours.\n\nBest regards,\nSoftDAB Team\nhttps://softdab.tech\n"""
+    emails.append({
+        'to_address': form.email,
+        'subject': "We received your staffing request — SoftDAB",
+        'content': confirm_text,
+        'from_address': f"{FROM_NAME} <{FROM_EMAIL}>"
+    })
+
+    # Request and emails are committed together; the outbox delivers them
+    request_id = await save_staffing_request(data, outbox=emails)
+    results = []
+    if request_id:
+        results = await outbox.deliver_submission('staffing', request_id)
+    else:
+        logger.warning(f"Failed to save staffing request to DB: {form.email}")
 
     # Response mirrors contact handler
-    if saved:
-        if sent_count >= 2:
+    if request_id:
+        delayed = [r for r in results if r['status'] != DELIVERY_SENT]
+        if not delayed:
             return {"status": "success", "message": "Your request has been received. We'll get back to you soon!"}
-        elif sent_count > 0:
+        elif len(delayed) < len(results):
             return {"status": "success", "message": "Request received. Some emails may be delayed."}
         else:
             return {"status": "success", "message": "Request saved. We'll contact you shortly."}
@@ -1,15 +1,42 @@
-from fastapi import APIRouter, Request, HTTPException
-from database import unsubscribe_email
+import html
+from fastapi import APIRouter, Form, HTTPException
+from fastapi.responses import HTMLResponse
+from utils.suppression import suppression, verify_unsubscribe_token
 
 router = APIRouter()
 
-@router.get("/unsubscribe")
-async def unsubscribe(email: str, request: Request):
-    """Unsubscribe email from marketing emails"""
+CONFIRM_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta name="robots" content="noindex"><title>Unsubscribe</title></head>
+<body style="font-family:sans-serif;max-width:480px;margin:48px auto;">
+<p>Stop emails from SoftDAB to <b>{email}</b>?</p>
+<form method="post" action="">
+<input type="hidden" name="email" value="{email}"><input type="hidden" name="token" value="{token}">
+<button type="submit">Unsubscribe</button>
+</form>
+</body></html>"""
+
+
+def _check(email: str, token: str):
+    """Reject addresses and links not signed by us (only the recipient has the token)"""
     if not email or "@" not in email:
         raise HTTPException(status_code=400, detail="Invalid email")
-    result = await unsubscribe_email(email)
+    if not verify_unsubscribe_token(email, token):
+        raise HTTPException(status_code=403, detail="Invalid unsubscribe link")
+
+
+@router.get("/unsubscribe", response_class=HTMLResponse)
+async def confirm_unsubscribe(email: str, token: str = ''):
+    """Confirmation page for an unsubscribe link; it changes nothing, so link prefetchers are harmless"""
+    _check(email, token)
+    return CONFIRM_PAGE.format(email=html.escape(email), token=html.escape(token))
+
+
+@router.post("/unsubscribe")
+async def unsubscribe(email: str = Form(...), token: str = Form('')):
+    """Unsubscribe an address: it is added to the suppression list and no longer emailed"""
+    _check(email, token)
+    result = await suppression.unsubscribe(email)
     if result:
-        return {"status": "success", "message": f"{email} unsubscribed from marketing emails."}
+        return {"status": "success", "message": f"{email} will no longer receive emails from us."}
     else:
         raise HTTPException(status_code=500, detail="Failed to unsubscribe email")
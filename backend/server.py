@@ -10,9 +10,17 @@ load_dotenv()
 
 # Теперь используем относительные импорты для запуска из папки backend
 from database import init_database, close_database
+from utils.outbox import outbox
+from utils.digest import digest
+from middlewares.data_retention import retention
+from utils.suppression import suppression
+from utils.http_clients import http_clients
+from utils.smtp_pool import smtp_pool
 from routes.contact_resend import router as contact_router  # Using Resend API for email delivery
 from routes.staffing import router as staffing_router
 from routes.expert_consultation import router as expert_consultation_router
+from routes.admin import router as admin_router
+from routes.unsubscribe import router as unsubscribe_router
 
 # Import security middleware
 from middlewares.security import SecurityHeadersMiddleware
@@ -49,12 +57,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["*"],
+    # Admin lists page with a cursor returned in these headers
+    expose_headers=["X-Next-Cursor", "Link"],
 )
 
 # Add middleware (order matters!)
 app.add_middleware(PerformanceMiddleware)
 app.add_middleware(CompressionMiddleware)
-app.add_middleware(CacheMiddleware, ttl=300)  # 5 minutes cache
+app.add_middleware(CacheMiddleware, ttl=300)  # default TTL for CACHE_RULES routes
 app.add_middleware(SecurityHeadersMiddleware)
 app.add_middleware(RateLimitMiddleware)
 # CSRF отключён для публичных форм - если нужен, применяйте только к защищённым роутам
@@ -63,13 +73,26 @@ app.add_middleware(RateLimitMiddleware)
 # Event handlers
 @app.on_event("startup")
 async def startup_event():
-    """Initialize SQLite database on startup"""
+    """Initialize SQLite database, suppression list, email HTTP clients, outbox workers, admin digest and retention on startup"""
     await init_database()
+    # Loaded before the outbox starts so nothing is sent to suppressed addresses
+    await suppression.refresh()
+    suppression.start()
+    await http_clients.start()
+    outbox.start()
+    digest.start()
+    retention.start()
     logger.info("Application started with SQLite database")
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Close database connection on shutdown"""
+    """Stop background tasks, close email transports and database connection on shutdown"""
+    await retention.stop()
+    await digest.stop()
+    await suppression.stop()
+    await outbox.stop()
+    await http_clients.close()
+    smtp_pool.close()
     await close_database()
     logger.info("Application shutdown")
 
@@ -77,6 +100,8 @@ async def shutdown_event():
 app.include_router(contact_router, prefix="/api/contact")
 app.include_router(staffing_router, prefix="/api/staffing")
 app.include_router(expert_consultation_router, prefix="/api/expert-consultation")
+app.include_router(admin_router, prefix="/api/admin")
+app.include_router(unsubscribe_router, prefix="/api")
 
 @app.get("/")
 async def root():
@@ -0,0 +1,31 @@
+import pytest
+import pytest_asyncio
+
+import database
+
+
+@pytest_asyncio.fixture
+async def temp_db(tmp_path, monkeypatch):
+    """Initialized SQLite database in a temporary directory"""
+    monkeypatch.setattr(database, 'DB_DIR', tmp_path)
+    monkeypatch.setattr(database, 'DB_FILE', tmp_path / 'contacts.db')
+    await database.init_database()
+    yield database
+    await database.close_database()
+
+
+@pytest.fixture(autouse=True)
+def fresh_provider_health(monkeypatch):
+    """Isolate the global email circuit breakers and retry budget between tests"""
+    from utils import emailer
+    from utils.circuit_breaker import CircuitBreaker, RetryBudget
+    monkeypatch.setattr(emailer, 'breakers', {name: CircuitBreaker(name) for name in emailer.breakers})
+    monkeypatch.setattr(emailer, 'retry_budget', RetryBudget())
+
+
+@pytest.fixture(autouse=True)
+def fresh_suppression_list(monkeypatch):
+    """Isolate the global in-memory suppression list between tests"""
+    from utils.suppression import suppression
+    monkeypatch.setattr(suppression, '_emails', set())
+    monkeypatch.setattr(suppression, '_last_id', 0)
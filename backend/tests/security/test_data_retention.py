@@ -1,46 +1,122 @@
+import time
 import pytest
-from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
-from middlewares.data_retention import DataRetentionPolicy, GDPRCompliance
-
-class MockCollection:
-    async def delete_many(self, query):
-        return None
-    async def find_one(self, query):
-        return {
-            '_id': 'test_id',
-            'name': 'John Doe',
-            'email': 'john@example.com',
-            'phone': '123-456-7890',
-            'timestamp': datetime.utcnow()
-        }
-    async def update_one(self, query, update):
-        return None
-    async def insert_one(self, doc):
-        return None
-
-@pytest.fixture
-def mock_db():
-    class MockDB:
-        def __init__(self):
-            self.collection = MockCollection()
-            self.access_logs = MockCollection()
-        def __getitem__(self, key):
-            return self.collection
-        async def get_collection(self, name):
-            return self.collection
-    
-    return MockDB()
+from fastapi import HTTPException
+
+import database
+from middlewares import data_retention
+from middlewares.data_retention import DataRetentionPolicy, RetentionScheduler, GDPRCompliance
+
+
+def _days_ago(days):
+    return (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+async def _insert_contacts(ages):
+    async with database._transaction() as connection:
+        for i, age in enumerate(ages):
+            await connection.execute("""
+                INSERT INTO contacts (name, email, company, role, service, timeline, budget, message,
+                                      gdpr_consent, ip_address, submitted_at)
+                VALUES (?, ?, 'Co', 'CTO', 'Web', 'soon', '10k', 'Hello', 1, '10.0.0.1', ?)
+            """, (f'User {i}', f'user{i}@example.com', _days_ago(age)))
+
+
+async def _contacts():
+    async with database._read() as reader, reader.execute(
+        "SELECT id, name, email, ip_address, status FROM contacts ORDER BY id"
+    ) as cursor:
+        return [tuple(row) for row in await cursor.fetchall()]
+
 
 @pytest.mark.asyncio
-async def test_data_retention_policy(mock_db):
-    policy = DataRetentionPolicy(mock_db)
-    
-    # Test cleanup of expired data
-    await policy.cleanup_expired_data()
-    
-    # Test data anonymization
-    await policy.anonymize_data('contacts', 'test_id')
+async def test_cleanup_deletes_expired_rows_in_batches(temp_db):
+    await _insert_contacts([400, 500, 600, 700, 800, 10])
+    async with database._transaction() as connection:
+        for status, age in (('sent', 40), ('dead', 40), ('pending', 40), ('sent', 5)):
+            await connection.execute(
+                "INSERT INTO email_outbox (submission_type, to_address, subject, content, status, "
+                "next_attempt_at, created_at) VALUES ('contact', 'a@example.com', 's', 'c', ?, ?, ?)",
+                (status, time.time(), _days_ago(age))
+            )
+    reported = []
+
+    processed = await DataRetentionPolicy(365, 30, 'delete').cleanup_expired_data(
+        batch_size=2, pause=0, progress=lambda table, count: reported.append((table, count))
+    )
+
+    assert processed == {'contacts': 5, 'staffing_requests': 0, 'expert_consultations': 0, 'email_outbox': 2}
+    # Three batches of at most two rows (the last one short)
+    assert [count for table, count in reported if table == 'contacts'] == [2, 4, 5]
+    assert [row[0] for row in await _contacts()] == [6]
+    async with database._read() as reader, reader.execute("SELECT status FROM email_outbox ORDER BY id") as cursor:
+        assert [row[0] for row in await cursor.fetchall()] == ['pending', 'sent']
+    # Deleted rows leave the search index, the daily rollups keep counting them
+    assert await database.search_submissions('contacts', 'user0', 10) == []
+    assert sum(row['submissions'] for row in await database.get_rollup_counts(
+        ['submission_type'], '2000-01-01', '2999-12-31', {})) == 6
+
+
+@pytest.mark.asyncio
+async def test_cleanup_anonymizes_once(temp_db):
+    await _insert_contacts([400, 10])
+    policy = DataRetentionPolicy(365, 30, 'anonymize')
+
+    first = await policy.cleanup_expired_data(batch_size=10, pause=0)
+    second = await policy.cleanup_expired_data(batch_size=10, pause=0)
+
+    assert first['contacts'] == 1 and second['contacts'] == 0
+    assert await _contacts() == [
+        (1, 'Anonymous User', 'anonymized@example.com', '0.0.0.0', 'anonymized'),
+        (2, 'User 1', 'user1@example.com', '10.0.0.1', 'new'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_retention_batches_use_partial_index(temp_db):
+    sql, params = database._expire_rows_query('contacts', 'submitted_at', "status IS NOT 'anonymized'", None)
+    async with database._read() as reader, reader.execute(
+        f"EXPLAIN QUERY PLAN {sql}", [*params, _days_ago(365), 500]
+    ) as cursor:
+        plan = ' '.join(row[-1] for row in await cursor.fetchall())
+    assert 'idx_contacts_retention' in plan
+
+
+@pytest.mark.asyncio
+async def test_scheduler_run_records_metrics(temp_db):
+    await _insert_contacts([400])
+    scheduler = RetentionScheduler(DataRetentionPolicy(365, 30, 'delete'), batch_size=10, pause=0)
+
+    await scheduler.run_once()
+    snapshot = scheduler.snapshot()
+
+    assert snapshot['runs'] == 1 and snapshot['errors'] == 0 and not snapshot['running']
+    assert snapshot['last_run']['processed']['contacts'] == 1
+    assert snapshot['total_processed']['contacts'] == 1
+    assert snapshot['progress']['contacts'] == 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_is_opt_in(temp_db, monkeypatch):
+    await _insert_contacts([400])
+    monkeypatch.setattr(data_retention, 'RETENTION_ENABLED', False)
+    scheduler = RetentionScheduler(DataRetentionPolicy(365, 30, 'delete'), batch_size=10, pause=0)
+    scheduler.start()
+    assert scheduler._task is None and scheduler.snapshot()['enabled'] is False
+    assert len(await _contacts()) == 1
+
+
+@pytest.mark.asyncio
+async def test_anonymize_on_request(temp_db):
+    await _insert_contacts([10])
+    policy = DataRetentionPolicy()
+
+    await policy.anonymize_data('contacts', 1)
+    with pytest.raises(HTTPException):
+        await policy.anonymize_data('contacts', 99)
+
+    assert (await _contacts())[0][1:] == ('Anonymous User', 'anonymized@example.com', '0.0.0.0', 'anonymized')
+
 
 @pytest.mark.asyncio
 async def test_gdpr_compliance():
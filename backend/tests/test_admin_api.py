@@ -0,0 +1,127 @@
+import json
+import pytest
+import httpx
+from fastapi import FastAPI
+
+import database
+from routes import contact, expert_consultation
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.include_router(contact.router, prefix="/api/contact")
+    app.include_router(expert_consultation.router, prefix="/api/expert-consultation")
+    return app
+
+
+async def _insert_contacts(count, message='Hello'):
+    async with database._transaction():
+        for i in range(count):
+            await database.database.connection.execute("""
+                INSERT INTO contacts (name, email, company, role, service, timeline, budget, message,
+                                      gdpr_consent, submitted_at)
+                VALUES (?, ?, 'Co', 'CTO', 'Web', 'soon', '10k', ?, 1, ?)
+            """, (f'User {i}', f'user{i}@example.com', message, f'2024-01-01 00:00:{i // 2:02d}'))
+
+
+@pytest.mark.asyncio
+async def test_contacts_keyset_pages_cover_every_row_once(temp_db, app):
+    await _insert_contacts(7)
+    seen, cursor, pages = [], None, 0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        while True:
+            params = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+            response = await client.get('/api/contact', params=params)
+            assert response.status_code == 200
+            seen += [row['id'] for row in response.json()]
+            pages += 1
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+            assert 'rel="next"' in response.headers['Link']
+    # Newest first, ties on submitted_at broken by id, no empty trailing page
+    assert seen == [7, 6, 5, 4, 3, 2, 1]
+    assert pages == 3
+
+
+@pytest.mark.asyncio
+async def test_contacts_projection_and_sql_truncation(temp_db, app):
+    await _insert_contacts(1, message='x' * 150)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        default = (await client.get('/api/contact')).json()[0]
+        projected = (await client.get('/api/contact', params={'fields': 'id,message'})).json()[0]
+        unknown = await client.get('/api/contact', params={'fields': 'id,ip_address'})
+        bad_cursor = await client.get('/api/contact', params={'cursor': 'not-a-cursor'})
+    assert set(default) == {'id', 'name', 'email', 'company', 'message', 'date', 'status'}
+    assert default['status'] == 'new'
+    assert projected == {'id': 1, 'message': 'x' * 100 + '...'}
+    assert unknown.status_code == 400
+    assert bad_cursor.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_contact_detail(temp_db, app):
+    await _insert_contacts(1)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        found = await client.get('/api/contact/1')
+        missing = await client.get('/api/contact/99')
+    assert found.json()['message'] == 'Hello'
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_expert_consultations_list_and_detail(temp_db, app):
+    consultation_id = await database.save_expert_consultation({
+        'client_type': 'startup', 'name': 'Ann', 'email': 'ann@example.com', 'brief_message': 'Need help',
+        'consent': True, 'details': json.dumps({'stage': 'seed'}), 'priority': 7,
+    })
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        listed = await client.get('/api/expert-consultation', params={'limit': 1})
+        detail = await client.get(f'/api/expert-consultation/{consultation_id}')
+    assert listed.json() == [{
+        'id': consultation_id, 'name': 'Ann', 'email': 'ann@example.com', 'company': None,
+        'client_type': 'startup', 'priority': 7, 'date': listed.json()[0]['date'], 'status': 'new',
+    }]
+    assert 'X-Next-Cursor' not in listed.headers
+    assert detail.json()['details'] == {'stage': 'seed'}
+
+
+@pytest.mark.asyncio
+async def test_unchanged_contact_list_is_answered_with_304(temp_db, app, monkeypatch):
+    await _insert_contacts(2)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        first = await client.get('/api/contact', params={'limit': 1})
+        etag = first.headers['ETag']
+        assert first.headers['Cache-Control'] == 'private, no-cache'
+
+        async def no_query(*args, **kwargs):
+            raise AssertionError('the list was queried')
+        monkeypatch.setattr(contact, 'get_submissions_page', no_query)
+        by_etag = await client.get('/api/contact', params={'limit': 1}, headers={'If-None-Match': etag})
+        by_date = await client.get('/api/contact', params={'limit': 1},
+                                   headers={'If-Modified-Since': first.headers['Last-Modified']})
+        monkeypatch.undo()
+        other_page = await client.get('/api/contact', params={'limit': 2}, headers={'If-None-Match': etag})
+        async with database._transaction():
+            await database.database.connection.execute("UPDATE contacts SET status = 'read' WHERE id = 1")
+        changed = await client.get('/api/contact', params={'limit': 1}, headers={'If-None-Match': etag})
+    assert by_etag.status_code == 304 and by_etag.content == b'' and by_etag.headers['ETag'] == etag
+    assert by_date.status_code == 304
+    assert other_page.status_code == 200
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+
+@pytest.mark.asyncio
+async def test_server_serves_the_paginated_contact_list(temp_db):
+    from server import app as server_app
+    await _insert_contacts(3)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server_app), base_url='http://test') as client:
+        page = await client.get('/api/contact', params={'limit': 2})
+        revalidated = await client.get('/api/contact', params={'limit': 2},
+                                       headers={'If-None-Match': page.headers['ETag']})
+        detail = await client.get('/api/contact/1')
+    assert page.status_code == 200 and [row['id'] for row in page.json()] == [3, 2]
+    assert page.headers['X-Next-Cursor'] and 'rel="next"' in page.headers['Link']
+    assert revalidated.status_code == 304
+    assert detail.json()['message'] == 'Hello'
@@ -0,0 +1,95 @@
+import pytest
+import httpx
+from fastapi import FastAPI
+
+import database
+from routes import admin
+from utils import analytics
+
+CONTACT = {
+    'name': 'Jane', 'email': 'jane@example.com', 'company': 'Acme', 'role': 'CTO', 'service': 'Web',
+    'timeline': 'soon', 'budget': '10k', 'message': 'Hello', 'gdprConsent': True,
+}
+
+
+def _consultation(priority, utm_source=None, client_type='startup'):
+    return {
+        'client_type': client_type, 'name': 'Ann', 'email': 'ann@example.com', 'brief_message': 'Help',
+        'consent': True, 'priority': priority, 'utm_source': utm_source, 'utm_medium': 'cpc' if utm_source else None,
+    }
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(admin, 'ADMIN_API_TOKEN', 'secret')
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+    return app
+
+
+async def _rollups():
+    async with database.database.connection.execute(
+        "SELECT submission_type, client_type, priority_band, utm_source, submissions FROM submission_daily_rollups "
+        "ORDER BY submission_type, client_type, priority_band, utm_source"
+    ) as cursor:
+        return await cursor.fetchall()
+
+
+async def _seed():
+    await database.save_contact(CONTACT)
+    await database.save_contact(CONTACT)
+    await database.save_expert_consultation(_consultation(9, 'google'))
+    await database.save_expert_consultation(_consultation(9, 'google'))
+    await database.save_expert_consultation(_consultation(5))
+    await database.save_expert_consultation(_consultation(2, client_type='enterprise'))
+
+
+@pytest.mark.asyncio
+async def test_inserts_update_rollups_and_rebuild_matches(temp_db):
+    await _seed()
+    # Empty and missing UTM values share one rollup row
+    await database.save_expert_consultation(_consultation(5, utm_source=''))
+    expected = [
+        ('contact', '', '', '', 2),
+        ('expert_consultation', 'enterprise', 'low', '', 1),
+        ('expert_consultation', 'startup', 'high', 'google', 2),
+        ('expert_consultation', 'startup', 'medium', '', 2),
+    ]
+    assert [tuple(row) for row in await _rollups()] == expected
+    assert await database.rebuild_rollups() == 4
+    assert [tuple(row) for row in await _rollups()] == expected
+
+
+@pytest.mark.asyncio
+async def test_analytics_endpoint_reads_rollups(temp_db, app):
+    await _seed()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test',
+                                 headers={'Authorization': 'Bearer secret'}) as client:
+        by_type = (await client.get('/api/admin/analytics', params={'group_by': 'submission_type'})).json()
+        by_band = (await client.get('/api/admin/analytics', params={
+            'group_by': 'priority_band,utm_source', 'submission_type': 'expert_consultation', 'utm_medium': 'cpc'
+        })).json()
+        bad = await client.get('/api/admin/analytics', params={'group_by': 'email'})
+        too_long = await client.get('/api/admin/analytics', params={'from': '2000-01-01', 'to': '2020-01-01'})
+    assert by_type['rows'] == [
+        {'submission_type': 'contact', 'submissions': 2},
+        {'submission_type': 'expert_consultation', 'submissions': 4},
+    ]
+    assert by_type['total'] == 6
+    assert by_band['rows'] == [{'priority_band': 'high', 'utm_source': 'google', 'submissions': 2}]
+    assert bad.status_code == 400 and too_long.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_rollup_query_does_not_touch_submission_tables(temp_db):
+    async with database.database.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT day, SUM(submissions) FROM submission_daily_rollups "
+        "WHERE day BETWEEN ? AND ? GROUP BY day", ('2024-01-01', '2024-01-31')
+    ) as cursor:
+        plan = ' '.join(row[3] for row in await cursor.fetchall())
+    assert 'SEARCH submission_daily_rollups USING PRIMARY KEY (day>? AND day<?)' in plan
+
+
+def test_cli_requires_a_command():
+    with pytest.raises(SystemExit):
+        analytics.main([])
@@ -0,0 +1,116 @@
+import httpx
+import pytest
+
+from utils import emailer
+from utils.circuit_breaker import CircuitBreaker, RetryBudget, CLOSED, OPEN, HALF_OPEN
+from utils.http_clients import http_clients
+
+
+def test_breaker_opens_on_error_rate_and_recovers_after_probe(monkeypatch):
+    breaker = CircuitBreaker('test', min_requests=4, error_rate=0.5, open_seconds=30)
+    for _ in range(2):
+        breaker.record_success(100)
+    for _ in range(2):
+        breaker.record_failure(100)
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+    # After the cool-down a single probe is let through
+    monkeypatch.setattr(breaker, '_opened_at', breaker._opened_at - 31)
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_success(100)
+    assert breaker.state == CLOSED
+
+
+def test_breaker_opens_on_slow_calls():
+    breaker = CircuitBreaker('test', min_requests=3, slow_call_ms=1000)
+    for _ in range(3):
+        breaker.record_success(2500)
+    assert breaker.state == OPEN
+
+
+def test_retry_budget_limits_retries():
+    budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=1)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_spend()
+
+
+@pytest.mark.asyncio
+async def test_failover_skips_open_provider(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(503, text='unavailable')
+
+    client = httpx.AsyncClient(base_url='https://api.resend.com', transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(http_clients._clients, 'resend', client)
+    monkeypatch.setattr(emailer, 'RESEND_API_KEY', 're_test')
+    monkeypatch.setattr(emailer, 'SENDGRID_API_KEY', None)
+    smtp_sends = []
+
+    async def fake_smtp(to_address, *args):
+        smtp_sends.append(to_address)
+        return True
+
+    monkeypatch.setitem(emailer._SENDERS, 'smtp', fake_smtp)
+    for i in range(3):
+        assert await emailer.send_email(f'user{i}@example.com', 'Hi', 'Body')
+
+    # After one 503 the healthier SMTP transport is preferred
+    assert len(requests) == 1
+    assert len(smtp_sends) == 3
+    assert emailer.providers_by_health()[0] == 'smtp'
+
+    # An open breaker is never called, even when nothing else is healthier
+    for _ in range(5):
+        emailer.breakers['resend'].record_failure(100)
+        emailer.breakers['smtp'].record_failure(100)
+    assert emailer.breakers['resend'].state == OPEN
+    assert not await emailer.send_email('late@example.com', 'Hi', 'Body')
+    assert len(requests) == 1
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_rejection_does_not_trip_breaker_or_fail_over(monkeypatch):
+    monkeypatch.setattr(emailer, 'RESEND_API_KEY', None)
+    monkeypatch.setattr(emailer, 'SENDGRID_API_KEY', 'sg_test')
+    calls = []
+
+    async def rejecting(to_address, *args):
+        calls.append(to_address)
+        return False
+
+    monkeypatch.setitem(emailer._SENDERS, 'sendgrid', rejecting)
+    monkeypatch.setitem(emailer._SENDERS, 'smtp', rejecting)
+
+    assert not await emailer.send_email('bad@example.com', 'Hi', 'Body')
+    # The refusal is final even with retry budget left
+    assert emailer.retry_budget.tokens > 1
+    assert calls == ['bad@example.com']
+    assert emailer.breakers['sendgrid'].error_rate() == 0
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_caps_failover(monkeypatch):
+    monkeypatch.setattr(emailer, 'RESEND_API_KEY', None)
+    monkeypatch.setattr(emailer, 'SENDGRID_API_KEY', 'sg_test')
+    monkeypatch.setattr(emailer, 'retry_budget', RetryBudget(ratio=0, min_per_second=0, max_tokens=0))
+    calls = []
+
+    async def unavailable(to_address, *args):
+        calls.append(to_address)
+        raise emailer.ProviderUnavailable('503')
+
+    monkeypatch.setitem(emailer._SENDERS, 'sendgrid', unavailable)
+    monkeypatch.setitem(emailer._SENDERS, 'smtp', unavailable)
+
+    assert not await emailer.send_email('user@example.com', 'Hi', 'Body')
+    # No retry budget: only the first provider was tried
+    assert calls == ['user@example.com']
@@ -0,0 +1,149 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import pytest
+
+import database
+
+CONTACT = {
+    'name': 'Test User',
+    'email': 'test@example.com',
+    'company': 'Test Company',
+    'role': 'CTO',
+    'service': 'Web Development',
+    'timeline': '1-3 months',
+    'budget': '10k-50k',
+    'message': 'This is a test message',
+    'gdprConsent': True,
+}
+
+
+@pytest.mark.asyncio
+async def test_connections_use_wal_and_tuned_pragmas(temp_db):
+    async with database.database.connection.execute("PRAGMA journal_mode") as cursor:
+        assert (await cursor.fetchone())[0] == 'wal'
+    async with database._read() as reader:
+        async with reader.execute("PRAGMA synchronous") as cursor:
+            assert (await cursor.fetchone())[0] == 1  # NORMAL
+        async with reader.execute("PRAGMA busy_timeout") as cursor:
+            assert (await cursor.fetchone())[0] == database.DB_BUSY_TIMEOUT_MS
+        # Readers cannot write
+        with pytest.raises(sqlite3.OperationalError):
+            await reader.execute("DELETE FROM contacts")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_and_reads(temp_db):
+    saves = [database.save_contact(dict(CONTACT, email=f'user{i}@example.com')) for i in range(20)]
+    reads = [database.get_all_contacts() for _ in range(10)]
+    results = await asyncio.gather(*saves, *reads)
+    assert all(results[:20])
+    assert len(await database.get_all_contacts()) == 20
+    # All readers were returned to the pool
+    assert database.database.readers.qsize() == len(database.database.reader_connections)
+
+
+@pytest.mark.asyncio
+async def test_write_waits_for_other_process_lock(temp_db):
+    # Another worker process holds the write lock for a moment
+    other = sqlite3.connect(str(database.DB_FILE), check_same_thread=False, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    def release():
+        time.sleep(0.3)
+        other.execute("COMMIT")
+
+    thread = threading.Thread(target=release)
+    thread.start()
+    assert await database.save_contact(CONTACT)
+    thread.join()
+    other.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_inserts_share_a_commit(temp_db, monkeypatch):
+    batcher = database.WriteBatcher(max_batch=64, max_delay_ms=20)
+    monkeypatch.setattr(database, 'write_batcher', batcher)
+    ids = await asyncio.gather(*(database.save_contact(dict(CONTACT, email=f'u{i}@example.com')) for i in range(30)))
+    assert sorted(ids) == list(range(1, 31))
+    assert batcher.units == 30
+    assert batcher.batches < 5
+    await batcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_failing_unit_is_rolled_back_alone(temp_db, monkeypatch):
+    batcher = database.WriteBatcher(max_batch=64, max_delay_ms=20)
+    monkeypatch.setattr(database, 'write_batcher', batcher)
+    good = [{'to_address': 'a@example.com', 'subject': 'Hi', 'content': 'Body'}]
+    bad = [{'subject': 'missing recipient'}]
+    results = await asyncio.gather(
+        database.save_contact(CONTACT, outbox=good),
+        database.save_contact(CONTACT, outbox=bad),
+        database.save_contact(CONTACT, outbox=good),
+    )
+    assert results[0] and results[2] and results[1] is False
+    assert batcher.batches == 1
+    async with database.database.connection.execute("SELECT COUNT(*) FROM contacts") as cursor:
+        assert (await cursor.fetchone())[0] == 2
+    async with database.database.connection.execute("SELECT COUNT(*) FROM email_outbox") as cursor:
+        assert (await cursor.fetchone())[0] == 2
+    await batcher.stop()
+
+
+async def _query_plan(sql, params=()):
+    async with database.database.connection.execute(f"EXPLAIN QUERY PLAN {sql}", params) as cursor:
+        return ' '.join(row[3] for row in await cursor.fetchall())
+
+
+@pytest.mark.asyncio
+async def test_migrations_set_user_version_and_are_idempotent(temp_db):
+    async with database.database.connection.execute("PRAGMA user_version") as cursor:
+        assert (await cursor.fetchone())[0] == database.SCHEMA_VERSION
+    # A second worker starting up finds nothing to do
+    await database._migrate()
+    async with database.database.connection.execute("PRAGMA index_list(expert_consultations)") as cursor:
+        indexes = {row[1] for row in await cursor.fetchall()}
+    assert {'idx_expert_consultations_client_type', 'idx_expert_consultations_priority'} <= indexes
+
+
+@pytest.mark.asyncio
+async def test_unversioned_database_is_upgraded(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_DIR', tmp_path)
+    monkeypatch.setattr(database, 'DB_FILE', tmp_path / 'contacts.db')
+    # Database created by a release without migrations
+    legacy = sqlite3.connect(str(tmp_path / 'contacts.db'))
+    legacy.execute("CREATE TABLE contacts (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, email TEXT NOT NULL,"
+                   " company TEXT NOT NULL, role TEXT NOT NULL, service TEXT NOT NULL, timeline TEXT NOT NULL,"
+                   " budget TEXT NOT NULL, message TEXT NOT NULL, gdpr_consent BOOLEAN NOT NULL,"
+                   " marketing_consent BOOLEAN DEFAULT 0, ip_address TEXT, user_agent TEXT, page TEXT, referrer TEXT,"
+                   " status TEXT DEFAULT 'new', submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    legacy.execute("INSERT INTO contacts (name, email, company, role, service, timeline, budget, message, gdpr_consent)"
+                   " VALUES ('A', 'a@example.com', 'Co', 'CTO', 'Web', 'soon', '10k', 'Hi', 1)")
+    legacy.commit()
+    legacy.close()
+    await database.init_database()
+    try:
+        async with database.database.connection.execute("PRAGMA user_version") as cursor:
+            assert (await cursor.fetchone())[0] == database.SCHEMA_VERSION
+        assert len(await database.get_all_contacts()) == 1
+    finally:
+        await database.close_database()
+
+
+@pytest.mark.asyncio
+async def test_admin_queries_use_indexes(temp_db):
+    sql, params = database._submissions_page_query('contacts', ['name', 'message'], 101, truncate={'message': 100})
+    plan = await _query_plan(sql, params)
+    assert 'idx_contacts_submitted_at' in plan and 'TEMP B-TREE' not in plan
+
+    sql, params = database._submissions_page_query('expert_consultations', ['name'], 101, after=('2024-01-01 00:00:00', 5))
+    plan = await _query_plan(sql, params)
+    assert 'SEARCH expert_consultations USING INDEX idx_expert_consultations_submitted_at' in plan
+    assert 'TEMP B-TREE' not in plan
+
+    plan = await _query_plan("UPDATE contacts SET status = 'unsubscribed' WHERE email = ?", ('a@example.com',))
+    assert 'idx_contacts_email' in plan
+    plan = await _query_plan("SELECT id FROM expert_consultations WHERE status = ?", ('new',))
+    assert 'idx_expert_consultations_status' in plan
@@ -0,0 +1,70 @@
+import pytest
+
+import database
+from utils import digest as digest_module
+from utils.digest import DigestScheduler, use_digest
+
+CONTACT = {
+    'name': 'Test User',
+    'email': 'test@example.com',
+    'company': 'Test Company',
+    'role': 'CTO',
+    'service': 'Web Development',
+    'timeline': '1-3 months',
+    'budget': '10k-50k',
+    'message': 'This is a test message for the digest',
+    'gdprConsent': True,
+}
+
+
+def _emails(index):
+    return [
+        {'to_address': 'admin@softdab.tech', 'subject': f'Contact Form: user {index}', 'content': f'Details {index}', 'digest': True},
+        {'to_address': f'user{index}@example.com', 'subject': 'Thanks', 'content': 'Body'},
+    ]
+
+
+async def _outbox_addresses():
+    async with database.database.connection.execute("SELECT to_address, subject FROM email_outbox ORDER BY id") as cursor:
+        return await cursor.fetchall()
+
+
+@pytest.mark.asyncio
+async def test_admin_copies_are_held_and_sent_as_one_digest(temp_db):
+    for i in range(5):
+        assert await database.save_contact(CONTACT, outbox=_emails(i))
+    # Only the user confirmations went to the outbox
+    assert [r[0] for r in await _outbox_addresses()] == [f'user{i}@example.com' for i in range(5)]
+
+    scheduler = DigestScheduler(window_seconds=3600, max_items=10)
+    assert await scheduler.flush_due() == 0
+
+    scheduler.max_items = 5
+    assert await scheduler.flush_due() == 1
+    rows = await _outbox_addresses()
+    assert len(rows) == 6
+    to_address, subject = rows[-1]
+    assert to_address == 'admin@softdab.tech'
+    assert '5 new submissions' in subject
+
+    # Items were consumed with the digest
+    assert await scheduler.flush_due() == 0
+
+
+@pytest.mark.asyncio
+async def test_digest_sent_after_window(temp_db):
+    assert await database.save_contact(CONTACT, outbox=_emails(1))
+    scheduler = DigestScheduler(window_seconds=0, max_items=100)
+    assert await scheduler.flush_due() == 1
+    async with database.database.connection.execute("SELECT content FROM email_outbox WHERE submission_type = 'digest'") as cursor:
+        content = (await cursor.fetchone())[0]
+    assert 'Contact Form: user 1' in content and 'Details 1' in content
+
+
+def test_high_priority_bypasses_digest(monkeypatch):
+    monkeypatch.setattr(digest_module, 'ADMIN_DIGEST_ENABLED', True)
+    assert use_digest()
+    assert use_digest(7)
+    assert not use_digest(8)
+    monkeypatch.setattr(digest_module, 'ADMIN_DIGEST_ENABLED', False)
+    assert not use_digest()
@@ -0,0 +1,56 @@
+import json
+import pytest
+
+from utils import suppression
+from utils.email_renderer import ClientEmailRenderer, email_renderer
+
+CONSULTATION = {
+    'name': 'Jane <b>Doe</b>',
+    'email': 'jane@example.com',
+    'company': 'Acme & Co',
+    'brief_message': 'Hello',
+    'client_type': 'product',
+    'priority': 9,
+    'details': {'team_size': '25', 'nda_required': True, 'unknown_key': 'x'},
+}
+ROUTING = {'sla_hours': 4, 'assigned_to': ['CTO']}
+
+
+def test_user_input_is_escaped():
+    html = email_renderer.render_expert_consultation_email(CONSULTATION, ROUTING)
+    assert 'Jane &lt;b&gt;Doe&lt;/b&gt;' in html
+    assert 'Acme &amp; Co' in html
+    assert 'Product Company' in html
+    assert 'Team Size: 25' in html and 'NDA Required: Yes' in html
+    assert 'unknown_key' not in html
+
+
+def test_details_accept_json_string():
+    data = dict(CONSULTATION, details=json.dumps(CONSULTATION['details']))
+    assert email_renderer.render_expert_consultation_email(data, ROUTING) == \
+        email_renderer.render_expert_consultation_email(CONSULTATION, ROUTING)
+
+
+def test_contact_unsubscribe_url_is_quoted_and_signed(monkeypatch):
+    data = {'name': 'A', 'email': 'a+b@example.com', 'submitted_at': '2024-01-01T10:00:00'}
+    assert 'api/unsubscribe' not in email_renderer.render_contact_form_email(data)
+    monkeypatch.setattr(suppression, 'UNSUBSCRIBE_SECRET', 'secret')
+    html = email_renderer.render_contact_form_email(data)
+    assert f"email=a%2Bb%40example.com&amp;token={suppression.unsubscribe_token('a+b@example.com')}" in html
+
+
+@pytest.mark.asyncio
+async def test_async_render_matches_sync():
+    renderer = ClientEmailRenderer()
+    data = dict(CONSULTATION, submitted_at='2024-01-01T10:00:00')
+    assert await renderer.render_expert_consultation_email_async(data, ROUTING) == \
+        renderer.render_expert_consultation_email(data, ROUTING)
+
+
+def test_template_is_inlined_and_has_text_alternative():
+    html = email_renderer.render_contact_form_email({'name': 'A', 'email': 'a@example.com'})
+    assert '<body style="' in html and '<!--' not in html
+    text = email_renderer.render_contact_form_text({'name': 'A & B', 'email': 'a@example.com', 'service': 'Web'})
+    assert 'Hello A & B!' in text
+    assert 'Service Type\nWeb' in text
+    assert '<' not in text and '{%' not in text
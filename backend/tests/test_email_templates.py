@@ -0,0 +1,100 @@
+import email
+
+from utils import emailer
+from utils.email_renderer import CLIENT_CONFIRMATION_TEMPLATE, TEMPLATES_DIR
+from utils.email_templates import BuiltTemplateLoader, html_to_text, inline_css, minify_html
+from utils.smtp_pool import SMTPConfig
+
+TEMPLATE = """<!doctype html>
+<html>
+<head>
+  <style>
+    /* comment */
+    body { margin:0; font-family: "Segoe UI", Arial; }
+    .card { padding:16px; color:#111; }
+    a { color:#2F89FC; }
+    a:hover { color:#1F6ED4; }
+    .card p { margin:0; }
+    @media screen and (max-width:420px) { .card { padding:8px; } }
+  </style>
+</head>
+<body>
+  <!-- header -->
+  <div class="card" style="color:#222;">
+    <p>Hello {{ name }}!</p>
+    {% if url %}<a href="{{ url }}">Open</a>{% endif %}
+  </div>
+</body>
+</html>
+"""
+
+
+def test_inline_css_moves_simple_rules_and_keeps_the_rest():
+    html = inline_css(TEMPLATE)
+    assert '<body style="margin:0;font-family:\'Segoe UI\', Arial">' in html
+    # The element's own style wins over the class rule
+    assert 'class="card" style="padding:16px;color:#222"' in html
+    assert '<a href="{{ url }}" style="color:#2F89FC">' in html
+    style = html[html.index('<style>'):html.index('</style>')]
+    assert 'a:hover' in style and '.card p' in style and '@media' in style
+    assert 'font-family' not in style
+
+
+def test_kept_rules_still_beat_inlined_declarations():
+    html = minify_html(inline_css(TEMPLATE))
+    style = html[html.index('<style>'):html.index('</style>')]
+    # Without !important the inline padding and color would win over these
+    assert 'a:hover{color:#1F6ED4 !important}' in style
+    assert '{.card{padding:8px !important}}' in style
+    # Nothing inline to override on <p>
+    assert '.card p{margin:0}' in style
+
+
+def test_compiled_confirmation_template_keeps_its_mobile_overrides():
+    loader = BuiltTemplateLoader(TEMPLATES_DIR)
+    source, _, _ = loader.get_source(None, CLIENT_CONFIRMATION_TEMPLATE)
+    style = source[source.index('<style>'):source.index('</style>')]
+    media = style[style.index('@media'):]
+    assert 'class="body" style="padding:28px 32px"' in source
+    assert '.body{padding:20px !important}' in media
+    assert '.container{margin:10px !important}' in media
+    assert '.btn:hover{background:#1F6ED4 !important' in style
+
+
+def test_minify_drops_comments_and_indentation():
+    html = minify_html(inline_css(TEMPLATE))
+    assert '<!--' not in html and '/*' not in html
+    assert '\n  ' not in html
+    assert len(html) < len(TEMPLATE)
+
+
+def test_text_alternative_keeps_jinja_tags():
+    text = html_to_text(TEMPLATE)
+    assert 'Hello {{ name }}!' in text
+    assert '{% if url %}Open ({{ url }}){% endif %}' in text
+    assert '<' not in text.replace('{{', '').replace('{%', '')
+    assert 'margin' not in text
+
+
+def test_resend_payload_has_html_and_text():
+    payload = emailer._resend_payload('a@example.com', 'Hi', '<p>Hi</p>', None, True, 'Hi')
+    assert payload['html'] == '<p>Hi</p>' and payload['text'] == 'Hi'
+    # Plain messages are never sniffed for HTML
+    payload = emailer._resend_payload('a@example.com', 'Hi', '<html>not flagged</html>', None, False)
+    assert 'html' not in payload
+
+
+def test_smtp_sends_multipart_alternative(monkeypatch):
+    sent = []
+
+    class Pool:
+        config = SMTPConfig(host='relay.test', user='noreply@softdab.tech')
+
+        def send_blocking(self, envelope_from, recipients, message):
+            sent.append(message)
+
+    monkeypatch.setattr(emailer, 'smtp_pool', Pool())
+    assert emailer._smtp_send_blocking('a@example.com', 'Hi', '<p>Hi</p>', None, True, 'Hi')
+    message = email.message_from_string(sent[0])
+    assert message.get_content_type() == 'multipart/alternative'
+    assert [part.get_content_type() for part in message.get_payload()] == ['text/plain', 'text/html']
@@ -0,0 +1,100 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+import httpx
+from fastapi import FastAPI
+
+import database
+from routes import admin
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(admin, 'ADMIN_API_TOKEN', 'secret')
+    monkeypatch.setattr(admin, 'EXPORT_PAGE_SIZE', 10)
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+    return app
+
+
+def _client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test',
+                             headers={'Authorization': 'Bearer secret'})
+
+
+async def _insert_contacts(count):
+    async with database._transaction() as connection:
+        for i in range(count):
+            await connection.execute("""
+                INSERT INTO contacts (name, email, company, role, service, timeline, budget, message,
+                                      gdpr_consent, submitted_at)
+                VALUES (?, ?, 'Co', 'CTO', 'Web', 'soon', '10k', ?, 1, ?)
+            """, (f'User {i}', f'user{i}@example.com', 'Line one\nline, "two"', f'2024-01-{1 + i // 5:02d} 12:00:00'))
+
+
+@pytest.mark.asyncio
+async def test_csv_export_pages_through_the_table(temp_db, app, monkeypatch):
+    await _insert_contacts(25)
+    pages = []
+    original = admin.get_submissions_page
+
+    async def counting(*args, **kwargs):
+        rows = await original(*args, **kwargs)
+        pages.append(len(rows))
+        return rows
+
+    monkeypatch.setattr(admin, 'get_submissions_page', counting)
+    async with _client(app) as client:
+        response = await client.get('/api/admin/export/contact')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/csv')
+    assert 'contacts-' in response.headers['content-disposition']
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(r['id']) for r in rows] == list(range(25, 0, -1))
+    assert rows[0]['message'] == 'Line one\nline, "two"'
+    assert pages == [10, 10, 5]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_gzip_export_with_date_range(temp_db, app):
+    await _insert_contacts(25)
+    async with _client(app) as client:
+        response = await client.get('/api/admin/export/contact', params={
+            'format': 'ndjson', 'gzip': 'true', 'from': '2024-01-02', 'to': '2024-01-04T00:00:00Z'
+        })
+    assert response.headers['content-type'] == 'application/gzip'
+    lines = gzip.decompress(response.content).decode().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert len(records) == 10
+    assert {r['submitted_at'][:10] for r in records} == {'2024-01-02', '2024-01-03'}
+
+
+@pytest.mark.asyncio
+async def test_export_of_empty_table_has_header_only(temp_db, app):
+    async with _client(app) as client:
+        response = await client.get('/api/admin/export/expert_consultation')
+        bad_date = await client.get('/api/admin/export/contact', params={'from': 'last week'})
+        unknown = await client.get('/api/admin/export/invoices')
+    assert response.text.splitlines()[0].startswith('id,client_type,name,email')
+    assert len(response.text.splitlines()) == 1
+    assert bad_date.status_code == 400
+    assert unknown.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_export_stream_is_compressed_by_middleware(temp_db, app):
+    from middlewares.performance import CompressionMiddleware
+    await _insert_contacts(25)
+    app.add_middleware(CompressionMiddleware)
+    async with _client(app) as client:
+        encoded = await client.get('/api/admin/export/contact', headers={'Accept-Encoding': 'gzip'})
+        archive = await client.get('/api/admin/export/contact', params={'gzip': 'true'},
+                                   headers={'Accept-Encoding': 'gzip'})
+    assert encoded.headers['content-encoding'] == 'gzip'
+    assert encoded.headers['vary'] == 'Accept-Encoding'
+    # httpx decodes Content-Encoding transparently
+    assert len(list(csv.DictReader(io.StringIO(encoded.text)))) == 25
+    # An explicit .gz download is not compressed twice
+    assert 'content-encoding' not in archive.headers
@@ -0,0 +1,69 @@
+import httpx
+import pytest
+
+from benchmarks.fake_providers import FakeSMTPServer, FaultProfile, create_http_app
+from utils import emailer
+from utils.http_clients import http_clients
+from utils.smtp_pool import SMTPConfig, SMTPConnectionPool
+
+
+def test_fault_profile_is_reproducible():
+    a = FaultProfile('lognormal:50:0.5', error_rate=0.2, rate_limit_rate=0.1, seed=7)
+    b = FaultProfile('lognormal:50:0.5', error_rate=0.2, rate_limit_rate=0.1, seed=7)
+    assert [a.outcome() for _ in range(50)] == [b.outcome() for _ in range(50)]
+    assert a.sample_latency() == b.sample_latency()
+    assert FaultProfile('uniform:10:20').sample_latency() <= 0.02
+
+
+@pytest.mark.asyncio
+async def test_send_email_against_fake_http_api(monkeypatch):
+    profile = FaultProfile('fixed:0', seed=1)
+    client = httpx.AsyncClient(base_url='http://fake', transport=httpx.ASGITransport(app=create_http_app(profile)))
+    monkeypatch.setitem(http_clients._clients, 'resend', client)
+    monkeypatch.setattr(emailer, 'RESEND_API_KEY', 're_fake')
+
+    assert await emailer.send_email('a@example.com', 'Hi', 'Body')
+    assert await emailer.send_email_batch([{'to_address': f'{i}@example.com', 'subject': 'Hi', 'content': 'Body'} for i in range(3)]) == [True] * 3
+    assert profile.stats['messages'] == 4
+
+    profile.rate_limit_rate = 1.0
+    with pytest.raises(emailer.ProviderUnavailable):
+        await emailer._send_via_resend('a@example.com', 'Hi', 'Body', None, False)
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_send_email_against_fake_smtp_sink(monkeypatch):
+    profile = FaultProfile('fixed:0', seed=1)
+    server = FakeSMTPServer(profile, port=0)
+    await server.start()
+    pool = SMTPConnectionPool(SMTPConfig(host='127.0.0.1', port=server.port, user='u', password='p'), max_size=1)
+    monkeypatch.setattr(emailer, 'smtp_pool', pool)
+    monkeypatch.setattr(emailer, 'RESEND_API_KEY', None)
+    monkeypatch.setattr(emailer, 'SENDGRID_API_KEY', None)
+
+    assert await emailer.send_email('a@example.com', 'Hi', 'Body')
+    assert await emailer.send_email('b@example.com', 'Hi', '<p>Hi</p>', is_html=True, text_content='Hi')
+    assert profile.stats['messages'] == 2
+    assert profile.stats['smtp_sessions'] == 1
+
+    profile.error_rate = 1.0
+    assert not await emailer.send_email('c@example.com', 'Hi', 'Body')
+    pool.close()
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_smtp_temporary_failure_counts_against_breaker(monkeypatch):
+    profile = FaultProfile('fixed:0', error_rate=1.0, seed=1)
+    server = FakeSMTPServer(profile, port=0)
+    await server.start()
+    pool = SMTPConnectionPool(SMTPConfig(host='127.0.0.1', port=server.port), max_size=1)
+    monkeypatch.setattr(emailer, 'smtp_pool', pool)
+    monkeypatch.setattr(emailer, 'RESEND_API_KEY', None)
+    monkeypatch.setattr(emailer, 'SENDGRID_API_KEY', None)
+
+    assert not await emailer.send_email('a@example.com', 'Hi', 'Body')
+    assert emailer.breakers['smtp'].error_rate() == 1.0
+    pool.close()
+    await server.stop()
@@ -0,0 +1,122 @@
+import json
+import time
+import pytest
+import httpx
+from fastapi import FastAPI
+
+import database
+from routes import admin
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(admin, 'ADMIN_API_TOKEN', 'secret')
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+    return app
+
+
+def _client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test',
+                             headers={'Authorization': 'Bearer secret'})
+
+
+async def _seed():
+    async with database._transaction() as connection:
+        for email in ('Ann@Example.com', 'bob@example.com'):
+            await connection.execute("""
+                INSERT INTO contacts (name, email, company, role, service, timeline, budget, message, gdpr_consent)
+                VALUES ('Person', ?, 'Co', 'CTO', 'Web', 'soon', '10k', 'Hello there', 1)
+            """, (email,))
+        await connection.execute("""
+            INSERT INTO staffing_requests (name, email, roles, engagement, seniority, gdpr_consent)
+            VALUES ('Ann', 'ann@example.com', '["dev"]', 'full-time', 'senior', 1)
+        """)
+        await connection.execute("""
+            INSERT INTO expert_consultations (client_type, name, email, phone, brief_message, consent)
+            VALUES ('startup', 'Ann', 'ann@example.com', '+100', 'Need a CTO', 1)
+        """)
+        await connection.execute(
+            "INSERT INTO email_outbox (submission_type, to_address, subject, content, next_attempt_at) "
+            "VALUES ('contact', 'ann@example.com', 'Thanks', 'Hi Ann', ?)", (time.time(),)
+        )
+        # Admin copies quoting the submissions: Ann's contact (1) and staffing request (1), Bob's contact (2)
+        for submission_type, submission_id in (('contact', 1), ('contact', 2)):
+            await connection.execute(
+                "INSERT INTO email_outbox (submission_type, submission_id, to_address, subject, content, next_attempt_at) "
+                "VALUES (?, ?, 'info@softdab.tech', 'New lead', 'From ann@example.com', ?)",
+                (submission_type, submission_id, time.time())
+            )
+        await connection.execute(
+            "INSERT INTO admin_digest_items (to_address, submission_type, submission_id, subject, content, created_at) "
+            "VALUES ('info@softdab.tech', 'staffing', 1, 'New request', 'Ann, ann@example.com', ?)", (time.time(),)
+        )
+
+
+@pytest.mark.asyncio
+async def test_export_streams_rows_from_every_table_with_audit(temp_db, app):
+    await _seed()
+    async with _client(app) as client:
+        response = await client.post('/api/admin/gdpr/export',
+                                     json={'emails': [' ANN@example.com', 'ann@example.com'], 'reference': 'T-1'})
+        audit = await client.get('/api/admin/gdpr/audit')
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert response.status_code == 200
+    assert [line.get('table') for line in lines[:-1]] == ['contacts', 'staffing_requests', 'expert_consultations']
+    assert lines[-1]['audit']['rows'] == {'contacts': 1, 'staffing_requests': 1, 'expert_consultations': 1}
+    assert lines[-1]['audit']['subjects'] == 1
+    logged = audit.json()[0]
+    assert logged['action'] == 'export' and logged['reference'] == 'T-1' and logged['completed_at']
+    assert 'ann@example.com' not in json.dumps(logged)
+
+
+@pytest.mark.asyncio
+async def test_erase_anonymizes_across_tables_in_one_transaction(temp_db, app):
+    await _seed()
+    async with _client(app) as client:
+        response = await client.post('/api/admin/gdpr/erase', json={'emails': ['ann@example.com', 'nobody@x.io']})
+        empty = await client.post('/api/admin/gdpr/erase', json={'emails': ['  ']})
+    assert response.json()['rows'] == {
+        'contacts': 1, 'staffing_requests': 1, 'expert_consultations': 1, 'email_outbox': 2, 'admin_digest_items': 1,
+    }
+    assert empty.status_code == 400
+    assert await database.get_submissions_by_email('contacts', ['ann@example.com']) == []
+    assert len(await database.get_submissions_by_email('contacts', ['bob@example.com'])) == 1
+    consultation = await database.get_submission('expert_consultations', 1)
+    assert consultation['phone'] is None and consultation['status'] == 'anonymized'
+    assert await database.search_submissions('expert_consultations', '"cto"', 10) == []
+    assert (await database.get_gdpr_audit_log(1))[0]['rows']['email_outbox'] == 2
+    async with database._read() as reader:
+        async with reader.execute("SELECT submission_id FROM email_outbox") as cursor:
+            # Only the admin notification about Bob's submission is left
+            assert [row[0] for row in await cursor.fetchall()] == [2]
+        async with reader.execute("SELECT count(*) FROM admin_digest_items") as cursor:
+            assert (await cursor.fetchone())[0] == 0
+
+
+@pytest.mark.asyncio
+async def test_erase_batch_of_thousands(temp_db, monkeypatch):
+    monkeypatch.setattr(database, 'GDPR_EMAIL_CHUNK', 100)
+    async with database._transaction() as connection:
+        await connection.executemany("""
+            INSERT INTO contacts (name, email, company, role, service, timeline, budget, message, gdpr_consent)
+            VALUES ('Person', ?, 'Co', 'CTO', 'Web', 'soon', '10k', 'Hello there', 1)
+        """, [(f'user{i}@example.com',) for i in range(3000)])
+    from middlewares.data_retention import ANONYMIZED_FIELDS, GDPRCompliance
+
+    started = time.perf_counter()
+    result = await GDPRCompliance.erase_subjects([f'user{i}@example.com' for i in range(0, 3000, 2)])
+
+    assert result['rows']['contacts'] == 1500
+    assert time.perf_counter() - started < 5
+    assert len(await database.get_submissions_by_email('contacts', ['user1@example.com'])) == 1
+    assert ANONYMIZED_FIELDS.keys() == set(database.SUBMISSION_TABLES)
+
+
+@pytest.mark.asyncio
+async def test_email_lookups_use_index(temp_db):
+    async with database._read() as reader, reader.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM contacts WHERE lower(email) IN (?, ?)", ('a@x.io', 'b@x.io')
+    ) as cursor:
+        plan = ' '.join(row[-1] for row in await cursor.fetchall())
+    assert 'idx_contacts_email_lower' in plan
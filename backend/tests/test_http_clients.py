@@ -0,0 +1,108 @@
+import httpx
+import pytest
+
+from utils import emailer
+from utils.http_clients import ProviderClients, http_clients
+
+
+@pytest.mark.asyncio
+async def test_clients_are_reused_until_closed():
+    clients = ProviderClients()
+    await clients.start(warm_up=False)
+    resend = clients.get('resend')
+    assert clients.get('resend') is resend
+    assert clients.get('sendgrid') is not resend
+    assert str(resend.base_url).startswith('https://api.resend.com')
+
+    await clients.close()
+    assert resend.is_closed
+    # A closed client is replaced on demand
+    assert not clients.get('resend').is_closed
+    await clients.close()
+
+
+@pytest.mark.asyncio
+async def test_resend_sends_share_one_client(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={'id': 'msg_1'})
+
+    client = httpx.AsyncClient(base_url='https://api.resend.com', transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(http_clients._clients, 'resend', client)
+    monkeypatch.setattr(emailer, 'RESEND_API_KEY', 're_test')
+
+    assert await emailer.send_email('a@example.com', 'Hi', 'Body')
+    assert await emailer.send_email('b@example.com', 'Hi', 'Body')
+    assert [r.url.path for r in requests] == ['/emails', '/emails']
+    assert requests[0].headers['Authorization'] == 'Bearer re_test'
+    await client.aclose()
+
+
+def _mock_resend(monkeypatch, handler):
+    client = httpx.AsyncClient(base_url='https://api.resend.com', transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(http_clients._clients, 'resend', client)
+    monkeypatch.setattr(emailer, 'RESEND_API_KEY', 're_test')
+    return client
+
+
+def _messages(*addresses):
+    return [{'to_address': a, 'subject': 'New lead', 'content': 'Body'} for a in addresses]
+
+
+@pytest.mark.asyncio
+async def test_batch_send_maps_results_by_index(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={
+            'data': [{'id': 'msg_1'}, {'id': 'msg_3'}],
+            'errors': [{'index': 1, 'message': 'Invalid `to` field'}],
+        })
+
+    client = _mock_resend(monkeypatch, handler)
+    results = await emailer.send_email_batch(_messages('a@softdab.tech', 'bad', 'c@softdab.tech'))
+    assert results == [True, False, True]
+    assert [r.url.path for r in requests] == ['/emails/batch']
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_batch_send_leaves_failed_chunks_for_single_sends(monkeypatch):
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        if request.url.path == '/emails/batch':
+            return httpx.Response(503, text='unavailable')
+        return httpx.Response(200, json={'id': 'msg'})
+
+    client = _mock_resend(monkeypatch, handler)
+    monkeypatch.setattr(emailer, 'RESEND_BATCH_SIZE', 2)
+    results = await emailer.send_email_batch(_messages('a@softdab.tech', 'b@softdab.tech', 'c@softdab.tech'))
+    assert results == [None, None, None]
+    # After the failed chunk Resend is no longer the healthiest provider, so
+    # the second chunk is not batched either
+    assert paths == ['/emails/batch']
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_batch_send_deposits_retry_budget_per_message(monkeypatch):
+    client = _mock_resend(monkeypatch, lambda request: httpx.Response(200, json={'data': [{'id': '1'}, {'id': '2'}]}))
+    deposits = []
+    monkeypatch.setattr(emailer.retry_budget, 'record_request', lambda: deposits.append(1))
+    assert await emailer.send_email_batch(_messages('a@softdab.tech', 'b@softdab.tech')) == [True, True]
+    assert len(deposits) == 2
+    await client.aclose()
+
+
+def test_batching_requires_resend_to_lead_routing(monkeypatch):
+    monkeypatch.setattr(emailer, 'RESEND_API_KEY', 're_test')
+    assert emailer.batch_send_available()
+    emailer.breakers['resend'].record_failure(100)
+    # Still CLOSED, but SMTP now ranks first
+    assert emailer.providers_by_health()[0] == 'smtp'
+    assert not emailer.batch_send_available()
@@ -0,0 +1,336 @@
+import gzip
+import time
+import zlib
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from middlewares import performance
+from middlewares.performance import PerformanceMiddleware, CompressionMiddleware, CacheMiddleware, negotiate_encoding
+from utils.response_cache import MemoryCacheBackend, SQLiteCacheBackend
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    calls = []
+
+    @app.get("/api/items")
+    async def items():
+        calls.append(1)
+        return {"items": ["x" * 40] * 50, "calls": len(calls)}
+
+    @app.get("/api/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/api/stream")
+    async def stream():
+        async def chunks():
+            yield b'{"part": 1}\n'
+            yield b'{"part": 2}\n'
+        return StreamingResponse(chunks(), media_type='application/json')
+
+    app.add_middleware(PerformanceMiddleware)
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(CacheMiddleware, rules=[('/api/*', 300)], backend=MemoryCacheBackend())
+    return app
+
+
+def _client(app, **headers):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test', headers=headers)
+
+
+@pytest.mark.asyncio
+async def test_large_json_is_gzipped_and_cached(app):
+    async with _client(app, **{'Accept-Encoding': 'gzip'}) as client:
+        first = await client.get('/api/items')
+        second = await client.get('/api/items')
+    assert first.headers['content-encoding'] == 'gzip'
+    assert first.headers['vary'] == 'Accept-Encoding'
+    assert int(first.headers['content-length']) < 2000
+    assert first.json()['calls'] == 1
+    assert first.headers['x-cache'] == 'MISS' and 'x-process-time' in first.headers
+    assert second.headers['x-cache'] == 'HIT'
+    assert second.json() == first.json()
+
+
+@pytest.mark.asyncio
+async def test_small_bodies_pass_through_and_streams_are_compressed(app):
+    async with _client(app, **{'Accept-Encoding': 'gzip'}) as client:
+        small = await client.get('/api/small')
+        async with client.stream('GET', '/api/stream') as streamed:
+            raw = b''.join([chunk async for chunk in streamed.aiter_raw()])
+        again = await client.get('/api/stream')
+    assert 'content-encoding' not in small.headers
+    assert small.headers['vary'] == 'Accept-Encoding'
+    assert small.json() == {'ok': True}
+    assert streamed.headers['content-encoding'] == 'gzip'
+    assert 'content-length' not in streamed.headers
+    assert gzip.decompress(raw) == b'{"part": 1}\n{"part": 2}\n'
+    # Streamed bodies are not cached
+    assert again.headers['x-cache'] == 'MISS'
+
+
+@pytest.mark.asyncio
+async def test_streamed_chunks_are_flushed_as_they_arrive():
+    sent = []
+    decompressor = zlib.decompressobj(31)
+
+    async def streaming_app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/csv; charset=utf-8')]})
+        for part in (b'a,b\n', b'1,2\n'):
+            await send({'type': 'http.response.body', 'body': part, 'more_body': True})
+            # Everything sent so far decodes completely before the stream ends
+            assert decompressor.decompress(sent[-1]['body']) == part
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    async def record(message):
+        sent.append(message)
+
+    middleware = CompressionMiddleware(streaming_app, minimum_size=1)
+    scope = {'type': 'http', 'headers': [(b'accept-encoding', b'gzip')]}
+    await middleware(scope, None, record)
+    assert sent[-1]['more_body'] is False
+    assert decompressor.decompress(sent[-1]['body']) == b'' and decompressor.eof
+
+
+@pytest.mark.asyncio
+async def test_large_bodies_are_compressed_in_a_thread(app, monkeypatch):
+    threaded = []
+
+    async def to_thread(function, data):
+        threaded.append(len(data))
+        return function(data)
+
+    monkeypatch.setattr(performance.asyncio, 'to_thread', to_thread)
+    app.user_middleware.clear()
+    app.add_middleware(CompressionMiddleware, thread_min_size=2048)
+    async with _client(app, **{'Accept-Encoding': 'gzip'}) as client:
+        large = await client.get('/api/items')
+        small = await client.get('/api/small')
+    assert large.headers['content-encoding'] == 'gzip' and small.status_code == 200
+    assert threaded == [len(large.content)]
+
+
+def test_negotiation_uses_q_values():
+    negotiate_encoding.cache_clear()
+    assert negotiate_encoding(b'gzip, deflate, br') == ('br' if performance.brotli else 'gzip')
+    assert negotiate_encoding(b'gzip;q=0') is None
+    assert negotiate_encoding(b'identity') is None
+    # The wildcard allows anything not listed, here br or zstd if installed
+    assert negotiate_encoding(b'*;q=0.5, gzip;q=0') == next(
+        (coding for coding in performance.ENCODER_PREFERENCE if coding != 'gzip'), None)
+    assert negotiate_encoding(b'br;q=0.1, zstd;q=0.2, GZIP;q=0.9') == 'gzip'
+    assert negotiate_encoding(b'gzip;q=abc') is None
+    assert negotiate_encoding(b'') is None
+
+
+@pytest.mark.asyncio
+async def test_cache_keeps_one_entry_per_encoding(app):
+    async with _client(app, **{'Accept-Encoding': 'gzip'}) as client:
+        compressed = await client.get('/api/items')
+    async with _client(app, **{'Accept-Encoding': 'identity'}) as client:
+        plain = await client.get('/api/items')
+    assert compressed.headers['content-encoding'] == 'gzip'
+    assert 'content-encoding' not in plain.headers
+    assert plain.headers['x-cache'] == 'MISS'
+    assert plain.json() == compressed.json() | {'calls': 2}
+
+
+@pytest.mark.asyncio
+async def test_uncompressed_without_accept_encoding(app):
+    async with _client(app, **{'Accept-Encoding': 'identity'}) as client:
+        response = await client.get('/api/items')
+    assert 'content-encoding' not in response.headers
+    assert len(response.content) > 1024
+
+
+async def _get(app, path, **headers):
+    """One request straight through ASGI; returns (status, headers, body)"""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'',
+             'headers': [(k.lower().encode(), v.encode()) for k, v in headers.items()]}
+    await app(scope, receive, send)
+    return messages[0]['status'], dict(messages[0]['headers']), b''.join(m.get('body', b'') for m in messages[1:])
+
+
+def _json_app(calls, delay=0.0, status=200, headers=()):
+    async def app(scope, receive, send):
+        calls.append(scope['path'])
+        await asyncio.sleep(delay)
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'), *headers]})
+        await send({'type': 'http.response.body', 'body': b'{"path": "%s"}' % scope['path'].encode()})
+    return app
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_run_the_handler_once():
+    calls = []
+    cache = CacheMiddleware(_json_app(calls, delay=0.05), rules=[('/api/*', 60)])
+    results = await asyncio.gather(*(_get(cache, '/api/items') for _ in range(10)))
+    assert calls == ['/api/items']
+    assert {body for _, _, body in results} == {b'{"path": "/api/items"}'}
+    assert cache.stats['collapsed'] == 9 and cache.stats['misses'] == 1
+
+
+@pytest.mark.asyncio
+async def test_only_opted_in_anonymous_gets_are_cached():
+    calls = []
+    cache = CacheMiddleware(_json_app(calls), rules=[('/', 60), ('/api/public/*', 60)])
+    for path in ('/', '/', '/api/public/a', '/api/public/a', '/api/contact', '/api/contact',
+                 '/api/expert-consultation', '/api/expert-consultation', '/api/unsubscribe', '/api/unsubscribe'):
+        await _get(cache, path)
+    await _get(cache, '/api/public/b', Authorization='Bearer token')
+    await _get(cache, '/api/public/b', Authorization='Bearer token')
+    assert calls == ['/', '/api/public/a', '/api/contact', '/api/contact', '/api/expert-consultation',
+                     '/api/expert-consultation', '/api/unsubscribe', '/api/unsubscribe', '/api/public/b', '/api/public/b']
+
+
+@pytest.mark.asyncio
+async def test_no_store_and_errors_are_not_cached():
+    calls = []
+    no_store = CacheMiddleware(_json_app(calls, headers=[(b'cache-control', b'no-store')]), rules=[('/', 60)])
+    failing = CacheMiddleware(_json_app(calls, status=500), rules=[('/', 60)])
+    for cache in (no_store, no_store, failing, failing):
+        await _get(cache, '/')
+    assert len(calls) == 4 and not no_store.backend.entries and not failing.backend.entries
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_keeps_memory_under_budget():
+    calls = []
+    cache = CacheMiddleware(_json_app(calls), rules=[('/api/*', 60)], max_bytes=300)
+    for path in ('/api/a', '/api/b', '/api/a', '/api/c'):
+        await _get(cache, path)
+    # /api/a was used more recently than /api/b, so /api/b went first
+    assert [key.split(':')[1] for key in cache.backend.entries] == ['/api/a', '/api/c']
+    assert cache.backend.size <= 300 and cache.backend.stats['evictions'] == 1
+
+
+@pytest.mark.asyncio
+async def test_sweep_drops_expired_entries():
+    calls = []
+    cache = CacheMiddleware(_json_app(calls), rules=[('/api/short', 1), ('/api/*', 60)])
+    await _get(cache, '/api/short')
+    await _get(cache, '/api/long')
+    assert await cache.sweep(now=time.time() + 2) == 1
+    assert [key.split(':')[1] for key in cache.backend.entries] == ['/api/long']
+    assert cache.backend.size == next(iter(cache.backend.entries.values()))['size']
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_is_shared_between_workers(tmp_path):
+    calls = []
+    path = tmp_path / 'response_cache.db'
+    # Two middlewares on one file stand in for two uvicorn workers
+    workers = [CacheMiddleware(_json_app(calls), rules=[('/api/*', 60)], backend=SQLiteCacheBackend(path))
+               for _ in range(2)]
+    try:
+        first = await _get(workers[0], '/api/items', **{'Accept-Encoding': 'gzip'})
+        second = await _get(workers[1], '/api/items', **{'Accept-Encoding': 'gzip'})
+        assert calls == ['/api/items']
+        assert first[1][b'x-cache'] == b'MISS' and second[1][b'x-cache'] == b'HIT'
+        assert second[0] == 200 and second[2] == first[2]
+        assert second[1][b'content-type'] == b'application/json'
+        assert await workers[1].sweep(now=time.time() + 61) == 1
+        await _get(workers[0], '/api/items')
+        assert len(calls) == 2
+    finally:
+        for worker in workers:
+            await worker.backend.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_evicts_least_recently_used(tmp_path):
+    backend = SQLiteCacheBackend(tmp_path / 'response_cache.db', max_bytes=150, touch_interval=0)
+    entry = {'status_code': 200, 'headers': [(b'content-type', b'application/json')], 'content': b'x' * 30}
+    try:
+        for key, now in (('a', 1.0), ('b', 2.0), ('a', 3.0), ('c', 4.0)):
+            if await backend.get(key, now) is None:
+                await backend.set(key, dict(entry, timestamp=now, expires=now + 60))
+        assert await backend.get('b', 5.0) is None
+        assert (await backend.get('a', 5.0))['content'] == b'x' * 30
+        assert await backend.get('c', 65.0) is None
+        assert backend.stats['evictions'] == 1
+        async with backend._connection.execute(
+            "SELECT total, (SELECT total(size) FROM response_cache) FROM response_cache_size"
+        ) as cursor:
+            total, actual = await cursor.fetchone()
+        assert total == actual <= 150
+    finally:
+        await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_cached_responses_carry_validators_and_revalidate_with_304():
+    calls = []
+    cache = CacheMiddleware(_json_app(calls), rules=[('/', 60)], backend=MemoryCacheBackend())
+    status, headers, body = await _get(cache, '/')
+    etag, last_modified = headers[b'etag'].decode(), headers[b'last-modified'].decode()
+    assert status == 200 and etag.startswith('"')
+    hit = await _get(cache, '/', **{'If-None-Match': f'"other", W/{etag}'})
+    by_date = await _get(cache, '/', **{'If-Modified-Since': last_modified})
+    # If-None-Match wins over If-Modified-Since
+    stale = await _get(cache, '/', **{'If-None-Match': '"other"', 'If-Modified-Since': last_modified})
+    assert hit[0] == 304 and hit[2] == b'' and hit[1][b'etag'].decode() == etag
+    assert b'content-type' not in hit[1] and hit[1][b'x-cache'] == b'HIT'
+    assert by_date[0] == 304
+    assert stale[0] == 200 and stale[2] == body
+    assert calls == ['/']
+
+
+@pytest.mark.asyncio
+async def test_compression_weakens_strong_etags():
+    async def tagged(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/json'), (b'etag', b'"v1"')]})
+        await send({'type': 'http.response.body', 'body': b'[' + b'1, ' * 1000 + b'1]'})
+    compressed = CompressionMiddleware(tagged)
+    _, gzipped, _ = await _get(compressed, '/', **{'Accept-Encoding': 'gzip'})
+    _, plain, _ = await _get(compressed, '/')
+    assert gzipped[b'content-encoding'] == b'gzip' and gzipped[b'etag'] == b'W/"v1"'
+    assert plain[b'etag'] == b'"v1"'
+
+
+@pytest.mark.asyncio
+async def test_each_encoding_has_its_own_etag(app):
+    async with _client(app, **{'Accept-Encoding': 'gzip'}) as client:
+        gzipped = await client.get('/api/items')
+        revalidated = await client.get('/api/items', headers={'If-None-Match': gzipped.headers['etag']})
+    async with _client(app, **{'Accept-Encoding': 'identity'}) as client:
+        plain = await client.get('/api/items')
+    # The cache hashes the body it stores, which is already encoded
+    assert plain.headers['etag'] != gzipped.headers['etag']
+    assert revalidated.status_code == 304 and revalidated.headers['x-cache'] == 'HIT'
+
+
+@pytest.mark.asyncio
+async def test_cache_keeps_cors_headers_per_origin_and_skips_other_vary():
+    from starlette.middleware.cors import CORSMiddleware
+    calls = []
+    cors = CORSMiddleware(_json_app(calls), allow_origins=['https://a.example', 'https://b.example'])
+    cache = CacheMiddleware(cors, rules=[('/api/*', 60)], backend=MemoryCacheBackend())
+    a1 = await _get(cache, '/api/items', Origin='https://a.example')
+    b1 = await _get(cache, '/api/items', Origin='https://b.example')
+    a2 = await _get(cache, '/api/items', Origin='https://a.example')
+    assert a1[1][b'access-control-allow-origin'] == a2[1][b'access-control-allow-origin'] == b'https://a.example'
+    assert b1[1][b'access-control-allow-origin'] == b'https://b.example' and b1[1][b'x-cache'] == b'MISS'
+    assert a2[1][b'x-cache'] == b'HIT' and len(calls) == 2
+
+    by_cookie = CacheMiddleware(_json_app(calls, headers=[(b'vary', b'Accept-Encoding'), (b'vary', b'Cookie')]),
+                                rules=[('/', 60)], backend=MemoryCacheBackend())
+    await _get(by_cookie, '/')
+    await _get(by_cookie, '/')
+    assert len(calls) == 4 and not by_cookie.backend.entries
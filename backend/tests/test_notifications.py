@@ -0,0 +1,107 @@
+import asyncio
+import time
+import pytest
+
+from utils import notifications
+from utils.notifications import NotificationDispatcher, DELIVERY_SENT, DELIVERY_FAILED, DELIVERY_PENDING
+
+
+def _messages(*addresses):
+    return [{'to_address': a, 'subject': 'Hi', 'content': 'Body'} for a in addresses]
+
+
+@pytest.mark.asyncio
+async def test_fanout_costs_one_round_trip(monkeypatch):
+    async def slow_send_email(to_address, **kwargs):
+        await asyncio.sleep(0.2)
+        if to_address == 'error@example.com':
+            raise RuntimeError('boom')
+        return to_address != 'rejected@example.com'
+
+    monkeypatch.setattr(notifications, 'send_email', slow_send_email)
+    start = time.monotonic()
+    results = await NotificationDispatcher(max_concurrency=10).dispatch(
+        _messages('a@example.com', 'rejected@example.com', 'error@example.com', 'b@example.com')
+    )
+    assert time.monotonic() - start < 0.5
+    assert [r['status'] for r in results] == [DELIVERY_SENT, DELIVERY_FAILED, DELIVERY_FAILED, DELIVERY_SENT]
+    assert results[2]['error'] == 'boom'
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap(monkeypatch):
+    active = 0
+    peak = 0
+
+    async def counting_send_email(**kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return True
+
+    monkeypatch.setattr(notifications, 'send_email', counting_send_email)
+    await NotificationDispatcher(max_concurrency=2).dispatch(_messages(*[f'{i}@example.com' for i in range(6)]))
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_timeout_reports_pending_and_finishes_in_background(monkeypatch):
+    async def send_email(to_address, **kwargs):
+        await asyncio.sleep(0.3 if to_address == 'slow@example.com' else 0)
+        return True
+
+    recorded = []
+
+    async def on_result(message, result):
+        recorded.append((message['to_address'], result['status']))
+
+    monkeypatch.setattr(notifications, 'send_email', send_email)
+    results = await NotificationDispatcher().dispatch(
+        _messages('fast@example.com', 'slow@example.com'), on_result=on_result, timeout=0.1
+    )
+    assert [r['status'] for r in results] == [DELIVERY_SENT, DELIVERY_PENDING]
+    await asyncio.sleep(0.4)
+    assert ('slow@example.com', DELIVERY_SENT) in recorded
+
+
+@pytest.mark.asyncio
+async def test_multi_message_fanout_uses_batch_api(monkeypatch):
+    batches = []
+
+    async def send_email_batch(messages):
+        batches.append([m['to_address'] for m in messages])
+        return [m['to_address'] != 'bad@example.com' for m in messages]
+
+    monkeypatch.setattr(notifications, 'batch_send_available', lambda: True)
+    monkeypatch.setattr(notifications, 'send_email_batch', send_email_batch)
+    results = await NotificationDispatcher().dispatch(_messages('a@example.com', 'bad@example.com', 'b@example.com'))
+    assert batches == [['a@example.com', 'bad@example.com', 'b@example.com']]
+    assert [r['status'] for r in results] == [DELIVERY_SENT, DELIVERY_FAILED, DELIVERY_SENT]
+
+
+@pytest.mark.asyncio
+async def test_batch_fallback_stays_under_concurrency_cap(monkeypatch):
+    active, peak, sent = 0, 0, []
+
+    async def send_email_batch(messages):
+        return [None] * len(messages)
+
+    async def send_email(to_address, **kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        sent.append(to_address)
+        return True
+
+    monkeypatch.setattr(notifications, 'batch_send_available', lambda: True)
+    monkeypatch.setattr(notifications, 'send_email_batch', send_email_batch)
+    monkeypatch.setattr(notifications, 'send_email', send_email)
+    addresses = [f'user{i}@example.com' for i in range(6)]
+    results = await NotificationDispatcher(max_concurrency=2).dispatch(_messages(*addresses))
+    assert [r['status'] for r in results] == [DELIVERY_SENT] * 6
+    assert sorted(sent) == sorted(addresses)
+    assert peak == 2
@@ -0,0 +1,131 @@
+import time
+import pytest
+
+import database
+from utils import notifications
+from utils.outbox import OutboxWorkerPool
+
+CONTACT = {
+    'name': 'Test User',
+    'email': 'test@example.com',
+    'company': 'Test Company',
+    'role': 'CTO',
+    'service': 'Web Development',
+    'timeline': '1-3 months',
+    'budget': '10k-50k',
+    'message': 'This is a test message for the outbox',
+    'gdprConsent': True,
+}
+
+
+def _emails(*addresses):
+    return [{'to_address': a, 'subject': 'Hi', 'content': 'Body', 'from_address': 'SoftDAB <noreply@softdab.tech>'} for a in addresses]
+
+
+async def _outbox_rows():
+    async with database.database.connection.execute(
+        "SELECT to_address, status, attempts, last_error FROM email_outbox ORDER BY id"
+    ) as cursor:
+        return await cursor.fetchall()
+
+
+@pytest.mark.asyncio
+async def test_submission_and_emails_saved_together(temp_db):
+    assert await database.save_contact(CONTACT, outbox=_emails('admin@softdab.tech', 'test@example.com'))
+    rows = await _outbox_rows()
+    assert [r[:2] for r in rows] == [('admin@softdab.tech', 'pending'), ('test@example.com', 'pending')]
+
+    # A failing outbox insert rolls back the submission as well
+    assert not await database.save_contact(CONTACT, outbox=[{'subject': 'missing recipient'}])
+    async with database.database.connection.execute("SELECT COUNT(*) FROM contacts") as cursor:
+        assert (await cursor.fetchone())[0] == 1
+
+
+@pytest.mark.asyncio
+async def test_callable_outbox_receives_row_id(temp_db):
+    consultation_id = await database.save_expert_consultation(
+        {'client_type': 'startup', 'name': 'A', 'email': 'a@example.com', 'brief_message': 'x', 'consent': True},
+        outbox=lambda row_id: _emails(f'id-{row_id}@softdab.tech')
+    )
+    rows = await _outbox_rows()
+    assert rows[0][0] == f'id-{consultation_id}@softdab.tech'
+
+
+@pytest.mark.asyncio
+async def test_worker_delivers_and_retries(temp_db, monkeypatch):
+    sent = []
+
+    async def fake_send_email(to_address, subject, content, from_address=None, is_html=False, text_content=None):
+        sent.append(to_address)
+        return to_address != 'broken@example.com'
+
+    monkeypatch.setattr(notifications, 'send_email', fake_send_email)
+    await database.save_contact(CONTACT, outbox=_emails('ok@example.com', 'broken@example.com'))
+
+    pool = OutboxWorkerPool(workers=1)
+    assert await pool.process_once() == 2
+    assert sorted(sent) == ['broken@example.com', 'ok@example.com']
+    # The failed message is rescheduled into the future, so nothing is due
+    assert await pool.process_once() == 0
+
+    rows = await _outbox_rows()
+    assert rows[0][1] == database.OUTBOX_SENT
+    assert rows[1][1] == database.OUTBOX_PENDING
+    assert rows[1][2] == 1
+    assert rows[1][3] == 'provider rejected message'
+
+
+@pytest.mark.asyncio
+async def test_dead_letter_after_max_attempts(temp_db, monkeypatch):
+    async def failing_send_email(**kwargs):
+        raise RuntimeError('smtp down')
+
+    monkeypatch.setattr(notifications, 'send_email', failing_send_email)
+    messages = _emails('broken@example.com')
+    messages[0]['max_attempts'] = 2
+    await database.save_contact(CONTACT, outbox=messages)
+
+    pool = OutboxWorkerPool(workers=1)
+    for _ in range(2):
+        await database.database.connection.execute("UPDATE email_outbox SET next_attempt_at = 0")
+        await database.database.connection.commit()
+        assert await pool.process_once() == 1
+
+    rows = await _outbox_rows()
+    assert rows[0][1:] == (database.OUTBOX_DEAD, 2, 'smtp down')
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_reclaimed(temp_db):
+    await database.save_contact(CONTACT, outbox=_emails('admin@softdab.tech'))
+    claimed = await database.claim_outbox_messages(limit=1, lease_seconds=60)
+    assert len(claimed) == 1
+    # Still leased by the (crashed) worker
+    assert await database.claim_outbox_messages(limit=1) == []
+
+    await database.database.connection.execute("UPDATE email_outbox SET locked_until = ?", (time.time() - 1,))
+    await database.database.connection.commit()
+    reclaimed = await database.claim_outbox_messages(limit=1)
+    assert reclaimed[0]['id'] == claimed[0]['id']
+    assert reclaimed[0]['attempts'] == 2
+
+
+@pytest.mark.asyncio
+async def test_inline_delivery_reports_per_recipient_results(temp_db, monkeypatch):
+    async def fake_send_email(to_address, subject, content, from_address=None, is_html=False, text_content=None):
+        return to_address != 'broken@example.com'
+
+    monkeypatch.setattr(notifications, 'send_email', fake_send_email)
+    contact_id = await database.save_contact(CONTACT, outbox=_emails('ok@example.com', 'broken@example.com'))
+    # Messages of another submission are left alone
+    await database.save_contact(CONTACT, outbox=_emails('other@example.com'))
+
+    pool = OutboxWorkerPool(workers=1)
+    assert await pool.deliver_submission('contact', contact_id, timeout=0) == []
+    results = await pool.deliver_submission('contact', contact_id, timeout=5)
+    assert [(r['to_address'], r['status']) for r in results] == [
+        ('ok@example.com', notifications.DELIVERY_SENT),
+        ('broken@example.com', notifications.DELIVERY_FAILED),
+    ]
+    rows = await _outbox_rows()
+    assert [r[1] for r in rows] == [database.OUTBOX_SENT, database.OUTBOX_PENDING, database.OUTBOX_PENDING]
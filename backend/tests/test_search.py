@@ -0,0 +1,89 @@
+import pytest
+import httpx
+from fastapi import FastAPI
+
+import database
+from routes import admin
+
+CONTACT = {
+    'name': 'Jane Roe', 'email': 'jane@acme.example', 'company': 'Acme Robotics', 'role': 'CTO',
+    'service': 'Web', 'timeline': 'soon', 'budget': '10k',
+    'message': 'We need a Kubernetes migration for our <b>payments</b> platform', 'gdprConsent': True,
+}
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(admin, 'ADMIN_API_TOKEN', 'secret')
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+    return app
+
+
+def _client(app, token='secret'):
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test', headers=headers)
+
+
+async def _search(table, text):
+    return [row['id'] for row in await database.search_submissions(table, database.fts_match_expression(text), 10)]
+
+
+def test_match_expression_quotes_terms():
+    assert database.fts_match_expression('acme robo*') == '"acme" "robo"*'
+    assert database.fts_match_expression('"NEAR( x OR') == '"NEAR(" "x" "OR"'
+    assert database.fts_match_expression(' * ') is None
+
+
+@pytest.mark.asyncio
+async def test_triggers_keep_index_in_sync(temp_db):
+    contact_id = await database.save_contact(CONTACT)
+    assert await _search('contacts', 'kube*') == [contact_id]
+    assert await _search('contacts', 'acme payments') == [contact_id]
+    async with database._transaction() as connection:
+        await connection.execute("UPDATE contacts SET message = 'Mobile app' WHERE id = ?", (contact_id,))
+    assert await _search('contacts', 'kubernetes') == []
+    assert await _search('contacts', 'mobile') == [contact_id]
+    async with database._transaction() as connection:
+        await connection.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
+    assert await _search('contacts', 'mobile') == []
+
+
+@pytest.mark.asyncio
+async def test_details_json_is_searchable(temp_db):
+    consultation_id = await database.save_expert_consultation({
+        'client_type': 'startup', 'name': 'Ann', 'email': 'ann@example.com', 'brief_message': 'Help',
+        'consent': True, 'details': '{"tech_stack": "Elixir"}',
+    })
+    assert await _search('expert_consultations', 'elixir') == [consultation_id]
+
+
+@pytest.mark.asyncio
+async def test_search_endpoint_ranks_escapes_and_pages(temp_db, app):
+    await database.save_contact(CONTACT)
+    best = await database.save_contact(dict(CONTACT, company='Payments Inc', message='Payments payments'))
+    await database.save_staffing_request({
+        'name': 'Bob', 'email': 'bob@example.com', 'roles': ['Payments engineer'], 'engagement': 'full-time',
+        'seniority': 'senior', 'gdprConsent': True,
+    })
+    async with _client(app) as client:
+        first = (await client.get('/api/admin/search', params={'q': 'payments', 'limit': 2})).json()
+        second = (await client.get('/api/admin/search', params={'q': 'payments', 'limit': 2, 'offset': 2})).json()
+        only = (await client.get('/api/admin/search', params={'q': 'kube*', 'type': 'contact'})).json()
+    assert first['results'][0] == {**first['results'][0], 'type': 'contact', 'id': best}
+    assert first['next_offset'] == 2
+    assert len(second['results']) == 1 and second['next_offset'] is None
+    assert {r['type'] for r in first['results'] + second['results']} == {'contact', 'staffing'}
+    snippet = only['results'][0]['snippet']
+    assert '<mark>Kubernetes</mark>' in snippet and '&lt;b&gt;' in snippet
+
+
+@pytest.mark.asyncio
+async def test_admin_api_requires_token(temp_db, app, monkeypatch):
+    async with _client(app, token=None) as client:
+        assert (await client.get('/api/admin/search', params={'q': 'x'})).status_code == 401
+    async with _client(app, token='wrong') as client:
+        assert (await client.get('/api/admin/search', params={'q': 'x'})).status_code == 401
+    monkeypatch.setattr(admin, 'ADMIN_API_TOKEN', '')
+    async with _client(app, token='') as client:
+        assert (await client.get('/api/admin/search', params={'q': 'x'})).status_code == 404
@@ -67,21 +67,22 @@ def test_csrf_protection():
     assert response.status_code == 200
 
 @pytest.mark.asyncio
-async def test_data_retention():
+async def test_data_retention(temp_db):
     """Проверяем политику хранения данных"""
     from middlewares.data_retention import DataRetentionPolicy
-    
+
     # Создаем тестовые данные
-    old_data = {
-        "email": "test@example.com",
-        "name": "Test User",
-        "timestamp": datetime.utcnow() - timedelta(days=400)
-    }
-    
+    old_date = (datetime.utcnow() - timedelta(days=400)).strftime('%Y-%m-%d %H:%M:%S')
+    async with temp_db._transaction() as connection:
+        await connection.execute("""
+            INSERT INTO contacts (name, email, company, role, service, timeline, budget, message,
+                                  gdpr_consent, submitted_at)
+            VALUES ('Test User', 'test@example.com', 'Co', 'CTO', 'Web', 'soon', '10k', 'Hi', 1, ?)
+        """, (old_date,))
+
     # Проверяем очистку старых данных
-    policy = DataRetentionPolicy(app.db)
+    policy = DataRetentionPolicy(submission_days=365, action='delete')
     await policy.cleanup_expired_data()
-    
+
     # Старые данные должны быть удалены
-    result = await app.db.contacts.find_one({"email": "test@example.com"})
-    assert result is None
\ No newline at end of file
+    assert await temp_db.get_submission('contacts', 1) is None
\ No newline at end of file
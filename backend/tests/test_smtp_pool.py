@@ -0,0 +1,101 @@
+import smtplib
+import pytest
+
+from utils import emailer
+from utils.smtp_pool import SMTPConfig, SMTPConnectionPool
+
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP and records the session lifecycle"""
+    instances = []
+
+    def __init__(self, host, port, timeout=None):
+        self.host = host
+        self.port = port
+        self.sent = []
+        self.logins = 0
+        self.noops = 0
+        self.noop_code = 250
+        self.closed = False
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        self.logins += 1
+
+    def noop(self):
+        self.noops += 1
+        return (self.noop_code, b'OK')
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        self.sent.append((from_addr, tuple(to_addrs)))
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch):
+    FakeSMTP.instances = []
+    monkeypatch.setattr(smtplib, 'SMTP', FakeSMTP)
+    return FakeSMTP
+
+
+def _pool(**kwargs):
+    config = SMTPConfig(host='relay.test', port=587, user='noreply@softdab.tech', password='secret', use_tls=True)
+    return SMTPConnectionPool(config, **kwargs)
+
+
+def test_sessions_are_reused(fake_smtp):
+    pool = _pool(max_size=2)
+    for i in range(3):
+        pool.send_blocking('noreply@softdab.tech', [f'{i}@example.com'], 'msg')
+    assert len(fake_smtp.instances) == 1
+    session = fake_smtp.instances[0]
+    assert session.logins == 1
+    assert len(session.sent) == 3
+    # Reused sessions are health-checked first
+    assert session.noops == 2
+    pool.close()
+    assert session.closed
+
+
+def test_sessions_recycled_after_max_messages(fake_smtp):
+    pool = _pool(max_messages=2)
+    for i in range(3):
+        pool.send_blocking('noreply@softdab.tech', [f'{i}@example.com'], 'msg')
+    assert len(fake_smtp.instances) == 2
+    assert fake_smtp.instances[0].closed
+    pool.close()
+
+
+def test_idle_or_unhealthy_sessions_are_replaced(fake_smtp):
+    pool = _pool(idle_timeout=60)
+    pool.send_blocking('noreply@softdab.tech', ['a@example.com'], 'msg')
+    fake_smtp.instances[0].noop_code = 421
+    pool.send_blocking('noreply@softdab.tech', ['b@example.com'], 'msg')
+    assert len(fake_smtp.instances) == 2
+    assert fake_smtp.instances[0].closed
+
+    pool.idle_timeout = -1
+    pool.send_blocking('noreply@softdab.tech', ['c@example.com'], 'msg')
+    assert len(fake_smtp.instances) == 3
+    pool.close()
+
+
+@pytest.mark.asyncio
+async def test_send_email_uses_pool_executor(fake_smtp, monkeypatch):
+    pool = _pool(max_size=1)
+    monkeypatch.setattr(emailer, 'smtp_pool', pool)
+    monkeypatch.setattr(emailer, 'RESEND_API_KEY', None)
+    assert await emailer.send_email('a@example.com', 'Hi', 'Body')
+    assert await emailer.send_email('b@example.com', 'Hi', '<html><body>Hi</body></html>')
+    assert len(fake_smtp.instances) == 1
+    assert fake_smtp.instances[0].sent[0] == ('noreply@softdab.tech', ('a@example.com',))
+    assert pool.executor._thread_name_prefix == 'smtp'
+    pool.close()
@@ -0,0 +1,143 @@
+import time
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import database
+from routes import unsubscribe
+from utils import emailer, notifications
+from utils import suppression as suppression_module
+from utils.http_clients import http_clients
+from utils.outbox import OutboxWorkerPool
+from utils.suppression import SuppressionList, suppression
+
+
+@pytest.fixture
+def unsubscribe_app(monkeypatch):
+    monkeypatch.setattr(suppression_module, 'UNSUBSCRIBE_SECRET', 'secret')
+    app = FastAPI()
+    app.include_router(unsubscribe.router, prefix="/api")
+    return app
+
+
+@pytest.mark.asyncio
+async def test_unsubscribe_link_confirms_then_post_writes_the_list(temp_db, unsubscribe_app):
+    await database.save_contact({
+        'name': 'Ann', 'email': 'Ann@Example.com', 'company': 'Co', 'role': 'CTO', 'service': 'Web',
+        'timeline': 'soon', 'budget': '10k', 'message': 'Hello there, a long enough message', 'gdprConsent': True,
+    })
+    signed = {'email': 'ann@example.com ', 'token': suppression_module.unsubscribe_token('ANN@example.com')}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=unsubscribe_app), base_url='http://test') as client:
+        page = await client.get('/api/unsubscribe', params=signed)
+        # A prefetched link changes nothing
+        assert not suppression.is_suppressed('ann@example.com')
+        response = await client.post('/api/unsubscribe', data=signed)
+        invalid = await client.post('/api/unsubscribe', data={'email': 'nope', 'token': signed['token']})
+
+    assert page.status_code == 200 and 'method="post"' in page.text
+    assert response.status_code == 200
+    assert invalid.status_code == 400
+    assert suppression.is_suppressed('ANN@example.com')
+    assert (await database.get_submission('contacts', 1))['status'] == 'unsubscribed'
+    assert await database.get_suppressed_emails() == (['ann@example.com'], 1)
+
+
+@pytest.mark.asyncio
+async def test_unsigned_unsubscribe_is_rejected(temp_db, unsubscribe_app, monkeypatch):
+    forged = {'email': 'info@softdab.tech', 'token': suppression_module.unsubscribe_token('info@softdab.tech', 'guess')}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=unsubscribe_app), base_url='http://test') as client:
+        unsigned_get = await client.get('/api/unsubscribe', params={'email': 'info@softdab.tech'})
+        unsigned_post = await client.post('/api/unsubscribe', data={'email': 'info@softdab.tech'})
+        forged_post = await client.post('/api/unsubscribe', data=forged)
+        # Without a configured secret no link is valid
+        monkeypatch.setattr(suppression_module, 'UNSUBSCRIBE_SECRET', '')
+        unconfigured = await client.post('/api/unsubscribe', data={'email': 'a@example.com', 'token': ''})
+    assert [r.status_code for r in (unsigned_get, unsigned_post, forged_post, unconfigured)] == [403] * 4
+    assert await database.get_suppressed_emails() == ([], 0)
+
+
+@pytest.mark.asyncio
+async def test_admin_mail_goes_out_after_its_address_is_unsubscribed(temp_db, monkeypatch):
+    calls = []
+
+    async def fake_smtp(*args):
+        calls.append(args[0])
+        return True
+
+    monkeypatch.setitem(emailer._SENDERS, 'smtp', fake_smtp)
+    assert await suppression.unsubscribe('Info@SoftDAB.tech')
+    assert await suppression.add(['info@softdab.tech', 'client@example.com'], 'bounced') == 1
+    # Even a row written directly (an older release, another tool) is ignored for internal recipients
+    await database.suppress_emails(['info@softdab.tech'], 'unsubscribed')
+    await suppression.refresh()
+
+    assert await emailer.send_email('info@softdab.tech', 'New lead', 'Body')
+    assert not await emailer.send_email('client@example.com', 'Hi', 'Body')
+    assert calls == ['info@softdab.tech']
+
+
+@pytest.mark.asyncio
+async def test_refresh_picks_up_addresses_from_other_workers(temp_db):
+    worker = SuppressionList()
+    await database.suppress_emails(['a@example.com'], 'bounced')
+    assert await worker.refresh() == 1
+    await database.suppress_emails(['a@example.com', 'b@example.com'], 'bounced')
+    # Only rows added since the last refresh are read
+    assert await worker.refresh() == 1
+    assert worker.is_suppressed('b@example.com') and len(worker) == 2
+
+
+@pytest.mark.asyncio
+async def test_send_email_skips_suppressed_before_any_provider(temp_db, monkeypatch):
+    calls = []
+
+    async def fake_smtp(*args):
+        calls.append(args[0])
+        return True
+
+    monkeypatch.setitem(emailer._SENDERS, 'smtp', fake_smtp)
+    await suppression.add(['Gone@example.com'], 'unsubscribed')
+
+    assert not await emailer.send_email('gone@example.com', 'Hi', 'Body')
+    assert await emailer.send_email('here@example.com', 'Hi', 'Body')
+    assert calls == ['here@example.com']
+
+
+@pytest.mark.asyncio
+async def test_batch_send_leaves_out_suppressed(temp_db, monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={'data': [{'id': '1'}, {'id': '2'}]})
+
+    client = httpx.AsyncClient(base_url='https://api.resend.com', transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(http_clients._clients, 'resend', client)
+    monkeypatch.setattr(emailer, 'RESEND_API_KEY', 're_test')
+    await suppression.add(['b@example.com'], 'bounced')
+
+    results = await emailer.send_email_batch([
+        {'to_address': a, 'subject': 'Hi', 'content': 'Body'} for a in ('a@example.com', 'b@example.com', 'c@example.com')
+    ])
+
+    assert results == [True, False, True]
+    assert len(requests) == 1 and b'b@example.com' not in requests[0].content
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_outbox_dead_letters_suppressed_recipients(temp_db, monkeypatch):
+    async def fake_send_email(to_address, subject, content, from_address=None, is_html=False, text_content=None):
+        return False
+
+    monkeypatch.setattr(notifications, 'send_email', fake_send_email)
+    await suppression.add(['gone@example.com'], 'unsubscribed')
+    async with database._transaction() as connection:
+        await connection.execute(
+            "INSERT INTO email_outbox (submission_type, to_address, subject, content, next_attempt_at) "
+            "VALUES ('contact', 'gone@example.com', 'Hi', 'Body', ?)", (time.time(),)
+        )
+
+    assert await OutboxWorkerPool(workers=1).process_once() == 1
+    async with database._read() as reader, reader.execute("SELECT status, attempts, last_error FROM email_outbox") as cursor:
+        assert tuple(await cursor.fetchone()) == (database.OUTBOX_DEAD, 1, 'recipient suppressed')
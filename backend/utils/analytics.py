@@ -0,0 +1,43 @@
+"""
+Maintenance for the lead analytics rollups (submission_daily_rollups).
+
+The rollups are updated by insert triggers, so this is only needed to
+backfill after importing rows directly or changing how a dimension is
+derived. A rebuild recounts the rows currently in the submission tables.
+
+Run from backend/:  python -m utils.analytics rebuild
+"""
+import sys
+import asyncio
+import argparse
+import logging
+
+import database
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild() -> int:
+    """Open the database, recount all rollups and close it again"""
+    await database.init_database()
+    try:
+        rows = await database.rebuild_rollups()
+        logger.info(f"Rebuilt analytics rollups: {rows} rows")
+        return rows
+    finally:
+        await database.close_database()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('rebuild', help='recount the rollups from the submission tables')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.command == 'rebuild':
+        asyncio.run(rebuild())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Circuit breaker and retry budget for outgoing provider calls.
+
+Each email provider gets a CircuitBreaker that tracks a rolling window of call
+outcomes and latencies. When the error rate (or the share of slow calls) goes
+over the threshold the breaker opens and the provider is skipped; after a
+cool-down a limited number of half-open probes decide whether it closes again.
+The RetryBudget caps failover retries to a fraction of first attempts so that
+retries cannot multiply load during an incident.
+"""
+import os
+import time
+import logging
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BREAKER_WINDOW_SECONDS = float(os.environ.get('EMAIL_BREAKER_WINDOW_SECONDS', '60'))
+BREAKER_MIN_REQUESTS = int(os.environ.get('EMAIL_BREAKER_MIN_REQUESTS', '5'))
+BREAKER_ERROR_RATE = float(os.environ.get('EMAIL_BREAKER_ERROR_RATE', '0.5'))
+BREAKER_SLOW_CALL_MS = float(os.environ.get('EMAIL_BREAKER_SLOW_CALL_MS', '5000'))
+BREAKER_OPEN_SECONDS = float(os.environ.get('EMAIL_BREAKER_OPEN_SECONDS', '30'))
+BREAKER_HALF_OPEN_PROBES = int(os.environ.get('EMAIL_BREAKER_HALF_OPEN_PROBES', '1'))
+RETRY_BUDGET_RATIO = float(os.environ.get('EMAIL_RETRY_BUDGET_RATIO', '0.2'))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.environ.get('EMAIL_RETRY_BUDGET_MIN_PER_SECOND', '0.5'))
+RETRY_BUDGET_MAX_TOKENS = float(os.environ.get('EMAIL_RETRY_BUDGET_MAX_TOKENS', '10'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Smoothing factor for the latency moving average
+_EWMA_ALPHA = 0.3
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one provider"""
+
+    def __init__(self, name: str, window_seconds: float = BREAKER_WINDOW_SECONDS,
+                 min_requests: int = BREAKER_MIN_REQUESTS, error_rate: float = BREAKER_ERROR_RATE,
+                 slow_call_ms: float = BREAKER_SLOW_CALL_MS, open_seconds: float = BREAKER_OPEN_SECONDS,
+                 half_open_probes: int = BREAKER_HALF_OPEN_PROBES):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_rate_threshold = error_rate
+        self.slow_call_ms = slow_call_ms
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.latency_ewma_ms: Optional[float] = None
+        self._calls: Deque[Tuple[float, bool, float]] = deque()  # (timestamp, ok, latency_ms)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+
+    def _prune(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.warning(f"circuit_breaker provider={self.name} {self.state}->{state} error_rate={self.error_rate():.2f}")
+            self.state = state
+
+    def allow_request(self) -> bool:
+        """Whether a call may be sent to the provider now (reserves a probe when half-open)"""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                return False
+            self._transition(HALF_OPEN)
+            self._probes_in_flight = 0
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                return False
+            self._probes_in_flight += 1
+        return True
+
+    def cancel_request(self):
+        """Give back a call reserved by allow_request() that was not made"""
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record_success(self, latency_ms: float):
+        self._record(True, latency_ms)
+
+    def record_failure(self, latency_ms: float):
+        self._record(False, latency_ms)
+
+    def _record(self, ok: bool, latency_ms: float):
+        now = time.monotonic()
+        self._prune(now)
+        self._calls.append((now, ok, latency_ms))
+        if self.latency_ewma_ms is None:
+            self.latency_ewma_ms = latency_ms
+        else:
+            self.latency_ewma_ms = _EWMA_ALPHA * latency_ms + (1 - _EWMA_ALPHA) * self.latency_ewma_ms
+
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if ok and latency_ms < self.slow_call_ms:
+                self._calls.clear()
+                self._calls.append((now, ok, latency_ms))
+                self._transition(CLOSED)
+            else:
+                self._open(now)
+            return
+
+        if self.state == CLOSED and len(self._calls) >= self.min_requests:
+            if self.error_rate() >= self.error_rate_threshold or self.slow_rate() >= self.error_rate_threshold:
+                self._open(now)
+
+    def _open(self, now: float):
+        self._opened_at = now
+        self._transition(OPEN)
+
+    def error_rate(self) -> float:
+        if not self._calls:
+            return 0.0
+        return sum(1 for _, ok, _ in self._calls if not ok) / len(self._calls)
+
+    def slow_rate(self) -> float:
+        if not self._calls:
+            return 0.0
+        return sum(1 for _, _, latency in self._calls if latency >= self.slow_call_ms) / len(self._calls)
+
+    def health_key(self) -> tuple:
+        """Sort key for routing: usable state first, then lower observed latency"""
+        state_rank = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}[self.state]
+        latency = self.latency_ewma_ms if self.latency_ewma_ms is not None else float('inf')
+        return (state_rank, round(self.error_rate(), 1), latency)
+
+    def snapshot(self) -> dict:
+        self._prune(time.monotonic())
+        return {
+            'state': self.state,
+            'error_rate': round(self.error_rate(), 3),
+            'slow_rate': round(self.slow_rate(), 3),
+            'latency_ewma_ms': round(self.latency_ewma_ms, 1) if self.latency_ewma_ms is not None else None,
+            'calls_in_window': len(self._calls),
+        }
+
+
+class RetryBudget:
+    """Token bucket allowing retries for a fraction of first attempts"""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_per_second: float = RETRY_BUDGET_MIN_PER_SECOND,
+                 max_tokens: float = RETRY_BUDGET_MAX_TOKENS):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._last_refill = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._last_refill) * self.min_per_second)
+        self._last_refill = now
+
+    def record_request(self):
+        """Deposit the retry allowance earned by a first attempt"""
+        self._refill()
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one retry token; False when the budget is exhausted"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
@@ -0,0 +1,95 @@
+"""
+Validators (ETag / Last-Modified) and conditional GET handling.
+
+CacheMiddleware tags cached responses with a hash of their body. The admin
+lists tag theirs with the submission table's change counter (migration 8),
+so an unchanged list is answered with 304 before it is queried or
+serialized.
+"""
+import hashlib
+import logging
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+from database import get_submission_version
+
+logger = logging.getLogger(__name__)
+
+# Headers a 304 repeats from the full response (RFC 9110 section 15.4.5)
+NOT_MODIFIED_HEADERS = frozenset((b'etag', b'last-modified', b'cache-control', b'vary', b'expires', b'content-location'))
+# Browsers keep admin lists but revalidate them on every use
+ADMIN_LIST_CACHE_CONTROL = 'private, no-cache'
+
+
+def strong_etag(*parts) -> str:
+    """Quoted strong ETag from a hash of the given parts (bytes or anything str() can render)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b'\0')
+    return f'"{digest.hexdigest()}"'
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def parse_http_date(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds of an HTTP date, or None when it does not parse"""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires: W/"x" matches "x\""""
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith('W/') else candidate) == opaque:
+            return True
+    return False
+
+
+def is_not_modified(if_none_match: Optional[str], if_modified_since: Optional[str],
+                    etag: Optional[str], last_modified: Optional[float]) -> bool:
+    """Whether a GET with these request headers can be answered with 304"""
+    # If-None-Match wins; If-Modified-Since only counts without it
+    if if_none_match is not None:
+        return etag is not None and etag_matches(if_none_match, etag)
+    since = parse_http_date(if_modified_since)
+    return since is not None and last_modified is not None and int(last_modified) <= since
+
+
+async def submission_list_validators(request: Request, response: Response, table: str) -> Optional[Response]:
+    """Set ETag / Last-Modified on an admin list from the table version; a 304 response when unchanged"""
+    try:
+        version, modified_at = await get_submission_version(table)
+    except Exception as e:
+        # No validators is always correct, just slower
+        logger.warning(f"Could not read the {table} version: {e}")
+        return None
+    # The query string selects the page and fields, so it is part of the representation
+    etag = strong_etag(table, version, request.url.query)
+    last_modified = None
+    if modified_at:
+        last_modified = datetime.strptime(modified_at, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+    headers = {'ETag': etag, 'Cache-Control': ADMIN_LIST_CACHE_CONTROL}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    if is_not_modified(request.headers.get('if-none-match'), request.headers.get('if-modified-since'),
+                       etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,111 @@
+"""
+Admin notification digest mode.
+
+During submission spikes every form would otherwise send its own admin email.
+With ADMIN_DIGEST_ENABLED the admin copies are held in the admin_digest_items
+table (written in the submission's transaction) and a background task turns
+them into one summary email per admin once the oldest item is older than
+ADMIN_DIGEST_WINDOW_SECONDS or ADMIN_DIGEST_MAX_ITEMS have accumulated. The
+summary goes through the email outbox like any other message. Expert
+consultations with priority >= ADMIN_DIGEST_BYPASS_PRIORITY are never held.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from database import get_due_digest_recipients, flush_admin_digest
+from utils.outbox import outbox
+
+logger = logging.getLogger(__name__)
+
+ADMIN_DIGEST_ENABLED = os.environ.get('ADMIN_DIGEST_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+ADMIN_DIGEST_WINDOW_SECONDS = float(os.environ.get('ADMIN_DIGEST_WINDOW_SECONDS', '900'))
+ADMIN_DIGEST_MAX_ITEMS = int(os.environ.get('ADMIN_DIGEST_MAX_ITEMS', '25'))
+ADMIN_DIGEST_CHECK_INTERVAL = float(os.environ.get('ADMIN_DIGEST_CHECK_INTERVAL', '15'))
+ADMIN_DIGEST_BYPASS_PRIORITY = int(os.environ.get('ADMIN_DIGEST_BYPASS_PRIORITY', '8'))
+FROM_EMAIL = os.environ.get('FROM_EMAIL', 'noreply@softdab.tech')
+FROM_NAME = os.environ.get('FROM_NAME', 'SoftDAB')
+
+SUBMISSION_LABELS = {
+    'contact': 'Contact form',
+    'staffing': 'Staffing request',
+    'expert_consultation': 'Expert consultation',
+}
+
+
+def use_digest(priority: int = 0) -> bool:
+    """Whether an admin notification should be held for the digest"""
+    return ADMIN_DIGEST_ENABLED and priority < ADMIN_DIGEST_BYPASS_PRIORITY
+
+
+def build_digest_message(to_address: str, items: List[dict]) -> dict:
+    """Build one summary email from an admin's held notifications"""
+    counts = {}
+    for item in items:
+        counts[item['submission_type']] = counts.get(item['submission_type'], 0) + 1
+    summary = ", ".join(f"{SUBMISSION_LABELS.get(t, t)}: {n}" for t, n in counts.items())
+
+    content = f"Admin digest — {len(items)} new submissions\n\n{summary}\n\n"
+    content += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+    for index, item in enumerate(items, 1):
+        received = datetime.utcfromtimestamp(item['created_at']).strftime('%Y-%m-%d %H:%M:%S UTC')
+        content += f"{index}. {item['subject']}\nReceived: {received}\n\n{item['content'].strip()}\n\n"
+        content += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+
+    return {
+        'to_address': to_address,
+        'subject': f"🔔 SoftDAB digest: {len(items)} new submissions ({summary})",
+        'content': content,
+        'from_address': items[-1].get('from_address') or f"{FROM_NAME} <{FROM_EMAIL}>"
+    }
+
+
+class DigestScheduler:
+    """Background task that flushes due admin digests into the outbox"""
+
+    def __init__(self, window_seconds: float = ADMIN_DIGEST_WINDOW_SECONDS,
+                 max_items: int = ADMIN_DIGEST_MAX_ITEMS, check_interval: float = ADMIN_DIGEST_CHECK_INTERVAL):
+        self.window_seconds = window_seconds
+        self.max_items = max_items
+        self.check_interval = check_interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the flush loop on the running event loop (also drains items left over after disabling)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Admin digest scheduler started: enabled={ADMIN_DIGEST_ENABLED} window={int(self.window_seconds)}s max_items={self.max_items}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.flush_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Admin digest flush error: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    async def flush_due(self) -> int:
+        """Send a digest to every admin whose window elapsed or count was reached; returns digests queued"""
+        queued = 0
+        for to_address in await get_due_digest_recipients(self.window_seconds, self.max_items):
+            items = await flush_admin_digest(to_address, build_digest_message)
+            if items:
+                queued += 1
+                logger.info(f"admin_digest to={to_address} items={items}")
+        if queued:
+            outbox.wake()
+        return queued
+
+
+# Global instance
+digest = DigestScheduler()
@@ -1,38 +1,197 @@
 """
 Email template renderer for client confirmation emails
+
+Templates are compiled once by a shared Jinja2 Environment and their bytecode
+is cached on disk, so worker processes skip parsing on start. Jinja compiles
+the static markup of a template into constant strings, so a render only
+evaluates the variable parts. HTML templates are CSS-inlined and minified on
+load and each has a plain-text alternative (see utils.email_templates).
 """
 import os
+import re
+import json
 import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
-from jinja2 import Template
+from jinja2 import Environment, FileSystemBytecodeCache, select_autoescape
+
+from utils.email_templates import BuiltTemplateLoader
+from utils.suppression import unsubscribe_url
 
 logger = logging.getLogger(__name__)
 
+# Path to templates folder in backend root
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
+CLIENT_CONFIRMATION_TEMPLATE = 'client_confirmation_email.html'
+# Plain-text alternative, generated from the HTML template
+CLIENT_CONFIRMATION_TEXT_TEMPLATE = 'client_confirmation_email.txt'
+# Directory for compiled template bytecode (default: system temp dir)
+EMAIL_TEMPLATE_CACHE_DIR = os.environ.get('EMAIL_TEMPLATE_CACHE_DIR')
+
+# Display labels for expert consultation details
+DETAIL_LABELS = {
+    'stage': 'Project Stage',
+    'budget_range': 'Budget',
+    'timeline': 'Timeline',
+    'founders_count': 'Number of Founders',
+    'target_markets': 'Target Markets',
+    'traction_metrics': 'Traction Metrics',
+    'tech_stack': 'Tech Stack',
+    'nda_required': 'NDA Required',
+    'product_size': 'Product Size',
+    'team_size': 'Team Size',
+    'major_pain': 'Major Pain Point',
+    'current_stack': 'Current Stack',
+    'active_users': 'Active Users',
+    'sla_requirements': 'SLA Requirements',
+    'compliance_needs': 'Compliance Needs',
+    'deployment_model': 'Deployment Model',
+    'project_type': 'Project Type',
+    'duration': 'Duration',
+    'repo_access': 'Repository Access',
+    'ci_cd': 'CI/CD',
+    'deliverables': 'Deliverables',
+    'acceptance_criteria': 'Acceptance Criteria',
+    'procurement_process': 'Procurement Process',
+    'roles_needed': 'Required Roles',
+    'start_date': 'Start Date',
+    'engagement_length': 'Engagement Length',
+    'interview_process': 'Interview Process',
+    'timezone_overlap': 'Timezone Overlap',
+    'security_clearances': 'Security Clearances'
+}
+
+# Client type display names
+CLIENT_TYPE_MAP = {
+    'startup': 'Startup',
+    'product': 'Product Company',
+    'outsourcing': 'Project Outsourcing',
+    'outstaff': 'Team Extension'
+}
+
+
+def create_environment(enable_async: bool = False) -> Environment:
+    """Shared Environment: autoescaping, on-disk bytecode cache, no reload checks"""
+    # Sync and async compilations differ, so they must not share cache files
+    pattern = '__jinja2_async_%s.cache' if enable_async else '__jinja2_%s.cache'
+    if EMAIL_TEMPLATE_CACHE_DIR:
+        os.makedirs(EMAIL_TEMPLATE_CACHE_DIR, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(EMAIL_TEMPLATE_CACHE_DIR, pattern)
+    else:
+        bytecode_cache = FileSystemBytecodeCache(pattern=pattern)
+    return Environment(
+        loader=BuiltTemplateLoader(TEMPLATES_DIR),
+        autoescape=select_autoescape(['html']),
+        bytecode_cache=bytecode_cache,
+        auto_reload=False,
+        enable_async=enable_async
+    )
+
+
 class ClientEmailRenderer:
     """Renders client confirmation emails using Jinja2 templates"""
     
-    def __init__(self):
-        # Path to templates folder in backend root
-        backend_root = os.path.dirname(os.path.dirname(__file__))
-        self.template_path = os.path.join(backend_root, 'templates', 'client_confirmation_email.html')
+    def __init__(self, environment: Optional[Environment] = None):
+        self.environment = environment or create_environment()
+        self._async_environment: Optional[Environment] = None
         self._load_template()
     
     def _load_template(self):
-        """Load the email template"""
+        """Compile (or load from the bytecode cache) the email templates"""
         try:
-            with open(self.template_path, 'r', encoding='utf-8') as f:
-                self.template = Template(f.read())
+            self.template = self.environment.get_template(CLIENT_CONFIRMATION_TEMPLATE)
+            self.text_template = self.environment.get_template(CLIENT_CONFIRMATION_TEXT_TEMPLATE)
         except Exception as e:
             logger.error(f"Failed to load email template: {e}")
             self.template = None
+            self.text_template = None
     
     def render_contact_form_email(self, contact_data: Dict[str, Any]) -> str:
         """Render email for regular contact form submission"""
         if not self.template:
             return self._fallback_contact_email(contact_data)
         
-        template_vars = {
+        try:
+            return self.template.render(self._contact_form_vars(contact_data))
+        except Exception as e:
+            logger.error(f"Failed to render contact form email template: {e}")
+            return self._fallback_contact_email(contact_data)
+    
+    def render_expert_consultation_email(self, consultation_data: Dict[str, Any], routing_info: Dict[str, Any]) -> str:
+        """Render email for expert consultation submission"""
+        if not self.template:
+            return self._fallback_expert_email(consultation_data, routing_info)
+        
+        try:
+            return self.template.render(self._expert_consultation_vars(consultation_data, routing_info))
+        except Exception as e:
+            logger.error(f"Failed to render expert consultation email template: {e}")
+            return self._fallback_expert_email(consultation_data, routing_info)
+    
+    def render_contact_form_text(self, contact_data: Dict[str, Any]) -> Optional[str]:
+        """Render the plain-text alternative of the contact form email (None if unavailable)"""
+        if not self.text_template:
+            return None
+        
+        try:
+            return self._tidy_text(self.text_template.render(self._contact_form_vars(contact_data)))
+        except Exception as e:
+            logger.error(f"Failed to render contact form text email: {e}")
+            return None
+    
+    def render_expert_consultation_text(self, consultation_data: Dict[str, Any], routing_info: Dict[str, Any]) -> Optional[str]:
+        """Render the plain-text alternative of the expert consultation email (None if unavailable)"""
+        if not self.text_template:
+            return None
+        
+        try:
+            return self._tidy_text(self.text_template.render(self._expert_consultation_vars(consultation_data, routing_info)))
+        except Exception as e:
+            logger.error(f"Failed to render expert consultation text email: {e}")
+            return None
+    
+    @staticmethod
+    def _tidy_text(text: str) -> str:
+        """Collapse the blank lines left by template control blocks"""
+        text = re.sub(r'[ \t]+\n', '\n', text)
+        return re.sub(r'\n{3,}', '\n\n', text).strip() + '\n'
+    
+    async def render_contact_form_email_async(self, contact_data: Dict[str, Any]) -> str:
+        """Render the contact form email with Jinja2's async renderer"""
+        template = self._get_async_template()
+        if not template:
+            return self._fallback_contact_email(contact_data)
+        
+        try:
+            return await template.render_async(self._contact_form_vars(contact_data))
+        except Exception as e:
+            logger.error(f"Failed to render contact form email template: {e}")
+            return self._fallback_contact_email(contact_data)
+    
+    async def render_expert_consultation_email_async(self, consultation_data: Dict[str, Any], routing_info: Dict[str, Any]) -> str:
+        """Render the expert consultation email with Jinja2's async renderer"""
+        template = self._get_async_template()
+        if not template:
+            return self._fallback_expert_email(consultation_data, routing_info)
+        
+        try:
+            return await template.render_async(self._expert_consultation_vars(consultation_data, routing_info))
+        except Exception as e:
+            logger.error(f"Failed to render expert consultation email template: {e}")
+            return self._fallback_expert_email(consultation_data, routing_info)
+    
+    def _get_async_template(self):
+        """Template compiled for async rendering (created on first use)"""
+        if self._async_environment is None:
+            self._async_environment = create_environment(enable_async=True)
+        try:
+            return self._async_environment.get_template(CLIENT_CONFIRMATION_TEMPLATE)
+        except Exception as e:
+            logger.error(f"Failed to load email template: {e}")
+            return None
+    
+    def _contact_form_vars(self, contact_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
             'form_type': 'contact_form',
             'form_type_display': 'Contact Form',
             'name': contact_data['name'],
@@ -50,79 +209,27 @@ class ClientEmailRenderer:
             'sla_hours': None,
             'client_type_display': None,
             'assigned_team': None,
-            'unsubscribe_url': f"https://softdab.tech/api/unsubscribe?email={contact_data['email']}"
+            'unsubscribe_url': unsubscribe_url(contact_data['email'])
         }
-        
-        try:
-            return self.template.render(**template_vars)
-        except Exception as e:
-            logger.error(f"Failed to render contact form email template: {e}")
-            return self._fallback_contact_email(contact_data)
     
-    def render_expert_consultation_email(self, consultation_data: Dict[str, Any], routing_info: Dict[str, Any]) -> str:
-        """Render email for expert consultation submission"""
-        if not self.template:
-            return self._fallback_expert_email(consultation_data, routing_info)
-        
+    def _expert_consultation_vars(self, consultation_data: Dict[str, Any], routing_info: Dict[str, Any]) -> Dict[str, Any]:
         # Parse details if it's a JSON string
         details = consultation_data.get('details', {})
         if isinstance(details, str):
             try:
-                import json
                 details = json.loads(details)
             except:
                 details = {}
         
         # Format details for display
         consultation_details = []
-        if details:
-            detail_labels = {
-                'stage': 'Project Stage',
-                'budget_range': 'Budget',
-                'timeline': 'Timeline',
-                'founders_count': 'Number of Founders',
-                'target_markets': 'Target Markets',
-                'traction_metrics': 'Traction Metrics',
-                'tech_stack': 'Tech Stack',
-                'nda_required': 'NDA Required',
-                'product_size': 'Product Size',
-                'team_size': 'Team Size',
-                'major_pain': 'Major Pain Point',
-                'current_stack': 'Current Stack',
-                'active_users': 'Active Users',
-                'sla_requirements': 'SLA Requirements',
-                'compliance_needs': 'Compliance Needs',
-                'deployment_model': 'Deployment Model',
-                'project_type': 'Project Type',
-                'duration': 'Duration',
-                'repo_access': 'Repository Access',
-                'ci_cd': 'CI/CD',
-                'deliverables': 'Deliverables',
-                'acceptance_criteria': 'Acceptance Criteria',
-                'procurement_process': 'Procurement Process',
-                'roles_needed': 'Required Roles',
-                'start_date': 'Start Date',
-                'engagement_length': 'Engagement Length',
-                'interview_process': 'Interview Process',
-                'timezone_overlap': 'Timezone Overlap',
-                'security_clearances': 'Security Clearances'
-            }
-            
-            for key, value in details.items():
-                if value and key in detail_labels:
-                    if isinstance(value, bool):
-                        value = 'Yes' if value else 'No'
-                    consultation_details.append((detail_labels[key], str(value)))
-        
-        # Client type display names
-        client_type_map = {
-            'startup': 'Startup',
-            'product': 'Product Company',
-            'outsourcing': 'Project Outsourcing',
-            'outstaff': 'Team Extension'
-        }
+        for key, value in (details or {}).items():
+            if value and key in DETAIL_LABELS:
+                if isinstance(value, bool):
+                    value = 'Yes' if value else 'No'
+                consultation_details.append((DETAIL_LABELS[key], str(value)))
         
-        template_vars = {
+        return {
             'form_type': 'expert_consultation',
             'form_type_display': 'Expert Consultation',
             'name': consultation_data['name'],
@@ -138,16 +245,10 @@ class ClientEmailRenderer:
             'consultation_details': consultation_details,
             'priority': consultation_data.get('priority', 5),
             'sla_hours': routing_info.get('sla_hours', 24),
-            'client_type_display': client_type_map.get(consultation_data.get('client_type', ''), 'Consultation'),
+            'client_type_display': CLIENT_TYPE_MAP.get(consultation_data.get('client_type', ''), 'Consultation'),
             'assigned_team': ', '.join(routing_info.get('assigned_to', ['SoftDAB Team'])),
             'unsubscribe_url': None
         }
-        
-        try:
-            return self.template.render(**template_vars)
-        except Exception as e:
-            logger.error(f"Failed to render expert consultation email template: {e}")
-            return self._fallback_expert_email(consultation_data, routing_info)
     
     def _format_date(self, date_obj) -> str:
         """Format date for display"""
@@ -0,0 +1,231 @@
+"""
+Build step for HTML email templates.
+
+Templates are written with a readable <style> block. When they are loaded,
+CSS rules with simple selectors (tag, .class, tag.class) are inlined into the
+matching elements' style attributes, the markup is minified, and a plain-text
+alternative is derived from the same source. Rules that cannot be inlined
+(@media, :hover, descendant selectors) stay in a minified <style> block. Where
+they set a property that was inlined onto an element they can match, the
+declaration is marked !important, as inline styles would otherwise beat it;
+inside @media blocks this includes the element's own style="", since the
+responsive overrides are meant to win on small screens.
+Jinja tags are left untouched, so the output is still a template and the
+work happens once per process (or never, with the bytecode cache).
+"""
+import os
+import re
+import html
+from typing import Dict, List, Set, Tuple
+
+from jinja2 import FileSystemLoader
+
+_JINJA_RE = re.compile(r'\{\{.*?\}\}|\{%.*?%\}|\{#.*?#\}', re.S)
+_STYLE_BLOCK_RE = re.compile(r'<style[^>]*>(.*?)</style>', re.S | re.I)
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_HTML_COMMENT_RE = re.compile(r'<!--(?!\[if).*?-->', re.S)
+_SIMPLE_SELECTOR_RE = re.compile(r'^([a-zA-Z][a-zA-Z0-9]*)?(?:\.([\w-]+))?$')
+_START_TAG_RE = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)(\s[^<>]*?)?(/?)>')
+_CLASS_ATTR_RE = re.compile(r'\sclass\s*=\s*"([^"]*)"', re.I)
+_STYLE_ATTR_RE = re.compile(r'\sstyle\s*=\s*"([^"]*)"', re.I)
+_SELECTOR_SUBJECT_RE = re.compile(r'([^\s>+~]+)$')
+_BLOCK_END_RE = re.compile(r'</(p|div|tr|table|h[1-6]|ul|ol|li)\s*>', re.I)
+
+
+def _parse_css(css: str) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """Split a stylesheet into (selector, declarations) rules and verbatim @-blocks"""
+    rules, at_blocks = [], []
+    css = _CSS_COMMENT_RE.sub('', css)
+    i = 0
+    while True:
+        open_brace = css.find('{', i)
+        if open_brace == -1:
+            break
+        selector = css[i:open_brace].strip()
+        if selector.startswith('@'):
+            depth, j = 0, open_brace
+            while j < len(css):
+                if css[j] == '{':
+                    depth += 1
+                elif css[j] == '}':
+                    depth -= 1
+                    if depth == 0:
+                        break
+                j += 1
+            at_blocks.append(css[i:j + 1].strip())
+            i = j + 1
+            continue
+        close_brace = css.find('}', open_brace)
+        rules.append((selector, css[open_brace + 1:close_brace].strip()))
+        i = close_brace + 1
+    return rules, at_blocks
+
+
+def _declarations(block: str) -> str:
+    """Normalize a declaration list for use inside a double-quoted style attribute"""
+    declarations = []
+    for declaration in block.split(';'):
+        prop, _, value = declaration.partition(':')
+        if prop.strip() and value.strip():
+            declarations.append(f"{prop.strip()}:{' '.join(value.split())}".replace('"', "'"))
+    return ';'.join(declarations)
+
+
+def _important(declarations: str, props: Set[str]) -> str:
+    """Mark declarations of the given properties !important"""
+    marked = []
+    for declaration in declarations.split(';'):
+        prop, _, value = declaration.partition(':')
+        if prop.strip().lower() in props and value.strip() and '!important' not in value:
+            declaration = f"{prop}:{value.rstrip()} !important"
+        marked.append(declaration)
+    return ';'.join(marked)
+
+
+def _subject(selector: str) -> Tuple[str, Set[str]]:
+    """Tag and classes of the element a selector styles (its last compound, pseudo-classes dropped)"""
+    match = _SELECTOR_SUBJECT_RE.search(selector.strip())
+    compound = re.sub(r'::?[\w-]+(\([^)]*\))?', '', match.group(1) if match else '')
+    tag = re.match(r'[a-zA-Z][a-zA-Z0-9]*', compound)
+    return (tag.group(0).lower() if tag else ''), set(re.findall(r'\.([\w-]+)', compound))
+
+
+def minify_css(css: str) -> str:
+    css = ' '.join(_CSS_COMMENT_RE.sub('', css).split())
+    return re.sub(r'\s*([{};,:])\s*', r'\1', css).replace(';}', '}')
+
+
+def inline_css(source: str) -> str:
+    """Move simple-selector rules from <style> blocks into style attributes"""
+    inlinable: List[Tuple[Tuple[int, int], int, str, str, str]] = []
+    kept: List[Tuple[str, str]] = []
+    at_rules: List[str] = []
+    order = 0
+    for block in _STYLE_BLOCK_RE.findall(source):
+        rules, at_blocks = _parse_css(block)
+        for selectors, declarations in rules:
+            for selector in (s.strip() for s in selectors.split(',')):
+                match = _SIMPLE_SELECTOR_RE.match(selector)
+                if match and selector:
+                    tag, css_class = match.group(1) or '', match.group(2) or ''
+                    inlinable.append(((bool(css_class), bool(tag)), order, tag.lower(), css_class, _declarations(declarations)))
+                    order += 1
+                else:
+                    kept.append((selector, declarations))
+        at_rules.extend(at_blocks)
+    if not inlinable:
+        return source
+    # Lower specificity first, so more specific rules and the element's own style win
+    inlinable.sort(key=lambda rule: (rule[0], rule[1]))
+    # (tag, classes, properties inlined from <style> only, all inline properties) per styled element
+    elements: List[Tuple[str, Set[str], Set[str], Set[str]]] = []
+
+    def apply(match: re.Match) -> str:
+        tag, attrs, self_closing = match.group(1), match.group(2) or '', match.group(3)
+        class_match = _CLASS_ATTR_RE.search(attrs)
+        classes = set(class_match.group(1).split()) if class_match else set()
+        styles = [decls for _, _, rule_tag, rule_class, decls in inlinable
+                  if (not rule_tag or rule_tag == tag.lower()) and (not rule_class or rule_class in classes)]
+        inlined = {d.partition(':')[0].lower() for d in ';'.join(styles).split(';') if d}
+        style_match = _STYLE_ATTR_RE.search(attrs)
+        own: Set[str] = set()
+        if style_match:
+            styles.append(_declarations(style_match.group(1)))
+            own = {d.partition(':')[0].lower() for d in styles[-1].split(';') if d}
+            attrs = attrs[:style_match.start()] + attrs[style_match.end():]
+        if not styles:
+            return match.group(0)
+        # The element's own declarations already beat <style> rules before inlining
+        elements.append((tag.lower(), classes, inlined - own, inlined | own))
+        # Later declarations of the same property win, keep only those
+        merged: Dict[str, str] = {}
+        for declaration in ';'.join(styles).split(';'):
+            prop, _, value = declaration.partition(':')
+            merged.pop(prop, None)
+            merged[prop] = value
+        style = ';'.join(f"{prop}:{value}" for prop, value in merged.items())
+        return f'<{tag}{attrs} style="{style}"{self_closing}>'
+
+    head, sep, body = source.partition('<body')
+    body = _START_TAG_RE.sub(apply, sep + body) if sep else _START_TAG_RE.sub(apply, head)
+    head = _STYLE_BLOCK_RE.sub('', head if sep else '')
+
+    def keep(selector: str, declarations: str, media: bool = False) -> str:
+        tag, classes = _subject(selector)
+        props: Set[str] = set()
+        for element_tag, element_classes, from_rules, inline in elements:
+            if (not tag or tag == element_tag) and classes <= element_classes:
+                props |= inline if media else from_rules
+        return f"{selector}{{{_important(declarations, props)}}}"
+
+    def keep_at_rule(block: str) -> str:
+        prelude, _, inner = block.partition('{')
+        if not prelude.strip().lower().startswith(('@media', '@supports')):
+            return block
+        rules, nested = _parse_css(inner.rsplit('}', 1)[0])
+        kept_rules = [keep(sel.strip(), decls, media=True) for selectors, decls in rules for sel in selectors.split(',')]
+        return f"{prelude.strip()}{{{''.join(kept_rules + [keep_at_rule(b) for b in nested])}}}"
+
+    kept_css = [keep(selector, declarations) for selector, declarations in kept] + [keep_at_rule(b) for b in at_rules]
+    if kept_css:
+        head = head.replace('</head>', f"<style>{''.join(kept_css)}</style></head>", 1)
+    return head + body
+
+
+def minify_html(source: str) -> str:
+    """Drop comments and indentation, minify <style> blocks (newlines are kept short of line limits)"""
+    source = _HTML_COMMENT_RE.sub('', source)
+    source = _STYLE_BLOCK_RE.sub(lambda m: f"<style>{minify_css(m.group(1))}</style>", source)
+    source = _STYLE_ATTR_RE.sub(lambda m: f' style="{_declarations(m.group(1))}"', source)
+    source = re.sub(r'[ \t]*\n\s*', '\n', source)
+    source = re.sub(r'[ \t]{2,}', ' ', source)
+    return source.strip() + '\n'
+
+
+def html_to_text(source: str) -> str:
+    """Derive a plain-text template from an HTML template, keeping Jinja tags"""
+    tags: Dict[str, str] = {}
+
+    def protect(match: re.Match) -> str:
+        key = f"\x00{len(tags)}\x00"
+        tags[key] = match.group(0)
+        return key
+
+    text = _JINJA_RE.sub(protect, source)
+    text = re.sub(r'<head[^>]*>.*?</head>', '', text, flags=re.S | re.I)
+    text = _HTML_COMMENT_RE.sub('', text)
+    text = re.sub(r'<svg[^>]*>.*?</svg>', '', text, flags=re.S | re.I)
+    # Hidden preheader
+    text = re.sub(r'<div[^>]*display:\s*none[^>]*>.*?</div>', '', text, flags=re.S | re.I)
+
+    def link(match: re.Match) -> str:
+        href, label = match.group(1), re.sub(r'<[^>]+>', '', match.group(2)).strip()
+        if href.startswith('mailto:') or not label or label == href:
+            return label or href
+        return f"{label} ({href})"
+
+    text = re.sub(r'<a\s[^>]*href="([^"]*)"[^>]*>(.*?)</a>', link, text, flags=re.S | re.I)
+    text = re.sub(r'<br\s*/?>\s*', '\n', text, flags=re.I)
+    text = re.sub(r'<hr[^>]*>', '\n--\n', text, flags=re.I)
+    text = re.sub(r'<li[^>]*>', '\n- ', text, flags=re.I)
+    text = re.sub(_BLOCK_END_RE.pattern + r'\s*', '\n', text, flags=re.I)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = html.unescape(text)
+    lines = [' '.join(line.split()) for line in text.split('\n')]
+    text = re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip() + '\n'
+    for key, tag in tags.items():
+        text = text.replace(key, tag)
+    return text
+
+
+class BuiltTemplateLoader(FileSystemLoader):
+    """Serves *.html templates CSS-inlined and minified, and *.txt alternatives generated from them"""
+
+    def get_source(self, environment, template):
+        if template.endswith('.txt') and not any(os.path.exists(os.path.join(p, template)) for p in self.searchpath):
+            source, filename, uptodate = super().get_source(environment, template[:-4] + '.html')
+            return html_to_text(source), filename, uptodate
+        source, filename, uptodate = super().get_source(environment, template)
+        if template.endswith('.html'):
+            source = minify_html(inline_css(source))
+        return source, filename, uptodate
@@ -1,34 +1,54 @@
 import os
-import asyncio
 import logging
 import time
-from email.mime.text import MIMEText
 import smtplib
-import httpx
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import parseaddr
+
+from utils.circuit_breaker import CircuitBreaker, RetryBudget, CLOSED
+from utils.http_clients import http_clients
+from utils.smtp_pool import smtp_pool
+from utils.suppression import suppression
 
 logger = logging.getLogger(__name__)
 
 FROM_EMAIL_DEFAULT = os.environ.get('FROM_EMAIL', 'info@softdab.tech')
 FROM_NAME_DEFAULT = os.environ.get('FROM_NAME', 'SoftDAB')
 RESEND_API_KEY = os.environ.get('RESEND_API_KEY')
+# Max messages per Resend /emails/batch request (API limit is 100; <= 1 disables batching)
+RESEND_BATCH_SIZE = int(os.environ.get('RESEND_BATCH_SIZE', '100'))
+SENDGRID_API_KEY = os.environ.get('SENDGRID_API_KEY')
+DEBUG_EMAIL = os.environ.get('DEBUG_EMAIL', '0') in ('1', 'true', 'yes')
+
+# Provider health: one circuit breaker per transport, shared retry budget
+breakers = {name: CircuitBreaker(name) for name in ('resend', 'sendgrid', 'smtp')}
+retry_budget = RetryBudget()
 
 
-def _smtp_send_blocking(to_address: str, subject: str, content: str, from_address: str | None, is_html: bool = False) -> bool:
-    host = os.environ.get('SMTP_HOST', 'localhost')
-    port = int(os.environ.get('SMTP_PORT', '25'))
-    user = os.environ.get('SMTP_USER')
-    password = os.environ.get('SMTP_PASS')
-    use_tls = os.environ.get('SMTP_TLS', 'false').lower() in ('1', 'true', 'yes')
+class ProviderUnavailable(Exception):
+    """Provider failed in a way that says nothing about the message (5xx, 429)"""
+
+
+def _smtp_send_blocking(to_address: str, subject: str, content: str, from_address: str | None, is_html: bool = False,
+                        text_content: str | None = None) -> bool:
+    """Send one message through the pooled SMTP sessions (runs on the SMTP executor)"""
+    config = smtp_pool.config
+    host, port, user, use_tls = config.host, config.port, config.user, config.use_tls
 
     # Verbose diagnostic (only if DEBUG_EMAIL=1)
-    if os.environ.get('DEBUG_EMAIL', '0') in ('1', 'true', 'yes'):
+    if DEBUG_EMAIL:
         logger.info(
             f"email_smtp_attempt host={host} port={port} user={'set' if user else 'none'} tls={use_tls} to={to_address} subject_len={len(subject)}"
         )
 
     from_addr = from_address or f"{FROM_NAME_DEFAULT} <{FROM_EMAIL_DEFAULT}>"
-    # Определяем тип письма: plain или html
-    if is_html or content.strip().lower().startswith('<html') or content.strip().lower().startswith('<!doctype'):
+    # HTML with a text alternative is sent as multipart/alternative (text first)
+    if is_html and text_content:
+        msg = MIMEMultipart('alternative')
+        msg.attach(MIMEText(text_content, _subtype='plain', _charset='utf-8'))
+        msg.attach(MIMEText(content, _subtype='html', _charset='utf-8'))
+    elif is_html:
         msg = MIMEText(content, _subtype='html', _charset='utf-8')
     else:
         msg = MIMEText(content, _subtype='plain', _charset='utf-8')
@@ -47,63 +67,119 @@ def _smtp_send_blocking(to_address: str, subject: str, content: str, from_addres
     msg['Subject'] = subject
 
     try:
-        with smtplib.SMTP(host, port, timeout=10) as server:
-            if use_tls:
-                server.starttls()
-            if user and password:
-                server.login(user, password)
-            server.sendmail(envelope_from, [to_address], msg.as_string())
+        smtp_pool.send_blocking(envelope_from, [to_address], msg.as_string())
         return True
+    except smtplib.SMTPRecipientsRefused as e:
+        # The relay answered and refused this message
+        logger.error(f"SMTP rejected message: {e} to={to_address}")
+        return False
+    except (smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+        if e.smtp_code >= 500:
+            logger.error(f"SMTP rejected message: {e} to={to_address}")
+            return False
+        # 4xx: transient relay failure, let the caller fail over
+        logger.error(f"SMTP temporary failure: {e} to={to_address}")
+        raise
     except Exception as e:
         logger.error(
             f"SMTP send error: {e} host={host} port={port} user={'set' if user else 'none'} tls={use_tls} to={to_address}"
         )
-        return False
+        raise
 
 
-async def send_email(to_address: str, subject: str, content: str, from_address: str | None = None, is_html: bool = False) -> bool:
-    """Send email via Resend API (fallback to SMTP if Resend not configured).
+async def send_email(to_address: str, subject: str, content: str, from_address: str | None = None, is_html: bool = False,
+                     text_content: str | None = None) -> bool:
+    """Send email through the healthiest configured provider, failing over to the others.
 
     Args:
         to_address: Recipient email address
         subject: Email subject
         content: Email content (plain text or HTML)
         from_address: Sender address (optional)
-        is_html: Force HTML content type (optional, auto-detected by default)
+        is_html: Content is HTML (optional, plain text by default)
+        text_content: Plain-text alternative for HTML content (optional)
 
     Environment variables expected:
-    - RESEND_API_KEY (preferred)
+    - RESEND_API_KEY (preferred), SENDGRID_API_KEY (optional)
     - SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_TLS (fallback)
     - FROM_EMAIL, FROM_NAME
 
+    Suppressed recipients (unsubscribed or bounced) are skipped before any
+    provider call. Providers whose circuit breaker is open are skipped without
+    a network call. Only a provider that raised (unavailable) is failed over,
+    not one that refused the message; failover attempts are limited by the
+    shared retry budget.
+
     Returns True on success, False otherwise.
     """
-    # Try Resend API first if configured
+    if suppression.is_suppressed(to_address):
+        logger.info(f"email_suppressed to={to_address} subject_len={len(subject)}")
+        return False
     start = time.time()
-    provider = 'smtp'
+    retry_budget.record_request()
+    provider = 'none'
     success = False
-    if RESEND_API_KEY:
+    attempts = 0
+    for candidate in providers_by_health():
+        breaker = breakers[candidate]
+        if not breaker.allow_request():
+            continue
+        if attempts and not retry_budget.try_spend():
+            breaker.cancel_request()
+            logger.warning(f"email_retry_budget_exhausted to={to_address} skipped={candidate}")
+            break
+        attempts += 1
+        provider = candidate
+        call_start = time.monotonic()
         try:
-            provider = 'resend'
-            success = await _send_via_resend(to_address, subject, content, from_address, is_html)
+            success = await _SENDERS[candidate](to_address, subject, content, from_address, is_html, text_content)
         except Exception as e:
-            logger.error(f"Resend API error: {e}, falling back to SMTP")
-            provider = 'smtp'
-    if provider == 'smtp' and not success:
-        success = await asyncio.to_thread(_smtp_send_blocking, to_address, subject, content, from_address, is_html)
+            breaker.record_failure((time.monotonic() - call_start) * 1000)
+            logger.error(f"{candidate} send error: {e}, trying next provider")
+            continue
+        # The provider answered: a refused message would be refused elsewhere
+        # too, so only unavailability fails over
+        breaker.record_success((time.monotonic() - call_start) * 1000)
+        break
+    if attempts == 0:
+        logger.error(f"email_delivery no provider available (circuits open) to={to_address}")
     latency_ms = int((time.time() - start) * 1000)
-    logger.info(f"email_delivery provider={provider} to={to_address} subject_len={len(subject)} html={is_html} success={success} latency_ms={latency_ms}")
+    logger.info(f"email_delivery provider={provider} to={to_address} subject_len={len(subject)} html={is_html} success={success} attempts={attempts} latency_ms={latency_ms}")
     return success
 
 
-async def _send_via_resend(to_address: str, subject: str, content: str, from_address: str | None, is_html: bool) -> bool:
-    """Send email via Resend API"""
+def configured_providers() -> list[str]:
+    """Providers with credentials, in preference order"""
+    providers = []
+    if RESEND_API_KEY:
+        providers.append('resend')
+    if SENDGRID_API_KEY:
+        providers.append('sendgrid')
+    providers.append('smtp')
+    return providers
+
+
+def providers_by_health() -> list[str]:
+    """Configured providers ordered by breaker state, error rate and latency"""
+    providers = configured_providers()
+    return sorted(providers, key=lambda p: (breakers[p].health_key(), providers.index(p)))
+
+
+def provider_health() -> dict:
+    """Breaker snapshot per configured provider (for diagnostics)"""
+    return {p: breakers[p].snapshot() for p in configured_providers()}
+
+
+async def _send_via_smtp(to_address: str, subject: str, content: str, from_address: str | None, is_html: bool,
+                         text_content: str | None = None) -> bool:
+    return await smtp_pool.run(_smtp_send_blocking, to_address, subject, content, from_address, is_html, text_content)
+
+
+def _resend_payload(to_address: str, subject: str, content: str, from_address: str | None, is_html: bool,
+                    text_content: str | None = None) -> dict:
+    """Build a Resend email object (shared by single and batch sends)"""
     from_addr = from_address or f"{FROM_NAME_DEFAULT} <{FROM_EMAIL_DEFAULT}>"
     
-    # Auto-detect HTML
-    if not is_html:
-        is_html = content.strip().lower().startswith('<html') or content.strip().lower().startswith('<!doctype')
-    
     payload = {
         "from": from_addr,
         "to": [to_address],
@@ -112,23 +188,186 @@ async def _send_via_resend(to_address: str, subject: str, content: str, from_add
     
     if is_html:
         payload["html"] = content
+        if text_content:
+            payload["text"] = text_content
     else:
         payload["text"] = content
+    return payload
+
+
+async def _send_via_resend(to_address: str, subject: str, content: str, from_address: str | None, is_html: bool,
+                           text_content: str | None = None) -> bool:
+    """Send email via Resend API"""
+    payload = _resend_payload(to_address, subject, content, from_address, is_html, text_content)
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.resend.com/emails",
-            json=payload,
-            headers={
-                "Authorization": f"Bearer {RESEND_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            timeout=30.0
-        )
-        
-        if response.status_code == 200:
-            logger.info(f"Email sent via Resend to {to_address}")
-            return True
+    # Pooled keep-alive client shared for the app lifetime
+    client = http_clients.get('resend')
+    response = await client.post(
+        "/emails",
+        json=payload,
+        headers={
+            "Authorization": f"Bearer {RESEND_API_KEY}",
+            "Content-Type": "application/json"
+        },
+        timeout=30.0
+    )
+    
+    if response.status_code == 200:
+        logger.info(f"Email sent via Resend to {to_address}")
+        return True
+    elif response.status_code == 429 or response.status_code >= 500:
+        raise ProviderUnavailable(f"Resend API {response.status_code}: {response.text[:200]}")
+    else:
+        logger.error(f"Resend API error: {response.status_code} - {response.text}")
+        return False
+
+
+async def _send_via_sendgrid(to_address: str, subject: str, content: str, from_address: str | None, is_html: bool,
+                             text_content: str | None = None) -> bool:
+    """Send email via SendGrid API"""
+    from_name, from_email = parseaddr(from_address or f"{FROM_NAME_DEFAULT} <{FROM_EMAIL_DEFAULT}>")
+    # SendGrid requires text/plain to come before text/html
+    parts = []
+    if not is_html or text_content:
+        parts.append({"type": "text/plain", "value": text_content if is_html else content})
+    if is_html:
+        parts.append({"type": "text/html", "value": content})
+    payload = {
+        "personalizations": [{
+            "to": [{"email": to_address}],
+            "subject": subject
+        }],
+        "from": {
+            "email": from_email or FROM_EMAIL_DEFAULT,
+            "name": from_name or FROM_NAME_DEFAULT
+        },
+        "content": parts
+    }
+    client = http_clients.get('sendgrid')
+    response = await client.post(
+        "/v3/mail/send",
+        json=payload,
+        headers={
+            "Authorization": f"Bearer {SENDGRID_API_KEY}",
+            "Content-Type": "application/json"
+        },
+        timeout=30.0
+    )
+    if response.status_code == 202:
+        logger.info(f"Email sent via SendGrid to {to_address}")
+        return True
+    elif response.status_code == 429 or response.status_code >= 500:
+        raise ProviderUnavailable(f"SendGrid API {response.status_code}: {response.text[:200]}")
+    else:
+        logger.error(f"SendGrid API error: {response.status_code} - {response.text}")
+        return False
+
+
+_SENDERS = {
+    'resend': _send_via_resend,
+    'sendgrid': _send_via_sendgrid,
+    'smtp': _send_via_smtp,
+}
+
+
+def batch_send_available() -> bool:
+    """Whether send_email_batch can use the Resend batch API (configured, closed and first by health)"""
+    return (bool(RESEND_API_KEY) and RESEND_BATCH_SIZE > 1 and breakers['resend'].state == CLOSED
+            and providers_by_health()[0] == 'resend')
+
+
+async def send_email_batch(messages: list[dict]) -> list[bool | None]:
+    """Send several emails with as few Resend API calls as possible.
+
+    Each message is a dict with the send_email arguments (to_address, subject,
+    content, optional from_address, is_html and text_content). Messages are
+    sent in chunks of RESEND_BATCH_SIZE through /emails/batch while Resend is
+    the healthiest provider.
+
+    Returns one flag per message, in the same order: True (sent), False
+    (refused, or the recipient is suppressed), or None when the message was not sent because batching was
+    unavailable or its batch request failed; the caller sends those with
+    send_email, which handles failover.
+    """
+    results: list[bool | None] = [None] * len(messages)
+    deliverable = []
+    for index, message in enumerate(messages):
+        if suppression.is_suppressed(message['to_address']):
+            logger.info(f"email_suppressed to={message['to_address']} subject_len={len(message['subject'])}")
+            results[index] = False
         else:
-            logger.error(f"Resend API error: {response.status_code} - {response.text}")
-            return False
+            deliverable.append(index)
+    for i in range(0, len(deliverable), RESEND_BATCH_SIZE):
+        indexes = deliverable[i:i + RESEND_BATCH_SIZE]
+        chunk = [messages[index] for index in indexes]
+        # Re-checked per chunk: a failed chunk can demote Resend
+        if not batch_send_available():
+            continue
+        start = time.time()
+        try:
+            chunk_results = await _send_batch_via_resend(chunk)
+            breakers['resend'].record_success((time.time() - start) * 1000)
+        except Exception as e:
+            breakers['resend'].record_failure((time.time() - start) * 1000)
+            logger.error(f"Resend batch API error: {e}, leaving {len(chunk)} messages for single sends")
+            chunk_results = None
+        if chunk_results is None:
+            continue
+        latency_ms = int((time.time() - start) * 1000)
+        for index, message, success in zip(indexes, chunk, chunk_results):
+            # Each delivered-or-refused message is a first attempt for the retry budget
+            retry_budget.record_request()
+            logger.info(f"email_delivery provider=resend-batch to={message['to_address']} subject_len={len(message['subject'])} html={bool(message.get('is_html'))} success={success} latency_ms={latency_ms}")
+            results[index] = success
+    return results
+
+
+def _send_args(message: dict) -> dict:
+    return {
+        'to_address': message['to_address'],
+        'subject': message['subject'],
+        'content': message['content'],
+        'from_address': message.get('from_address'),
+        'is_html': bool(message.get('is_html')),
+        'text_content': message.get('text_content'),
+    }
+
+
+async def _send_batch_via_resend(messages: list[dict]) -> list[bool] | None:
+    """Send up to RESEND_BATCH_SIZE emails in one Resend request.
+
+    Uses permissive validation so one invalid message does not reject the
+    others; per-message errors are mapped back by index. Returns None when the
+    batch request was refused, raises ProviderUnavailable on 5xx/429.
+    """
+    payload = [_resend_payload(**_send_args(m)) for m in messages]
+    client = http_clients.get('resend')
+    response = await client.post(
+        "/emails/batch",
+        json=payload,
+        headers={
+            "Authorization": f"Bearer {RESEND_API_KEY}",
+            "Content-Type": "application/json",
+            "x-batch-validation": "permissive"
+        },
+        timeout=30.0
+    )
+    if response.status_code == 429 or response.status_code >= 500:
+        raise ProviderUnavailable(f"Resend batch API {response.status_code}: {response.text[:200]}")
+    if response.status_code != 200:
+        logger.error(f"Resend batch API error: {response.status_code} - {response.text}")
+        return None
+
+    body = response.json()
+    results = [False] * len(messages)
+    failed = {}
+    for error in body.get('errors') or []:
+        failed[error.get('index')] = error.get('message')
+    # Successful messages are listed in request order, skipping rejected indexes
+    sent_ids = iter(body.get('data') or [])
+    for index in range(len(messages)):
+        if index in failed:
+            logger.error(f"Resend batch rejected message to {messages[index]['to_address']}: {failed[index]}")
+            continue
+        results[index] = next(sent_ids, None) is not None
+    return results
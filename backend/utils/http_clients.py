@@ -0,0 +1,97 @@
+"""
+App-lifetime HTTP clients for the email provider APIs.
+
+One pooled, keep-alive httpx.AsyncClient per provider is created in the
+startup hook and closed on shutdown, so consecutive sends reuse the same
+DNS lookup, TCP connection and TLS session instead of paying for a new
+handshake on every email.
+"""
+import os
+import asyncio
+import importlib.util
+import logging
+from typing import Dict
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Provider name -> base URL (also the warm-up target)
+PROVIDER_BASE_URLS = {
+    'resend': os.environ.get('RESEND_API_BASE', 'https://api.resend.com'),
+    'sendgrid': os.environ.get('SENDGRID_API_BASE', 'https://api.sendgrid.com'),
+}
+
+HTTP_MAX_CONNECTIONS = int(os.environ.get('EMAIL_HTTP_MAX_CONNECTIONS', '20'))
+HTTP_MAX_KEEPALIVE = int(os.environ.get('EMAIL_HTTP_MAX_KEEPALIVE', '10'))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get('EMAIL_HTTP_KEEPALIVE_EXPIRY', '60'))
+HTTP_TIMEOUT = float(os.environ.get('EMAIL_HTTP_TIMEOUT', '30'))
+HTTP2_ENABLED = os.environ.get('EMAIL_HTTP2', 'false').lower() in ('1', 'true', 'yes')
+HTTP_WARMUP = os.environ.get('EMAIL_HTTP_WARMUP', 'false').lower() in ('1', 'true', 'yes')
+
+
+def _http2_available() -> bool:
+    """HTTP/2 in httpx needs the optional 'h2' package"""
+    if not HTTP2_ENABLED:
+        return False
+    if importlib.util.find_spec('h2') is None:
+        logger.warning("EMAIL_HTTP2 is enabled but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+class ProviderClients:
+    """Holds one pooled httpx.AsyncClient per email provider"""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _create(self, provider: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=PROVIDER_BASE_URLS[provider],
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=HTTP_TIMEOUT,
+            http2=_http2_available(),
+        )
+
+    async def start(self, warm_up: bool = HTTP_WARMUP):
+        """Create provider clients (startup hook); optionally open a first connection"""
+        for provider in PROVIDER_BASE_URLS:
+            if provider not in self._clients:
+                self._clients[provider] = self._create(provider)
+        logger.info(
+            f"Email HTTP clients ready: providers={','.join(self._clients)} "
+            f"max_connections={HTTP_MAX_CONNECTIONS} keepalive={HTTP_MAX_KEEPALIVE} http2={_http2_available()}"
+        )
+        if warm_up:
+            await asyncio.gather(*(self._warm_up(p) for p in self._clients))
+
+    async def _warm_up(self, provider: str):
+        """Open a pooled connection (DNS + TCP + TLS) before the first real send"""
+        try:
+            await self._clients[provider].head('/', timeout=5.0)
+            logger.info(f"Email HTTP client warmed up: {provider}")
+        except Exception as e:
+            logger.warning(f"Email HTTP client warm-up failed for {provider}: {e}")
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        """Client for a provider; created on demand when start() was not called (scripts, tests)"""
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._clients[provider] = self._create(provider)
+        return client
+
+    async def close(self):
+        """Close all provider clients (shutdown hook)"""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        logger.info("Email HTTP clients closed")
+
+
+# Global instance
+http_clients = ProviderClients()
@@ -0,0 +1,136 @@
+"""
+Concurrent notification fan-out.
+
+All messages of a submission (admin copies and the user confirmation) are
+sent at the same time instead of one after another, under a per-process
+concurrency cap, so a submission costs roughly one provider round-trip. While
+Resend is the healthiest provider, a multi-message fan-out is a single batch
+API call; messages the batch could not send are retried one by one under the
+same cap.
+"""
+import os
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional, Set
+
+from utils.emailer import send_email, send_email_batch, batch_send_available
+
+logger = logging.getLogger(__name__)
+
+EMAIL_MAX_CONCURRENCY = int(os.environ.get('EMAIL_MAX_CONCURRENCY', '10'))
+
+# Per-recipient delivery status
+DELIVERY_SENT = 'sent'
+DELIVERY_FAILED = 'failed'
+DELIVERY_PENDING = 'pending'  # still in flight when the caller stopped waiting
+
+ResultCallback = Callable[[dict, dict], Awaitable[None]]
+
+
+class NotificationDispatcher:
+    """Sends batches of messages concurrently under a global concurrency cap"""
+
+    def __init__(self, max_concurrency: int = EMAIL_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    def _limit(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _send_one(self, message: dict) -> Optional[str]:
+        """Send one message with send_email; returns the error, or None when sent"""
+        async with self._limit():
+            try:
+                ok = await send_email(
+                    to_address=message['to_address'],
+                    subject=message['subject'],
+                    content=message['content'],
+                    from_address=message.get('from_address'),
+                    is_html=bool(message.get('is_html')),
+                    text_content=message.get('text_content')
+                )
+            except Exception as e:
+                return str(e) or e.__class__.__name__
+        return None if ok else 'provider rejected message'
+
+    async def _send_batch(self, messages: List[dict]) -> List[Optional[str]]:
+        """Send several messages through the Resend batch API, singly where the batch did not go out"""
+        async with self._limit():
+            try:
+                flags = await send_email_batch(messages)
+            except Exception as e:
+                logger.error(f"Batch send failed: {e}")
+                flags = [None] * len(messages)
+        errors: List[Optional[str]] = [None if ok else 'provider rejected message' for ok in flags]
+        # Fallback sends take their own slots (the batch slot is released), so
+        # they stay under the concurrency cap
+        unsent = [i for i, ok in enumerate(flags) if ok is None]
+        for i, error in zip(unsent, await asyncio.gather(*(self._send_one(messages[i]) for i in unsent))):
+            errors[i] = error
+        return errors
+
+    async def _send_group(self, messages: List[dict], on_result: Optional[ResultCallback]) -> List[dict]:
+        """Send one message, or several through the Resend batch API"""
+        start = time.time()
+        if len(messages) == 1:
+            errors = [await self._send_one(messages[0])]
+        else:
+            errors = await self._send_batch(messages)
+        latency_ms = int((time.time() - start) * 1000)
+
+        results = []
+        for message, error in zip(messages, errors):
+            result = {
+                'to_address': message['to_address'],
+                'status': DELIVERY_SENT if error is None else DELIVERY_FAILED,
+                'error': error,
+                'latency_ms': latency_ms,
+            }
+            if on_result is not None:
+                try:
+                    await on_result(message, result)
+                except Exception as e:
+                    logger.error(f"Notification result callback failed for {message['to_address']}: {e}")
+            results.append(result)
+        return results
+
+    async def dispatch(self, messages: List[dict], on_result: Optional[ResultCallback] = None,
+                       timeout: Optional[float] = None) -> List[dict]:
+        """Send all messages concurrently and return one result per message (same order).
+
+        When the Resend batch API is available, the messages go out in a single
+        /emails/batch request instead of one request each. on_result is awaited
+        for every message as soon as it completes, even after the caller stopped
+        waiting: with a timeout, unfinished sends keep running in the background
+        and are reported as 'pending'.
+        """
+        if not messages:
+            return []
+        if len(messages) > 1 and batch_send_available():
+            groups = [messages]
+        else:
+            groups = [[m] for m in messages]
+        tasks = [asyncio.create_task(self._send_group(g, on_result)) for g in groups]
+        for task in tasks:
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+        done, _ = await asyncio.wait(tasks, timeout=timeout)
+
+        results = []
+        for group, task in zip(groups, tasks):
+            if task in done:
+                results.extend(task.result())
+            else:
+                results.extend({'to_address': m['to_address'], 'status': DELIVERY_PENDING,
+                                'error': None, 'latency_ms': None} for m in group)
+        sent = sum(1 for r in results if r['status'] == DELIVERY_SENT)
+        logger.info(f"notification_fanout messages={len(messages)} requests={len(groups)} sent={sent} concurrency={self.max_concurrency}")
+        return results
+
+
+# Global instance
+dispatcher = NotificationDispatcher()
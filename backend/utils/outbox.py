@@ -0,0 +1,143 @@
+"""
+Background delivery of the email outbox.
+
+Form handlers write their outgoing messages into the email_outbox table in the
+same transaction as the submission (see database.save_*), so nothing is lost if
+a uvicorn worker crashes or restarts. A small pool of asyncio workers per
+process claims due messages, sends them and reschedules failures with
+exponential backoff until they are dead-lettered.
+
+Claimed messages are sent concurrently through utils.notifications. Handlers
+may also deliver their own submission inline (EMAIL_INLINE_WAIT_SECONDS > 0)
+to report per-recipient results; whatever does not finish in time stays in
+the outbox.
+"""
+import os
+import asyncio
+import logging
+import random
+import time
+from typing import List, Optional
+
+from database import claim_outbox_messages, mark_outbox_sent, mark_outbox_failed
+from utils.notifications import dispatcher, DELIVERY_SENT
+from utils.suppression import suppression
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WORKERS = int(os.environ.get('OUTBOX_WORKERS', '2'))
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', '2'))
+OUTBOX_LEASE_SECONDS = float(os.environ.get('OUTBOX_LEASE_SECONDS', '120'))
+OUTBOX_BACKOFF_BASE = float(os.environ.get('OUTBOX_BACKOFF_BASE', '30'))
+OUTBOX_BACKOFF_MAX = float(os.environ.get('OUTBOX_BACKOFF_MAX', '3600'))
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '10'))
+# How long a form handler waits for its own emails before answering (0 = queue only)
+EMAIL_INLINE_WAIT_SECONDS = float(os.environ.get('EMAIL_INLINE_WAIT_SECONDS', '0'))
+
+
+def compute_backoff(attempts: int) -> float:
+    """Delay in seconds before the next attempt (exponential with +/-20% jitter)"""
+    delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class OutboxWorkerPool:
+    """Pool of asyncio tasks draining the email_outbox table"""
+
+    def __init__(self, workers: int = OUTBOX_WORKERS, poll_interval: float = OUTBOX_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def start(self):
+        """Start worker tasks on the running event loop"""
+        if self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run(i)) for i in range(self.workers)]
+        logger.info(f"Outbox workers started: {self.workers}")
+
+    async def stop(self):
+        """Stop worker tasks; in-flight messages are reclaimed after their lease expires"""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Outbox workers stopped")
+
+    def wake(self):
+        """Wake idle workers after new messages were committed"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self, worker_id: int):
+        while not self._stopping:
+            try:
+                processed = await self.process_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox worker {worker_id} error: {e}")
+                processed = 0
+            if processed:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def process_once(self) -> int:
+        """Claim a batch of due messages and deliver them concurrently; returns the number processed"""
+        messages = await claim_outbox_messages(limit=OUTBOX_BATCH_SIZE, lease_seconds=OUTBOX_LEASE_SECONDS)
+        await dispatcher.dispatch(messages, on_result=self._record)
+        return len(messages)
+
+    async def deliver_submission(self, submission_type: str, submission_id: int,
+                                 timeout: float = EMAIL_INLINE_WAIT_SECONDS) -> List[dict]:
+        """Deliver a submission's queued emails now, waiting at most `timeout` seconds.
+
+        Returns per-recipient results ('sent', 'failed' or 'pending'). With a
+        zero timeout the messages are left to the workers and [] is returned.
+        """
+        if timeout <= 0:
+            self.wake()
+            return []
+        try:
+            messages = await claim_outbox_messages(
+                limit=100, lease_seconds=OUTBOX_LEASE_SECONDS,
+                submission_type=submission_type, submission_id=submission_id
+            )
+        except Exception as e:
+            logger.error(f"Inline delivery claim failed for {submission_type}#{submission_id}: {e}")
+            self.wake()
+            return []
+        return await dispatcher.dispatch(messages, on_result=self._record, timeout=timeout)
+
+    async def _record(self, message: dict, result: dict):
+        """Persist a delivery result: mark sent, reschedule or dead-letter"""
+        if result['status'] == DELIVERY_SENT:
+            await mark_outbox_sent(message['id'])
+            return
+
+        error = result['error']
+        attempts = message['attempts']
+        if suppression.is_suppressed(message['to_address']):
+            # Retrying would be skipped again; dead-letter without backoff
+            logger.info(f"outbox_suppressed id={message['id']} to={message['to_address']}")
+            await mark_outbox_failed(message['id'], 'recipient suppressed', None)
+        elif attempts >= message['max_attempts']:
+            logger.error(f"outbox_dead id={message['id']} to={message['to_address']} attempts={attempts} error={error}")
+            await mark_outbox_failed(message['id'], error, None)
+        else:
+            retry_in = compute_backoff(attempts)
+            logger.warning(f"outbox_retry id={message['id']} to={message['to_address']} attempts={attempts} retry_in={int(retry_in)}s error={error}")
+            await mark_outbox_failed(message['id'], error, time.time() + retry_in)
+
+
+# Global instance
+outbox = OutboxWorkerPool()
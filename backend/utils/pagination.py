@@ -0,0 +1,57 @@
+"""
+Keyset pagination helpers for the admin list endpoints.
+
+Lists are ordered newest first by (submitted_at, id). The cursor handed to
+the client is the key of the last row it received, so the next page is a
+range scan from that key instead of an OFFSET over every earlier row.
+"""
+import json
+import base64
+import binascii
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+ADMIN_PAGE_DEFAULT_LIMIT = 100
+ADMIN_PAGE_MAX_LIMIT = 500
+
+
+def encode_cursor(submitted_at: str, row_id: int) -> str:
+    raw = json.dumps([submitted_at, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Parse a cursor from the query string; 400 when it was not issued by encode_cursor()"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        submitted_at, row_id = json.loads(raw)
+        if not isinstance(submitted_at, str) or not isinstance(row_id, int):
+            raise ValueError(cursor)
+        return submitted_at, row_id
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], allowed: Dict[str, str], default: List[str]) -> List[str]:
+    """Validate a comma-separated ?fields= projection against the allowed output fields"""
+    if not fields:
+        return list(default)
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(requested))
+
+
+def paginate(request: Request, response: Response, rows: List[dict], limit: int) -> List[dict]:
+    """Trim a page fetched with limit + 1 rows, advertising the next page in X-Next-Cursor and Link"""
+    if len(rows) <= limit:
+        return rows
+    rows = rows[:limit]
+    cursor = encode_cursor(rows[-1]['submitted_at'], rows[-1]['id'])
+    response.headers['X-Next-Cursor'] = cursor
+    response.headers['Link'] = f'<{request.url.include_query_params(cursor=cursor)}>; rel="next"'
+    return rows
@@ -0,0 +1,220 @@
+"""
+Storage backends for middlewares.performance.CacheMiddleware.
+
+MemoryCacheBackend keeps entries in the worker process (an LRU under a byte
+budget). SQLiteCacheBackend keeps them in a small WAL-mode SQLite file next
+to contacts.db, so every uvicorn worker on the host shares one copy and one
+hit rate. Both implement the same async interface:
+
+    get(key, now) -> entry or None     set(key, entry)
+    sweep(now) -> expired count        close()
+
+An entry is a dict with status_code, headers (raw ASGI header list),
+content, timestamp and expires (epoch seconds).
+"""
+import os
+import json
+import asyncio
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory').lower()
+CACHE_DB_FILE = Path(os.environ.get('CACHE_DB_FILE', Path(__file__).resolve().parent.parent / 'data' / 'response_cache.db'))
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+# Shared cache: a hit refreshes the entry's LRU position at most this often
+CACHE_TOUCH_SECONDS = float(os.environ.get('CACHE_TOUCH_SECONDS', '5'))
+
+
+def entry_size(key: str, entry: Dict[str, Any]) -> int:
+    """Approximate bytes an entry occupies (body, headers and key)"""
+    return len(entry['content']) + sum(len(k) + len(v) for k, v in entry['headers']) + len(key)
+
+
+class MemoryCacheBackend:
+    """Per-process LRU under a byte budget"""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.size = 0
+        self.stats = {'evictions': 0, 'expired': 0}
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry['size']
+
+    async def get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if now >= entry['expires']:
+            self._remove(key)
+            self.stats['expired'] += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: Dict[str, Any]):
+        self._remove(key)
+        entry['size'] = entry_size(key, entry)
+        self.entries[key] = entry
+        self.size += entry['size']
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.stats['evictions'] += 1
+
+    async def sweep(self, now: float) -> int:
+        expired = [key for key, entry in self.entries.items() if now >= entry['expires']]
+        for key in expired:
+            self._remove(key)
+        self.stats['expired'] += len(expired)
+        return len(expired)
+
+    async def close(self):
+        pass
+
+
+class SQLiteCacheBackend:
+    """Host-wide cache shared by all worker processes through a WAL-mode SQLite file"""
+
+    def __init__(self, path: Path = CACHE_DB_FILE, max_bytes: int = CACHE_MAX_BYTES,
+                 touch_interval: float = CACHE_TOUCH_SECONDS):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.stats = {'evictions': 0, 'expired': 0}
+        self._connection: Optional[aiosqlite.Connection] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _connect(self) -> aiosqlite.Connection:
+        if self._connection is not None:
+            return self._connection
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._connection is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                connection = await aiosqlite.connect(self.path, isolation_level=None)
+                await connection.execute("PRAGMA journal_mode=WAL")
+                # Cached responses are disposable: no fsync per write
+                await connection.execute("PRAGMA synchronous=OFF")
+                await connection.execute("PRAGMA busy_timeout=2000")
+                await connection.execute("BEGIN IMMEDIATE")
+                try:
+                    await self._create_schema(connection)
+                    await connection.execute("COMMIT")
+                except BaseException:
+                    await connection.execute("ROLLBACK")
+                    await connection.close()
+                    raise
+                self._connection = connection
+        return self._connection
+
+    @staticmethod
+    async def _create_schema(connection: aiosqlite.Connection):
+        await connection.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                expires REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        await connection.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_expires ON response_cache (expires)")
+        await connection.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_accessed ON response_cache (accessed_at)")
+        # Running total kept by triggers, so enforcing the budget never scans the table
+        await connection.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)"
+        )
+        await connection.execute("INSERT OR IGNORE INTO response_cache_size (id, total) VALUES (0, 0)")
+        for name, event, change in (
+            ('ai', 'INSERT', 'new.size'), ('ad', 'DELETE', '-old.size'), ('au', 'UPDATE OF size', 'new.size - old.size'),
+        ):
+            await connection.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS response_cache_size_{name} AFTER {event} ON response_cache BEGIN
+                    UPDATE response_cache_size SET total = total + {change} WHERE id = 0;
+                END
+            """)
+
+    async def get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        connection = await self._connect()
+        rows = await connection.execute_fetchall(
+            "SELECT status, headers, body, stored_at, expires, accessed_at FROM response_cache WHERE key = ?", (key,)
+        )
+        if not rows or now >= rows[0][4]:
+            return None
+        row = rows[0]
+        if now - row[5] >= self.touch_interval:
+            await connection.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return {
+            'status_code': row[0],
+            'headers': [(k.encode('latin-1'), v.encode('latin-1')) for k, v in json.loads(row[1])],
+            'content': row[2],
+            'timestamp': row[3],
+            'expires': row[4],
+        }
+
+    async def set(self, key: str, entry: Dict[str, Any]):
+        connection = await self._connect()
+        headers = json.dumps([(k.decode('latin-1'), v.decode('latin-1')) for k, v in entry['headers']])
+        async with self._lock:
+            # One transaction: the entry and any evictions it causes land together
+            await connection.execute("BEGIN IMMEDIATE")
+            try:
+                await connection.execute("""
+                    INSERT INTO response_cache (key, status, headers, body, size, stored_at, expires, accessed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET status = excluded.status, headers = excluded.headers,
+                        body = excluded.body, size = excluded.size, stored_at = excluded.stored_at,
+                        expires = excluded.expires, accessed_at = excluded.accessed_at
+                """, (key, entry['status_code'], headers, entry['content'], entry_size(key, entry),
+                      entry['timestamp'], entry['expires'], entry['timestamp']))
+                total = await connection.execute_fetchall("SELECT total FROM response_cache_size WHERE id = 0")
+                excess = total[0][0] - self.max_bytes
+                if excess > 0:
+                    # Least recently used first, just enough of them to cover the excess
+                    cursor = await connection.execute("""
+                        DELETE FROM response_cache WHERE key IN (
+                            SELECT key FROM (
+                                SELECT key, SUM(size) OVER (ORDER BY accessed_at, key ROWS UNBOUNDED PRECEDING) - size AS freed
+                                FROM response_cache WHERE key != ?
+                            ) WHERE freed < ?
+                        )
+                    """, (key, excess))
+                    self.stats['evictions'] += cursor.rowcount
+                await connection.execute("COMMIT")
+            except BaseException:
+                await connection.execute("ROLLBACK")
+                raise
+
+    async def sweep(self, now: float) -> int:
+        connection = await self._connect()
+        async with self._lock:
+            cursor = await connection.execute("DELETE FROM response_cache WHERE expires <= ?", (now,))
+        self.stats['expired'] += cursor.rowcount
+        return cursor.rowcount
+
+    async def close(self):
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+def create_cache_backend(name: str = CACHE_BACKEND, max_bytes: int = CACHE_MAX_BYTES):
+    """Backend named by CACHE_BACKEND: memory (per process) or sqlite (shared by all workers)"""
+    if name == 'sqlite':
+        return SQLiteCacheBackend(max_bytes=max_bytes)
+    if name != 'memory':
+        logger.warning(f"Unknown CACHE_BACKEND={name!r}, using the in-process cache")
+    return MemoryCacheBackend(max_bytes=max_bytes)
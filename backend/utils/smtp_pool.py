@@ -0,0 +1,175 @@
+"""
+Pooled SMTP sessions for the SMTP fallback transport.
+
+Opening a session to the relay (TCP connect, EHLO, STARTTLS, AUTH) costs more
+than sending one message, so authenticated sessions are kept and reused.
+Sessions are health-checked with NOOP before reuse and recycled after an idle
+timeout or a maximum number of messages. smtplib is blocking, so sends run on
+a dedicated, bounded thread pool instead of the default asyncio executor.
+"""
+import os
+import asyncio
+import logging
+import smtplib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConfig:
+    """SMTP settings, read from the environment once"""
+
+    def __init__(self, host: str = 'localhost', port: int = 25, user: Optional[str] = None,
+                 password: Optional[str] = None, use_tls: bool = False, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls) -> 'SMTPConfig':
+        return cls(
+            host=os.environ.get('SMTP_HOST', 'localhost'),
+            port=int(os.environ.get('SMTP_PORT', '25')),
+            user=os.environ.get('SMTP_USER'),
+            password=os.environ.get('SMTP_PASS'),
+            use_tls=os.environ.get('SMTP_TLS', 'false').lower() in ('1', 'true', 'yes'),
+            timeout=float(os.environ.get('SMTP_TIMEOUT', '10')),
+        )
+
+
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', '4'))
+SMTP_IDLE_TIMEOUT = float(os.environ.get('SMTP_IDLE_TIMEOUT', '60'))
+SMTP_MAX_MESSAGES = int(os.environ.get('SMTP_MAX_MESSAGES_PER_CONNECTION', '100'))
+
+
+class _PooledSession:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.messages = 0
+
+
+class SMTPConnectionPool:
+    """Thread-safe pool of authenticated smtplib sessions"""
+
+    def __init__(self, config: SMTPConfig, max_size: int = SMTP_POOL_SIZE,
+                 idle_timeout: float = SMTP_IDLE_TIMEOUT, max_messages: int = SMTP_MAX_MESSAGES):
+        self.config = config
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self._idle: Deque[_PooledSession] = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    # -- session lifecycle (runs on pool threads) --
+
+    def _connect(self) -> _PooledSession:
+        config = self.config
+        smtp = smtplib.SMTP(config.host, config.port, timeout=config.timeout)
+        try:
+            if config.use_tls:
+                smtp.starttls()
+            if config.user and config.password:
+                smtp.login(config.user, config.password)
+        except Exception:
+            self._quit(smtp)
+            raise
+        return _PooledSession(smtp)
+
+    @staticmethod
+    def _quit(smtp: smtplib.SMTP):
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _healthy(session: _PooledSession) -> bool:
+        try:
+            return session.smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _acquire(self) -> _PooledSession:
+        while True:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                return self._connect()
+            if time.monotonic() - session.last_used > self.idle_timeout or not self._healthy(session):
+                self._quit(session.smtp)
+                continue
+            return session
+
+    def _release(self, session: _PooledSession, broken: bool = False):
+        if broken or session.messages >= self.max_messages:
+            self._quit(session.smtp)
+            return
+        session.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(session)
+
+    def send_blocking(self, envelope_from: str, recipients: List[str], message: str):
+        """Send one message on a pooled session; raises on failure"""
+        with self._slots:
+            session = self._acquire()
+            try:
+                session.smtp.sendmail(envelope_from, recipients, message)
+            except smtplib.SMTPServerDisconnected:
+                # The relay dropped a session that passed NOOP; retry once on a fresh one
+                self._quit(session.smtp)
+                session = self._connect()
+                try:
+                    session.smtp.sendmail(envelope_from, recipients, message)
+                except Exception:
+                    self._release(session, broken=True)
+                    raise
+            except smtplib.SMTPRecipientsRefused:
+                # Session is still usable, only this message was refused
+                self._release(session)
+                raise
+            except Exception:
+                self._release(session, broken=True)
+                raise
+            session.messages += 1
+            self._release(session)
+
+    # -- executor --
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_size, thread_name_prefix='smtp')
+        return self._executor
+
+    async def run(self, func, *args):
+        """Run a blocking SMTP call on the pool's own bounded executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def close(self):
+        """Quit idle sessions and shut down the executor"""
+        with self._lock:
+            sessions = list(self._idle)
+            self._idle.clear()
+        for session in sessions:
+            self._quit(session.smtp)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# Global instance
+smtp_pool = SMTPConnectionPool(SMTPConfig.from_env())
@@ -0,0 +1,139 @@
+"""
+Email suppression list.
+
+Addresses that unsubscribed or bounced are stored in the email_suppressions
+table and mirrored in an in-memory set, so send_email can skip them with a
+set lookup before any provider call. The set is loaded at startup and each
+worker process picks up addresses added by the others every
+SUPPRESSION_REFRESH_SECONDS (new rows only, by id).
+
+Only client-facing mail is suppressed: internal recipients (the admin
+notification and digest addresses) are always delivered. Unsubscribe links
+carry an HMAC of the address, so only the recipient of an email can
+unsubscribe it.
+"""
+import os
+import hmac
+import asyncio
+import hashlib
+import logging
+from typing import FrozenSet, Iterable, List, Optional, Set
+from urllib.parse import urlencode
+
+from database import get_suppressed_emails, suppress_emails, unsubscribe_email
+
+logger = logging.getLogger(__name__)
+
+SUPPRESSION_REFRESH_SECONDS = float(os.environ.get('SUPPRESSION_REFRESH_SECONDS', '30'))
+# Key for unsubscribe link tokens; without it no links are issued or accepted
+UNSUBSCRIBE_SECRET = os.environ.get('UNSUBSCRIBE_SECRET', '')
+UNSUBSCRIBE_URL = os.environ.get('UNSUBSCRIBE_URL', 'https://softdab.tech/api/unsubscribe')
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+# Admin notification and digest recipients, plus any extra exempt addresses
+INTERNAL_EMAILS: FrozenSet[str] = frozenset(
+    normalize_email(e) for e in (
+        'info@softdab.tech',
+        *os.environ.get('CONTACT_NOTIFICATION_EMAILS', 'info@softdab.tech').split(','),
+        *os.environ.get('SUPPRESSION_EXEMPT_EMAILS', '').split(','),
+    ) if e.strip()
+)
+
+
+def unsubscribe_token(email: str, secret: Optional[str] = None) -> Optional[str]:
+    """HMAC of the normalized address for its unsubscribe link, or None without a secret"""
+    secret = UNSUBSCRIBE_SECRET if secret is None else secret
+    if not secret:
+        return None
+    return hmac.new(secret.encode(), normalize_email(email).encode(), hashlib.sha256).hexdigest()
+
+
+def verify_unsubscribe_token(email: str, token: Optional[str], secret: Optional[str] = None) -> bool:
+    expected = unsubscribe_token(email, secret)
+    return bool(expected and token) and hmac.compare_digest(expected, token)
+
+
+def unsubscribe_url(email: str) -> Optional[str]:
+    """Signed unsubscribe link for a client email, or None when links are not configured"""
+    token = unsubscribe_token(email)
+    if token is None:
+        return None
+    return f"{UNSUBSCRIBE_URL}?{urlencode({'email': email, 'token': token})}"
+
+
+class SuppressionList:
+    """In-memory copy of the email_suppressions table"""
+
+    def __init__(self, refresh_interval: float = SUPPRESSION_REFRESH_SECONDS,
+                 internal: FrozenSet[str] = INTERNAL_EMAILS):
+        self.refresh_interval = refresh_interval
+        self.internal = internal
+        self._emails: Set[str] = set()
+        self._last_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._emails)
+
+    def is_internal(self, email: Optional[str]) -> bool:
+        return bool(email) and normalize_email(email) in self.internal
+
+    def is_suppressed(self, email: Optional[str]) -> bool:
+        if not email:
+            return False
+        normalized = normalize_email(email)
+        # Internal mail goes out even if the address somehow got on the list
+        return normalized in self._emails and normalized not in self.internal
+
+    async def refresh(self) -> int:
+        """Load addresses added since the last refresh; returns how many"""
+        emails, self._last_id = await get_suppressed_emails(self._last_id)
+        self._emails.update(emails)
+        return len(emails)
+
+    def start(self):
+        """Keep refreshing on the running event loop (call refresh() once first to load the list)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Suppression list loaded: {len(self._emails)} addresses, refresh={int(self.refresh_interval)}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Suppression list refresh error: {e}")
+
+    async def add(self, emails: Iterable[str], reason: str, source: Optional[str] = None) -> int:
+        """Suppress addresses in the database and this process; returns how many were new"""
+        normalized: List[str] = sorted({normalize_email(e) for e in emails if e and e.strip()} - self.internal)
+        added = await suppress_emails(normalized, reason, source)
+        self._emails.update(normalized)
+        return added
+
+    async def unsubscribe(self, email: str) -> bool:
+        """Handle an unsubscribe link; returns False when the database write failed"""
+        if self.is_internal(email):
+            logger.warning(f"Ignored unsubscribe of internal address {normalize_email(email)}")
+            return True
+        if not await unsubscribe_email(email):
+            return False
+        self._emails.add(normalize_email(email))
+        return True
+
+
+# Global instance
+suppression = SuppressionList()
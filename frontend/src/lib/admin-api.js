@@ -2,10 +2,24 @@
 const rawApi = import.meta.env.VITE_API_URL || '';
 const API = rawApi.endsWith('/api') ? rawApi : `${rawApi}/api`;
 
+// List endpoints return one page per request; the next page's cursor comes
+// in the X-Next-Cursor header
+async function fetchAllPages(path, errorMessage) {
+  const rows = [];
+  let cursor = null;
+  do {
+    const query = new URLSearchParams({ limit: '500' });
+    if (cursor) query.set('cursor', cursor);
+    const res = await fetch(`${API}${path}?${query}`);
+    if (!res.ok) throw new Error(errorMessage);
+    rows.push(...(await res.json()));
+    cursor = res.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return rows;
+}
+
 export async function fetchContacts() {
-  const res = await fetch(`${API}/contact`);
-  if (!res.ok) throw new Error('Failed to load contacts');
-  return res.json();
+  return fetchAllPages('/contact', 'Failed to load contacts');
 }
 
 export async function fetchContactDetail(id) {
@@ -15,9 +29,7 @@ export async function fetchContactDetail(id) {
 }
 
 export async function fetchConsultations() {
-  const res = await fetch(`${API}/expert-consultation`);
-  if (!res.ok) throw new Error('Failed to load consultations');
-  return res.json();
+  return fetchAllPages('/expert-consultation', 'Failed to load consultations');
 }
 
 export async function fetchConsultationDetail(id) {